@@ -0,0 +1,139 @@
+"""Micro-benchmark: one ``parse_assignment_page`` vs the old two-parse pair.
+
+The "legacy" functions below are the pre-refactor ``assignment_is_submitted``
+and ``parse_grading_status``: each built its own BeautifulSoup tree and
+re-normalized the phrase lists on every call.
+
+Run from the repo root:
+
+    python benchmarks/bench_assignment_parser.py [--number 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import timeit
+from typing import Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from ues_bot.scrape import (  # noqa: E402
+    NOT_SUBMITTED_PHRASES,
+    SUBMITTED_PHRASES,
+    _GRADING_STATUS_LABELS,
+    _SUBMISSION_STATUS_LABELS,
+    _norm_text,
+    parse_assignment_page,
+)
+
+# Assignment page shaped like UES Learning's (moove theme): navigation,
+# course index and footer around the submission status table.
+_NAV = "".join(
+    f'<li class="nav-item"><a class="nav-link" href="/course/view.php?id={i}">Curso {i}</a></li>'
+    for i in range(120)
+)
+_INDEX = "".join(
+    f'<div class="courseindex-item"><a href="/mod/assign/view.php?id={i}">Actividad {i}</a></div>'
+    for i in range(250)
+)
+SAMPLE_PAGE = f"""
+<html><head><title>Tarea</title></head><body>
+<nav><ul>{_NAV}</ul></nav>
+<div id="courseindex">{_INDEX}</div>
+<div role="main">
+  <h2>Act 8: Investigación de conceptos</h2>
+  <div class="activity-description"><p>{"Instrucciones de la actividad. " * 60}</p></div>
+  <div class="submissionstatustable">
+    <table class="generaltable table-bordered">
+      <tr><th class="cell c0">Número del intento</th><td class="cell c1 lastcol">Este es el intento 1.</td></tr>
+      <tr><th class="cell c0">Estatus de la entrega</th>
+          <td class="submissionstatussubmitted cell c1 lastcol">Enviado para calificar</td></tr>
+      <tr><th class="cell c0">Estatus de calificación</th>
+          <td class="submissionnotgraded cell c1 lastcol">No calificado</td></tr>
+      <tr><th class="cell c0">Tiempo restante</th><td class="cell c1 lastcol">La tarea fue enviada 1 día antes</td></tr>
+      <tr><th class="cell c0">Última modificación</th><td class="cell c1 lastcol">martes, 3 de marzo de 2026, 21:10</td></tr>
+    </table>
+  </div>
+</div>
+<footer>{"<p>Universidad Estatal de Sonora</p>" * 20}</footer>
+</body></html>
+"""
+
+
+def legacy_assignment_is_submitted(assign_html: str) -> Tuple[Optional[bool], str]:
+    soup = BeautifulSoup(assign_html, "html.parser")
+    td_submitted = soup.select_one("td.submissionstatussubmitted")
+    if td_submitted:
+        return True, td_submitted.get_text(" ", strip=True) or "Enviado para calificar"
+    td_nosub = soup.select_one("td.submissionstatusnosubmission")
+    if td_nosub:
+        return False, td_nosub.get_text(" ", strip=True) or "Sin envío"
+
+    submitted_phrases_n = [_norm_text(p) for p in SUBMITTED_PHRASES]
+    not_submitted_phrases_n = [_norm_text(p) for p in NOT_SUBMITTED_PHRASES]
+    status_labels_n = [_norm_text(lbl) for lbl in _SUBMISSION_STATUS_LABELS]
+    for row in soup.select("table.generaltable tr"):
+        th = row.find("th")
+        td = row.find("td")
+        if not th or not td:
+            continue
+        value_raw = td.get_text(" ", strip=True)
+        label = _norm_text(th.get_text(" ", strip=True))
+        value = _norm_text(value_raw)
+        if any(lbl in label for lbl in status_labels_n):
+            if any(p in value for p in submitted_phrases_n):
+                return True, value_raw
+            if any(p in value for p in not_submitted_phrases_n):
+                return False, value_raw
+            return None, value_raw
+
+    whole = _norm_text(soup.get_text(" ", strip=True))
+    if any(p in whole for p in submitted_phrases_n):
+        return True, "Detectado por texto global"
+    if any(p in whole for p in not_submitted_phrases_n):
+        return False, "Detectado por texto global"
+    return None, "No detectado"
+
+
+def legacy_parse_grading_status(assign_html: str) -> str:
+    soup = BeautifulSoup(assign_html, "html.parser")
+    for row in soup.select("table.generaltable tr"):
+        th = row.find("th")
+        td = row.find("td")
+        if not th or not td:
+            continue
+        label = th.get_text(" ", strip=True).lower()
+        if any(lbl in label for lbl in _GRADING_STATUS_LABELS):
+            return td.get_text(" ", strip=True)
+    return ""
+
+
+def _legacy_pair(html: str):
+    return legacy_assignment_is_submitted(html), legacy_parse_grading_status(html)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=200, help="Llamadas por medición.")
+    parser.add_argument("--repeat", type=int, default=5, help="Mediciones (se toma la mejor).")
+    args = parser.parse_args()
+
+    status = parse_assignment_page(SAMPLE_PAGE)
+    assert (status.submitted, status.submission_status) == legacy_assignment_is_submitted(SAMPLE_PAGE)
+    assert status.grading_status == legacy_parse_grading_status(SAMPLE_PAGE)
+
+    legacy = min(timeit.repeat(lambda: _legacy_pair(SAMPLE_PAGE), number=args.number, repeat=args.repeat))
+    single = min(timeit.repeat(lambda: parse_assignment_page(SAMPLE_PAGE), number=args.number, repeat=args.repeat))
+
+    print(f"Página de ejemplo: {len(SAMPLE_PAGE) / 1024:.1f} KB, {args.number} llamadas x {args.repeat}")
+    print(f"legacy (2 parses):        {legacy / args.number * 1000:.3f} ms/página")
+    print(f"parse_assignment_page:    {single / args.number * 1000:.3f} ms/página")
+    print(f"speedup:                  {legacy / single:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Micro-benchmark: dashboard and assignment parsing on each HTML backend.
+
+Also compares BeautifulSoup building only the event regions (the default)
+against building the whole page. Run from the repo root (backends that are
+not installed are skipped):
+
+    python benchmarks/bench_html_parsers.py [--number 50]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ues_bot.scrape as scrape  # noqa: E402
+from ues_bot.scrape import (  # noqa: E402
+    available_backends,
+    parse_assignment_page,
+    parse_events_from_dashboard,
+    set_html_parser,
+)
+
+from bench_assignment_parser import SAMPLE_PAGE  # noqa: E402
+
+_NAV = "".join(
+    f'<li class="nav-item"><a class="nav-link" href="/course/view.php?id={i}">Curso {i}</a></li>'
+    for i in range(120)
+)
+
+
+def _upcoming(i: int) -> str:
+    return f"""
+    <div class="event d-flex border-bottom pt-2 pb-3" data-region="event-item">
+      <div class="overflow-auto">
+        <h6 class="d-flex mb-1"><a class="text-truncate" data-action="view-event" data-event-id="{1000 + i}"
+           href="https://ueslearning.ues.mx/calendar/view.php?view=day&amp;time={1772605260 + i * 3600}#event_{1000 + i}">
+           Act {i}: Investigación está en fecha de entrega</a></h6>
+        <div class="date small"><a href="https://ueslearning.ues.mx/calendar/view.php?view=day">Mañana</a>, 23:59</div>
+      </div>
+    </div>"""
+
+
+def _timeline(i: int) -> str:
+    return f"""
+    <div class="list-group-item timeline-event-list-item" data-region="event-list-item">
+      <div class="timeline-name"><div class="event-name-container">
+        <h6 class="event-name mb-0 pb-1 text-truncate">
+          <a href="https://ueslearning.ues.mx/mod/assign/view.php?id={5000 + i}"
+             aria-label="Act {i}: Investigación actividad en IS N Redes de Computo 001 está pendiente para 8 de marzo de 2026, 23:59">
+             Act {i}: Investigación</a></h6>
+        <small class="mb-0">Tarea está en fecha de entrega · IS N Redes de Computo 001</small>
+      </div></div>
+      <div class="timeline-action-button"><a href="https://ueslearning.ues.mx/mod/assign/view.php?id={5000 + i}&amp;action=editsubmission">Añadir envío</a></div>
+    </div>"""
+
+
+# Course overview block: never read by the parser, but most of the page.
+_CARD = """
+<div class="card dashboard-card" data-course-id="{i}"><div class="card-body">
+  <a href="/course/view.php?id={i}"><span class="multiline">IS N Curso {i} 001</span></a>
+  <div class="progress"><div class="progress-bar" style="width: 40%"></div></div>
+  <img src="/pluginfile.php/{i}/course/overviewfiles/cover.png" alt="">
+  <small class="text-muted">Ingeniería en Sistemas</small>
+</div></div>"""
+
+DASHBOARD = (
+    f"<html><body><nav><ul>{_NAV}</ul></nav>"
+    + "".join(_CARD.format(i=i) for i in range(200))
+    + "".join(_upcoming(i) for i in range(15))
+    + "".join(_timeline(i) for i in range(25))
+    + "</body></html>"
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=50, help="Llamadas por medición.")
+    parser.add_argument("--repeat", type=int, default=5, help="Mediciones (se toma la mejor).")
+    args = parser.parse_args()
+
+    set_html_parser("bs4")
+    reference = (parse_events_from_dashboard(DASHBOARD), parse_assignment_page(SAMPLE_PAGE))
+    print(f"Dashboard: {len(DASHBOARD) / 1024:.1f} KB, {len(reference[0])} eventos")
+
+    baseline = None
+    for backend in reversed(available_backends()):  # bs4 first
+        set_html_parser(backend)
+        assert (parse_events_from_dashboard(DASHBOARD), parse_assignment_page(SAMPLE_PAGE)) == reference
+        dash = min(timeit.repeat(lambda: parse_events_from_dashboard(DASHBOARD), number=args.number, repeat=args.repeat))
+        assign = min(timeit.repeat(lambda: parse_assignment_page(SAMPLE_PAGE), number=args.number, repeat=args.repeat))
+        baseline = baseline or dash
+        print(
+            f"{backend:<11} dashboard {dash / args.number * 1000:7.3f} ms"
+            f"  assignment {assign / args.number * 1000:7.3f} ms"
+            f"  ({baseline / dash:.1f}x vs bs4)"
+        )
+
+    set_html_parser("bs4")
+    regioned = _dashboard_cost(args)
+    regions, scrape._DASHBOARD_REGIONS = scrape._DASHBOARD_REGIONS, None
+    try:
+        full = _dashboard_cost(args)
+    finally:
+        scrape._DASHBOARD_REGIONS = regions
+    print(
+        f"bs4 regiones {regioned[0]:7.3f} ms, pico {regioned[1]:6.0f} KB"
+        f" | árbol completo {full[0]:7.3f} ms, pico {full[1]:6.0f} KB"
+        f" ({full[0] / regioned[0]:.1f}x)"
+    )
+
+
+def _dashboard_cost(args) -> tuple:
+    """Best time (ms) and peak traced memory (KB) of one dashboard parse."""
+    seconds = min(timeit.repeat(lambda: parse_events_from_dashboard(DASHBOARD), number=args.number, repeat=args.repeat))
+    tracemalloc.start()
+    parse_events_from_dashboard(DASHBOARD)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds / args.number * 1000, peak / 1024
+
+
+if __name__ == "__main__":
+    main()
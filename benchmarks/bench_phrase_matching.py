@@ -0,0 +1,93 @@
+"""Micro-benchmark: text normalization + phrase matching for submission status.
+
+Compares the per-phrase ``any(p in text ...)`` scan with NFKD folding on
+every call (previous implementation, copied below) against the compiled
+matchers in ``ues_bot.scrape``. Run from the repo root:
+
+    python benchmarks/bench_phrase_matching.py [--number 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import sys
+import timeit
+import unicodedata
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ues_bot.scrape import (  # noqa: E402
+    NOT_SUBMITTED_PHRASES,
+    SUBMITTED_PHRASES,
+    _norm_text,
+    _submission_from_text,
+    parse_html,
+)
+
+from bench_assignment_parser import SAMPLE_PAGE  # noqa: E402
+
+
+def legacy_norm_text(text: str) -> str:
+    text = (text or "").lower().strip()
+    text = text.replace("Ã¡", "a").replace("Ã©", "e").replace("Ã­", "i").replace("Ã³", "o").replace("Ãº", "u")
+    text = text.replace("Ã±", "n")
+    text = "".join(ch for ch in unicodedata.normalize("NFKD", text) if not unicodedata.combining(ch))
+    text = re.sub(r"\s+", " ", text)
+    return text
+
+
+_LEGACY_SUBMITTED = [legacy_norm_text(p) for p in SUBMITTED_PHRASES]
+_LEGACY_NOT_SUBMITTED = [legacy_norm_text(p) for p in NOT_SUBMITTED_PHRASES]
+
+
+def legacy_submission_from_text(value_n: str):
+    if any(p in value_n for p in _LEGACY_SUBMITTED):
+        return True
+    if any(p in value_n for p in _LEGACY_NOT_SUBMITTED):
+        return False
+    return None
+
+
+# Status cells as Moodle renders them (ES/EN), plus whole-page text for the
+# fallback path that scans every string on the page.
+_STATUS_VALUES = [
+    "Enviado para calificar",
+    "Entregado para calificar",
+    "Submitted for grading",
+    "No entregado",
+    "Aún no se ha hecho ninguna tarea",
+    "No se han realizado envíos",
+    "Borrador (no enviado)",
+    "Draft (not submitted)",
+    "Sin calificar",
+    "Calificado",
+    "La tarea fue enviada 2 días 4 horas antes",
+]
+CORPUS = _STATUS_VALUES * 20 + [parse_html(SAMPLE_PAGE).get_text(" ", strip=True)] * 10
+
+
+def _run(norm, classify) -> list:
+    return [classify(norm(text)) for text in CORPUS]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=200, help="Pasadas sobre el corpus por medición.")
+    parser.add_argument("--repeat", type=int, default=5, help="Mediciones (se toma la mejor).")
+    args = parser.parse_args()
+
+    legacy_run = lambda: _run(legacy_norm_text, legacy_submission_from_text)  # noqa: E731
+    compiled_run = lambda: _run(_norm_text, _submission_from_text)  # noqa: E731
+    assert legacy_run() == compiled_run(), "los resultados difieren"
+
+    print(f"Corpus: {len(CORPUS)} textos, {sum(map(len, CORPUS)) / 1024:.1f} KB")
+    legacy = min(timeit.repeat(legacy_run, number=args.number, repeat=args.repeat))
+    compiled = min(timeit.repeat(compiled_run, number=args.number, repeat=args.repeat))
+    print(f"any() + NFKD   {legacy / args.number * 1000:8.3f} ms/corpus")
+    print(f"compilado      {compiled / args.number * 1000:8.3f} ms/corpus  ({legacy / compiled:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,8 @@ from __future__ import annotations
 import argparse
 import asyncio
 import logging
+import time
+from typing import Any, Dict
 
 try:
     from dotenv import load_dotenv  # type: ignore
@@ -21,23 +23,34 @@ except Exception:  # pragma: no cover
 from telegram.error import NetworkError
 from telegram.ext import Application, CallbackContext
 
+from ues_bot.browser import AsyncBrowserManager, BrowserManager, browser_profile_dir
 from ues_bot.commands import (
+    BROWSER_MANAGER_KEY,
     LAST_SCRAPE_TS_KEY,
+    MOODLE_CLIENT_KEY,
     SCRAPE_JOB_CALLBACK_KEY,
     SCRAPE_JOB_NAME,
     SCRAPE_LOCK_KEY,
+    SESSION_TRACKER_KEY,
     ScrapeAlreadyRunningError,
+    refresh_reminder_statuses,
     register_handlers,
     run_scrape_now,
+    run_session_keepalive,
 )
 from ues_bot.config import from_env
+from ues_bot.interception import build_request_blocker
 from ues_bot.logging_utils import setup_logging
-from ues_bot.reminders import get_pending_reminders
+from ues_bot.moodle_api import MoodleClient
+from ues_bot.reminders import get_pending_reminders, next_reminder_crossings
+from ues_bot.scrape import set_html_parser
+from ues_bot.session import SessionTracker
 from ues_bot.state import (
     increment_error_count,
     increment_error_metrics,
     is_sleeping,
     load_state,
+    merge_sent_reminders,
     reset_error_count,
     save_state,
 )
@@ -52,6 +65,9 @@ from ues_bot.summary import (
 from ues_bot.telegram_client import tg_send
 from ues_bot.utils import chunk_messages, esc, is_in_quiet_hours, now_local
 
+REMINDER_PREFETCH_JOB_NAME = "reminder_prefetch"
+_REMINDER_SEND_SLACK_SEC = 5  # land just past the threshold so get_pending_reminders sees it crossed
+
 
 def _get_notification_mode(settings, state) -> str:
     """Resolve the effective notification mode (state overrides settings)."""
@@ -109,6 +125,113 @@ async def global_error_handler(update: object, context: CallbackContext) -> None
         logging.error("No se pudo enviar alerta de error inesperado: %s", error_text)
 
 
+async def _send_reminders(context: CallbackContext, settings, events, notification_mode: str) -> None:
+    """Send the reminders due for ``events`` and remember them in the state file.
+
+    Runs under the scrape lock on a freshly loaded state, so a cycle saving
+    the copy it loaded earlier cannot drop the labels sent here (and send
+    them again); only the new labels are merged into the file afterwards.
+    """
+    bot_data = context.application.bot_data
+    lock = bot_data.get(SCRAPE_LOCK_KEY)
+    if not isinstance(lock, asyncio.Lock):
+        lock = asyncio.Lock()
+        bot_data[SCRAPE_LOCK_KEY] = lock
+
+    async with lock:
+        state = load_state(settings.state_file)
+        pending_reminders = get_pending_reminders(events, state.setdefault("sent_reminders", {}))
+        sent_now: dict[str, list[str]] = {}
+
+        for event, label in pending_reminders:
+            # In silent mode, skip non-urgent reminders (only send 1h)
+            if notification_mode == "silent" and label != "1h":
+                continue
+
+            due = due_unix(event)
+            if due is None:
+                continue
+            _sec, rem_txt = remaining_parts_from_unix(due)
+            link = event.assignment_url or event.url
+            reminder_msg = (
+                f"⏰ <b>Recordatorio ({label})</b>\n"
+                f"• {esc(event.title)}\n"
+                f"• 📚 {esc(event.course_name)}\n"
+                f"• Tiempo restante: <b>{esc(rem_txt)}</b>\n"
+                f"• 🔗 {esc(link)}"
+            )
+            await tg_send(
+                reminder_msg,
+                settings.tg_bot_token,
+                settings.tg_chat_id,
+                dry_run=settings.dry_run,
+                bot=context.bot,
+            )
+            sent_now.setdefault(event.event_id, []).append(label)
+
+        if sent_now:
+            # Commands may have saved while the messages went out.
+            state = load_state(settings.state_file)
+            merge_sent_reminders(state, sent_now)
+            save_state(settings.state_file, state)
+
+
+def schedule_reminder_prefetch(job_queue, settings, events, sent_reminders, now: int | None = None) -> int:
+    """Schedule status refreshes of the assignments about to cross a reminder threshold.
+
+    Only crossings before the next periodic cycle are scheduled; each one
+    gets a ``reminder_prefetch_job`` ``UES_REMINDER_PREFETCH_MIN`` minutes
+    ahead. Jobs from the previous cycle are replaced. Returns how many
+    jobs were scheduled.
+    """
+    lead = max(0, int(settings.reminder_prefetch_min)) * 60
+    if job_queue is None or lead <= 0:
+        return 0
+    for job in job_queue.get_jobs_by_name(REMINDER_PREFETCH_JOB_NAME):
+        job.schedule_removal()
+
+    now = int(time.time()) if now is None else now
+    horizon = now + settings.scrape_interval_min * 60 + lead
+    by_time: dict[int, list] = {}
+    for event, _label, cross_at in next_reminder_crossings(events, sent_reminders, now):
+        if cross_at <= horizon and event.assignment_url:
+            by_time.setdefault(cross_at, []).append(event)
+    for cross_at, due_events in sorted(by_time.items()):
+        job_queue.run_once(
+            reminder_prefetch_job,
+            when=max(1, cross_at - lead - now),
+            data={"events": due_events, "cross_at": cross_at},
+            name=REMINDER_PREFETCH_JOB_NAME,
+        )
+    if by_time:
+        logging.info("Prefetch de recordatorios programado para %d umbrales.", len(by_time))
+    return len(by_time)
+
+
+async def reminder_prefetch_job(context: CallbackContext) -> None:
+    """Refresh the status of assignments nearing a reminder, then send it at the threshold."""
+    data = context.job.data
+    try:
+        await refresh_reminder_statuses(context, data["events"])
+    except Exception:
+        logging.exception("Error en prefetch de recordatorios; se usará el estatus guardado.")
+    context.job_queue.run_once(
+        reminder_send_job,
+        when=max(0, data["cross_at"] - int(time.time())) + _REMINDER_SEND_SLACK_SEC,
+        data=data["events"],
+        name=REMINDER_PREFETCH_JOB_NAME,
+    )
+
+
+async def reminder_send_job(context: CallbackContext) -> None:
+    """Send the reminders of prefetched events (respects sleep / quiet hours / mode)."""
+    settings = context.application.bot_data["settings"]
+    state = load_state(settings.state_file)
+    if is_sleeping(state) or is_in_quiet_hours(now_local(settings.tz_name), settings.quiet_start, settings.quiet_end):
+        return
+    await _send_reminders(context, settings, context.job.data, _get_notification_mode(settings, state))
+
+
 async def periodic_scrape_job(context: CallbackContext) -> None:
     """Periodic scrape job — respects notification_mode.
 
@@ -133,6 +256,8 @@ async def periodic_scrape_job(context: CallbackContext) -> None:
     # --- Scrape ---
     try:
         enriched_all, enriched_changed = await run_scrape_now(context, wait_for_lock_sec=0)
+        # The cycle saved its own state; reload it rather than overwrite it with the copy read above.
+        state = load_state(settings.state_file)
         reset_error_count(state)
         save_state(settings.state_file, state)
     except ScrapeAlreadyRunningError:
@@ -140,6 +265,7 @@ async def periodic_scrape_job(context: CallbackContext) -> None:
         return
     except Exception as ex:
         logging.exception("Error en scraping periódico.")
+        state = load_state(settings.state_file)
         count = increment_error_count(state)
         state["last_error"] = str(ex)
         state["last_error_kind"] = "functional"
@@ -162,6 +288,10 @@ async def periodic_scrape_job(context: CallbackContext) -> None:
                 logging.exception("No se pudo enviar alerta de error.")
         return
 
+    schedule_reminder_prefetch(
+        context.job_queue, settings, enriched_all, state.get("sent_reminders", {})
+    )
+
     can_send_auto = not sleeping and not quiet_now
     if not can_send_auto:
         logging.info(
@@ -171,41 +301,7 @@ async def periodic_scrape_job(context: CallbackContext) -> None:
         return
 
     # --- Reminders (always sent in smart and all; only urgent in silent) ---
-    sent_reminders = state.setdefault("sent_reminders", {})
-    pending_reminders = get_pending_reminders(enriched_all, sent_reminders)
-    reminders_sent_now = False
-
-    for event, label in pending_reminders:
-        # In silent mode, skip non-urgent reminders (only send 1h)
-        if notification_mode == "silent" and label != "1h":
-            continue
-
-        due = due_unix(event)
-        if due is None:
-            continue
-        _sec, rem_txt = remaining_parts_from_unix(due)
-        link = event.assignment_url or event.url
-        reminder_msg = (
-            f"⏰ <b>Recordatorio ({label})</b>\n"
-            f"• {esc(event.title)}\n"
-            f"• 📚 {esc(event.course_name)}\n"
-            f"• Tiempo restante: <b>{esc(rem_txt)}</b>\n"
-            f"• 🔗 {esc(link)}"
-        )
-        await tg_send(
-            reminder_msg,
-            settings.tg_bot_token,
-            settings.tg_chat_id,
-            dry_run=settings.dry_run,
-            bot=context.bot,
-        )
-        sent_list = sent_reminders.setdefault(event.event_id, [])
-        if label not in sent_list:
-            sent_list.append(label)
-            reminders_sent_now = True
-
-    if reminders_sent_now:
-        save_state(settings.state_file, state)
+    await _send_reminders(context, settings, enriched_all, notification_mode)
 
     # --- Just woke up → mini digest ---
     if just_woke:
@@ -303,6 +399,44 @@ async def evening_preview_job(context: CallbackContext) -> None:
         await tg_send(part, settings.tg_bot_token, settings.tg_chat_id, dry_run=settings.dry_run, bot=context.bot)
 
 
+async def session_keepalive_job(context: CallbackContext) -> None:
+    """Keep the Moodle session warm so commands never wait for a login."""
+    try:
+        outcome = await run_session_keepalive(context)
+        logging.debug("Keepalive de sesión: %s", outcome)
+    except Exception:
+        logging.exception("Error en keepalive de sesión.")
+
+
+def build_browser_manager(settings) -> BrowserManager | AsyncBrowserManager | None:
+    """Shared Chromium session for the configured scrape engine (None = per cycle)."""
+    if not settings.keep_browser or settings.scrape_engine == "ajax":
+        return None
+    blocker = build_request_blocker(settings)
+    profile: Dict[str, Any] = {}
+    if settings.browser_profile:
+        # Routed requests bypass Chromium's HTTP cache, which is what the profile keeps.
+        blocker = None
+        profile = {
+            "profile_dir": browser_profile_dir(settings.state_file),
+            "profile_max_mb": settings.browser_profile_max_mb,
+        }
+    if settings.scrape_engine == "async":
+        return AsyncBrowserManager(settings.storage_file, headless=not settings.headful, blocker=blocker, **profile)
+    return BrowserManager(settings.storage_file, headless=not settings.headful, blocker=blocker, **profile)
+
+
+async def close_scrape_resources_on_shutdown(app: Application) -> None:
+    manager = app.bot_data.get(BROWSER_MANAGER_KEY)
+    if isinstance(manager, AsyncBrowserManager):
+        await manager.close()
+    elif isinstance(manager, BrowserManager):
+        await asyncio.to_thread(manager.shutdown)
+    client = app.bot_data.get(MOODLE_CLIENT_KEY)
+    if isinstance(client, MoodleClient):
+        client.close()
+
+
 def persist_state_on_shutdown(state_file: str) -> None:
     state = load_state(state_file)
     save_state(state_file, state)
@@ -356,6 +490,8 @@ def main() -> None:
     parser.add_argument("--digest-evening", default=None, help="Hora del preview vespertino HH:MM (ej. 20:00, vacío desactiva).")
     parser.add_argument("--notification-mode", default=None, choices=["smart", "silent", "all"],
                         help="Modo de notificación: smart (default), silent, all.")
+    parser.add_argument("--scrape-engine", default=None, choices=["thread", "async", "ajax"],
+                        help="Motor de scraping: thread (Playwright sync en hilo, default), async o ajax (sin navegador).")
     args = parser.parse_args()
 
     settings.headful = args.headful
@@ -384,6 +520,8 @@ def main() -> None:
         settings.digest_evening_hour = args.digest_evening
     if args.notification_mode:
         settings.notification_mode = args.notification_mode
+    if args.scrape_engine:
+        settings.scrape_engine = args.scrape_engine
 
     # --- Restore state-persisted overrides ---
     startup_state = load_state(settings.state_file)
@@ -409,16 +547,27 @@ def main() -> None:
     save_state(settings.state_file, startup_state)
 
     setup_logging(settings.log_file, verbose=settings.verbose)
+    logging.info("Parser HTML: %s", set_html_parser(settings.html_parser))
 
     if not settings.tg_bot_token or not settings.tg_chat_id:
         raise RuntimeError("Falta TG_BOT_TOKEN o TG_CHAT_ID en variables de entorno.")
 
-    app = Application.builder().token(settings.tg_bot_token).build()
+    app = Application.builder().token(settings.tg_bot_token).post_shutdown(close_scrape_resources_on_shutdown).build()
     app.bot_data["settings"] = settings
     app.bot_data["run_scrape_args"] = {"headful": settings.headful}
     app.bot_data[SCRAPE_JOB_CALLBACK_KEY] = periodic_scrape_job
     app.bot_data[SCRAPE_LOCK_KEY] = asyncio.Lock()
     app.bot_data[LAST_SCRAPE_TS_KEY] = 0.0
+    browser_manager = build_browser_manager(settings)
+    if browser_manager is not None:
+        app.bot_data[BROWSER_MANAGER_KEY] = browser_manager
+    needs_client = settings.session_keepalive_min > 0 or settings.reminder_prefetch_min > 0
+    if settings.scrape_engine == "ajax" or needs_client:
+        # One pooled HTTP client for browserless cycles, session keepalive and reminder prefetch.
+        app.bot_data[MOODLE_CLIENT_KEY] = MoodleClient(settings.base, settings.storage_file, settings.dashboard_url)
+    app.bot_data[SESSION_TRACKER_KEY] = SessionTracker(
+        settings.storage_file, settings.base, settings.session_idle_timeout_min * 60
+    )
 
     register_handlers(app)
     app.add_error_handler(global_error_handler)
@@ -434,6 +583,15 @@ def main() -> None:
         name=SCRAPE_JOB_NAME,
     )
 
+    # Session keepalive (keeps logins off the path of user commands)
+    if settings.session_keepalive_min > 0:
+        app.job_queue.run_repeating(
+            session_keepalive_job,
+            interval=settings.session_keepalive_min * 60,
+            first=settings.session_keepalive_min * 60,
+            name="session_keepalive",
+        )
+
     # Morning digest
     _schedule_daily_job(app.job_queue, daily_digest_job, settings.digest_hour, settings.tz_name, "daily_digest")
 
@@ -0,0 +1,160 @@
+"""Local stand-in for UES Learning's Moodle that replays recorded JSON.
+
+Serves just enough of the site for ``ues_bot.moodle_api``: the dashboard
+(for the sesskey), ``lib/ajax/service.php`` and server-rendered assignment
+pages. Recorded timestamps are shifted so the events are always upcoming.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURE = Path(__file__).parent / "fixtures" / "moodle_ajax.json"
+RECORDED_BASE = "https://ueslearning.ues.mx"
+
+
+class MoodleStub:
+    def __init__(self, fixture: Path = FIXTURE, failing_methods=()) -> None:
+        self.data = json.loads(fixture.read_text(encoding="utf-8"))
+        self.failing_methods = set(failing_methods)
+        self.session_valid = True
+        self.session_timeout = 7200
+        self.requests: list[str] = []
+        self.ajax_batches: list[list[str]] = []
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.base = f"http://127.0.0.1:{self._server.server_address[1]}"
+        self._shift = int(time.time()) - int(self.data["recorded_at"])
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+
+    def __enter__(self) -> "MoodleStub":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def cookie(self) -> str:
+        return self.data["session_cookie"]
+
+    def write_storage_state(self, path) -> None:
+        """Playwright-style ``storage_state.json`` holding the stub's session cookie."""
+        state = {
+            "cookies": [{"name": "MoodleSession", "value": self.cookie, "domain": "127.0.0.1", "path": "/"}],
+            "origins": [],
+        }
+        Path(path).write_text(json.dumps(state), encoding="utf-8")
+
+    # -- replay ------------------------------------------------------------
+
+    def _rebase(self, item: dict) -> dict:
+        item = json.loads(json.dumps(item).replace(RECORDED_BASE, self.base))
+        for key in ("timesort", "timestart"):
+            if key in item:
+                item[key] += self._shift
+        item["viewurl"] = re.sub(
+            r"time=(\d+)", lambda m: f"time={int(m.group(1)) + self._shift}", item.get("viewurl", "")
+        )
+        return item
+
+    def _action_events(self, args: dict) -> dict:
+        events = [self._rebase(item) for item in self.data["action_events"]]
+        events = [e for e in events if e["timesort"] >= args.get("timesortfrom", 0)]
+        if args.get("timesortto"):
+            events = [e for e in events if e["timesort"] <= args["timesortto"]]
+        if args.get("aftereventid"):
+            ids = [e["id"] for e in events]
+            if args["aftereventid"] in ids:
+                events = events[ids.index(args["aftereventid"]) + 1 :]
+        limit = int(args.get("limitnum") or 50)
+        page = events[:limit]
+        return {
+            "events": page,
+            "firstid": page[0]["id"] if page else 0,
+            "lastid": page[-1]["id"] if page else 0,
+        }
+
+    def _dispatch(self, method: str, args: dict):
+        if method in self.failing_methods:
+            raise LookupError(method)
+        if method == "core_calendar_get_action_events_by_timesort":
+            return self._action_events(args)
+        if method == "mod_assign_get_submission_status":
+            return self.data["submission_status"][str(args["assignid"])]
+        if method == "core_session_touch":
+            return True
+        if method == "core_session_time_remaining":
+            return {"userid": 2, "timeremaining": self.session_timeout}
+        raise LookupError(method)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *_args):
+                pass
+
+            def _send(self, status: int, body: str, content_type="text/html; charset=utf-8", headers=None):
+                raw = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(raw)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def _logged_in(self) -> bool:
+                cookies = self.headers.get("Cookie", "")
+                return stub.session_valid and f"MoodleSession={stub.cookie}" in cookies
+
+            def do_GET(self):
+                stub.requests.append(self.path)
+                if not self._logged_in():
+                    self._send(303, "", headers={"Location": f"{stub.base}/login/index.php"})
+                    return
+                if urlsplit(self.path).path == "/my/":
+                    cfg = json.dumps({"wwwroot": stub.base, "sesskey": stub.data["sesskey"]})
+                    self._send(200, f"<html><script>M.cfg = {cfg};</script></html>")
+                    return
+                page = stub.data["assignment_pages"].get(self.path)
+                if page is None:
+                    self._send(404, "not found")
+                    return
+                self._send(200, page)
+
+            def do_POST(self):
+                stub.requests.append(self.path)
+                url = urlsplit(self.path)
+                if url.path != "/lib/ajax/service.php":
+                    self._send(404, "not found")
+                    return
+                calls = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"[]")
+                stub.ajax_batches.append([call["methodname"] for call in calls])
+
+                sesskey = parse_qs(url.query).get("sesskey", [""])[0]
+                if not self._logged_in() or sesskey != stub.data["sesskey"]:
+                    error = {"error": True, "exception": {"errorcode": "servicerequireslogin", "message": "Login"}}
+                    self._send(200, json.dumps(error), "application/json")
+                    return
+
+                out = []
+                for call in calls:
+                    try:
+                        out.append({"error": False, "data": stub._dispatch(call["methodname"], call["args"])})
+                    except LookupError as ex:
+                        out.append({
+                            "error": True,
+                            "exception": {"errorcode": "servicenotavailable", "message": f"{ex} no disponible"},
+                        })
+                        break  # Moodle stops at the first failing call.
+                self._send(200, json.dumps(out), "application/json")
+
+        return Handler
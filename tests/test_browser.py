@@ -0,0 +1,319 @@
+import asyncio
+import threading
+
+from ues_bot.browser import AsyncBrowserManager, BrowserManager, prune_profile
+from ues_bot.interception import RequestBlocker
+
+
+class _FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    def is_closed(self):
+        return self.closed
+
+
+class _FakeContext:
+    def __init__(self, browser, storage_state=None):
+        self.browser = browser
+        self.storage_state_arg = storage_state
+        self.closed = False
+        self.handlers = {}
+        self.pages = []
+        self.routes = []
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def route(self, pattern, handler):
+        self.routes.append((pattern, handler))
+
+    def new_page(self):
+        if self.closed:
+            raise RuntimeError("Target closed")
+        page = _FakePage(self)
+        self.pages.append(page)
+        return page
+
+    def add_cookies(self, cookies):
+        self.cookies = list(cookies)
+
+    def close(self):
+        self.closed = True
+
+
+class _FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.handlers = {}
+        self.contexts = []
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def is_connected(self):
+        return self.connected
+
+    def new_context(self, storage_state=None):
+        ctx = _FakeContext(self, storage_state)
+        self.contexts.append(ctx)
+        return ctx
+
+    def close(self):
+        self.connected = False
+
+    def crash(self):
+        self.connected = False
+        self.handlers["disconnected"](self)
+
+
+class _FakeChromium:
+    def __init__(self):
+        self.launched = []
+
+        self.persistent = []
+
+    def launch(self, headless=True):
+        browser = _FakeBrowser()
+        self.launched.append(browser)
+        return browser
+
+    def launch_persistent_context(self, user_data_dir, headless=True, args=()):
+        context = _FakeContext(None)
+        context.user_data_dir = user_data_dir
+        context.args = list(args)
+        self.persistent.append(context)
+        return context
+
+
+class _FakePlaywright:
+    def __init__(self):
+        self.chromium = _FakeChromium()
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+
+def _patch_playwright(monkeypatch):
+    fake = _FakePlaywright()
+
+    class _Starter:
+        def start(self):
+            return fake
+
+    monkeypatch.setattr("ues_bot.browser.sync_playwright", lambda: _Starter())
+    return fake
+
+
+def test_browser_manager_reuses_browser_and_context(monkeypatch):
+    fake = _patch_playwright(monkeypatch)
+    manager = BrowserManager()
+
+    with manager.page() as page1:
+        ctx1 = page1.context
+    with manager.page() as page2:
+        ctx2 = page2.context
+
+    assert len(fake.chromium.launched) == 1
+    assert ctx1 is ctx2
+    assert page1.closed and page2.closed
+    assert manager.launches == 1
+
+
+def test_browser_manager_relaunches_after_disconnect(monkeypatch):
+    fake = _patch_playwright(monkeypatch)
+    manager = BrowserManager()
+
+    with manager.page():
+        pass
+    fake.chromium.launched[0].crash()
+
+    with manager.page() as page:
+        assert page.context.browser is fake.chromium.launched[1]
+    assert manager.launches == 2
+
+
+def test_browser_manager_relaunches_when_context_closed_silently(monkeypatch):
+    fake = _patch_playwright(monkeypatch)
+    manager = BrowserManager()
+
+    with manager.page() as page:
+        page.context.closed = True
+
+    with manager.page() as page:
+        assert not page.context.closed
+    assert len(fake.chromium.launched) == 2
+
+
+def test_dashboard_tab_stays_open_until_a_cycle_fails_or_chromium_restarts(monkeypatch):
+    fake = _patch_playwright(monkeypatch)
+    manager = BrowserManager()
+
+    with manager.dashboard_tab() as tab1:
+        tab1.loaded_on = "2026-03-04"
+    with manager.dashboard_tab() as tab2:
+        pass
+    assert tab2 is tab1 and not tab1.page.closed
+
+    try:
+        with manager.dashboard_tab():
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    assert tab1.page.closed
+    with manager.dashboard_tab() as tab3:
+        assert tab3 is not tab1 and tab3.loaded_on == ""
+
+    fake.chromium.launched[0].crash()
+    with manager.dashboard_tab() as tab4:
+        assert tab4.page.context.browser is fake.chromium.launched[1]
+
+
+def test_browser_manager_restores_storage_state(monkeypatch, tmp_path):
+    fake = _patch_playwright(monkeypatch)
+    storage = tmp_path / "storage_state.json"
+    storage.write_text("{}", encoding="utf-8")
+    manager = BrowserManager(storage_file=str(storage))
+
+    with manager.page() as page:
+        assert page.context.storage_state_arg == str(storage)
+
+    manager.close()
+    assert fake.stopped is True
+    assert fake.chromium.launched[0].connected is False
+
+
+def test_browser_manager_installs_blocker_on_every_context(monkeypatch):
+    fake = _patch_playwright(monkeypatch)
+    blocker = RequestBlocker()
+    manager = BrowserManager(blocker=blocker)
+
+    with manager.page():
+        pass
+    fake.chromium.launched[0].crash()
+    with manager.page():
+        pass
+
+    for browser in fake.chromium.launched:
+        assert browser.contexts[0].routes == [("**/*", blocker.handle)]
+
+
+def test_browser_manager_run_uses_single_thread():
+    manager = BrowserManager()
+
+    async def _run_test():
+        first = await manager.run(threading.get_ident)
+        second = await manager.run(threading.get_ident)
+        return first, second
+
+    first, second = asyncio.run(_run_test())
+    manager.shutdown()
+    assert first == second
+    assert first != threading.get_ident()
+
+
+def test_async_browser_manager_reuses_context_and_relaunches(monkeypatch):
+    class _AsyncWrap:
+        """Expose the sync fakes through awaitable methods."""
+
+        def __init__(self, inner):
+            self._inner = inner
+
+        def __getattr__(self, name):
+            attr = getattr(self._inner, name)
+            if name in {"on", "is_connected"} or not callable(attr):
+                return attr
+
+            async def _call(*args, **kwargs):
+                result = attr(*args, **kwargs)
+                return _AsyncWrap(result) if isinstance(result, (_FakeBrowser, _FakeContext, _FakePage)) else result
+
+            return _call
+
+    fake = _FakePlaywright()
+
+    class _AsyncChromium:
+        async def launch(self, headless=True):
+            return _AsyncWrap(fake.chromium.launch(headless=headless))
+
+    class _AsyncPlaywright:
+        chromium = _AsyncChromium()
+
+        async def stop(self):
+            fake.stopped = True
+
+    class _Starter:
+        async def start(self):
+            return _AsyncPlaywright()
+
+    monkeypatch.setattr("ues_bot.browser.async_playwright", lambda: _Starter())
+    manager = AsyncBrowserManager()
+
+    async def _run_test():
+        async with manager.page():
+            pass
+        async with manager.page():
+            pass
+        assert len(fake.chromium.launched) == 1
+        fake.chromium.launched[0].crash()
+        async with manager.page():
+            pass
+        assert len(fake.chromium.launched) == 2
+        await manager.close()
+
+    asyncio.run(_run_test())
+    assert fake.stopped is True
+
+
+def _fill(path, size):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+
+
+def test_prune_profile_drops_caches_first_then_the_profile(tmp_path):
+    profile = tmp_path / "chromium_profile"
+    _fill(profile / "Default" / "Cache" / "data_1", 3000)
+    _fill(profile / "Default" / "Code Cache" / "js" / "a", 1000)
+    _fill(profile / "Default" / "Cookies", 500)
+
+    assert prune_profile(str(profile), max_bytes=10_000) == 0
+    assert prune_profile(str(profile), max_bytes=1000) == 4000
+    assert (profile / "Default" / "Cookies").exists()
+    assert not (profile / "Default" / "Cache").exists()
+
+    _fill(profile / "Default" / "IndexedDB" / "big", 2000)
+    assert prune_profile(str(profile), max_bytes=1000) == 2500
+    assert not profile.exists()
+
+
+def test_browser_manager_runs_on_a_persistent_profile(monkeypatch, tmp_path):
+    fake = _patch_playwright(monkeypatch)
+    storage = tmp_path / "storage_state.json"
+    storage.write_text('{"cookies": [{"name": "MoodleSession", "value": "s", "domain": "x", "path": "/"}]}')
+    profile = tmp_path / "chromium_profile"
+    manager = BrowserManager(storage_file=str(storage), profile_dir=str(profile), profile_max_mb=64)
+
+    with manager.page() as page:
+        context = page.context
+    with manager.page() as page:
+        assert page.context is context
+
+    assert fake.chromium.launched == []
+    assert context.user_data_dir == str(profile)
+    assert context.args == [f"--disk-cache-size={32 * 1_048_576}"]
+    assert [cookie["name"] for cookie in context.cookies] == ["MoodleSession"]
+
+    # A profile found over its limit at the periodic check is relaunched (and pruned).
+    manager.profile_max_bytes = 1
+    _fill(profile / "Default" / "Cache" / "data_1", 10)
+    manager._profile_checked_at -= 7 * 3600
+    with manager.page() as page:
+        assert page.context is not context
+    assert context.closed
+    assert not (profile / "Default" / "Cache").exists()
+    assert manager.launches == 2
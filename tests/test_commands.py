@@ -2,16 +2,21 @@ import asyncio
 import time
 
 from ues_bot.commands import (
+    BROWSER_MANAGER_KEY,
     LAST_SCRAPE_TS_KEY,
+    MOODLE_CLIENT_KEY,
     SCRAPE_LOCK_KEY,
+    cmd_detalle,
     cmd_dormir,
     cmd_estado,
     cmd_help,
     cmd_intervalo,
     cmd_stats,
+    cmd_verificar,
     run_scrape_now,
 )
 from ues_bot.config import Settings
+from ues_bot.moodle_api import MoodleClient
 from ues_bot.state import load_state, save_state
 
 
@@ -140,7 +145,7 @@ def test_run_scrape_now_wait_zero_runs_when_lock_is_free(monkeypatch):
 
     expected = (["ok"], ["changed"])
 
-    def _fake_run_scrape_cycle(_settings, _run_args):
+    def _fake_run_scrape_cycle(_settings, _run_args, _manager=None, _session=None):
         return expected
 
     monkeypatch.setattr("ues_bot.commands.run_scrape_cycle", _fake_run_scrape_cycle)
@@ -153,6 +158,43 @@ def test_run_scrape_now_wait_zero_runs_when_lock_is_free(monkeypatch):
     asyncio.run(_run_test())
 
 
+def test_run_scrape_now_uses_async_engine_when_configured(monkeypatch):
+    settings = Settings(tg_chat_id="123", scrape_engine="async")
+    app = _FakeApp(settings)
+    context = _FakeContext(app, [])
+
+    async def _fake_async_cycle(_settings, _run_args, _manager, _session=None):
+        return (["async"], [])
+
+    def _unexpected_thread_cycle(*_args):
+        raise AssertionError("thread engine should not run")
+
+    monkeypatch.setattr("ues_bot.commands.run_scrape_cycle_async", _fake_async_cycle)
+    monkeypatch.setattr("ues_bot.commands.run_scrape_cycle", _unexpected_thread_cycle)
+
+    result = asyncio.run(run_scrape_now(context, wait_for_lock_sec=0))
+    assert result == (["async"], [])
+
+
+def test_run_scrape_now_uses_ajax_engine_when_configured(monkeypatch):
+    settings = Settings(tg_chat_id="123", scrape_engine="ajax")
+    app = _FakeApp(settings)
+    context = _FakeContext(app, [])
+
+    def _fake_ajax_cycle(_settings, _run_args, client, _session=None):
+        assert client is None
+        return (["ajax"], [])
+
+    def _unexpected_thread_cycle(*_args):
+        raise AssertionError("thread engine should not run")
+
+    monkeypatch.setattr("ues_bot.commands.run_scrape_cycle_ajax", _fake_ajax_cycle)
+    monkeypatch.setattr("ues_bot.commands.run_scrape_cycle", _unexpected_thread_cycle)
+
+    result = asyncio.run(run_scrape_now(context, wait_for_lock_sec=0))
+    assert result == (["ajax"], [])
+
+
 def test_scrape_cooldown():
     from ues_bot.commands import _check_cooldown, _mark_scrape_used
 
@@ -208,6 +250,7 @@ def test_stats_shows_error_counters(tmp_path):
     metrics = state["metrics"]
     metrics["network_transient_errors"] = 2
     metrics["functional_errors"] = 3
+    metrics["short_circuit_cycles"] = 7
     save_state(settings.state_file, state)
 
     asyncio.run(cmd_stats(update, context))
@@ -217,3 +260,138 @@ def test_stats_shows_error_counters(tmp_path):
     assert "Errores funcionales" in text
     assert ">2<" in text or "<b>2</b>" in text
     assert ">3<" in text or "<b>3</b>" in text
+    assert "Ciclos sin cambios en dashboard: <b>7</b>" in text
+
+
+def test_verificar_forces_status_recheck_before_scraping(tmp_path, monkeypatch):
+    from ues_bot.models import Event
+
+    settings = Settings(tg_chat_id="123", state_file=str(tmp_path / "state.json"), tz_name="UTC")
+    app = _FakeApp(settings)
+    update = _FakeUpdate(123)
+    context = _FakeContext(app, [])
+    seen_flags = []
+
+    def _fake_run_scrape_cycle(_settings, _run_args, _manager=None, _session=None):
+        seen_flags.append(load_state(settings.state_file)["force_status_check"])
+        events = [
+            Event(event_id="1", title="A", due_text="", url="", assignment_url="https://x/1", submitted=True),
+            Event(event_id="2", title="B", due_text="", url="", assignment_url="https://x/2", submitted=False),
+        ]
+        return events, []
+
+    monkeypatch.setattr("ues_bot.commands.run_scrape_cycle", _fake_run_scrape_cycle)
+    asyncio.run(cmd_verificar(update, context))
+
+    assert seen_flags == [True]
+    text = update.effective_message.replies[-1][0]
+    assert "<b>2</b> tareas" in text
+    assert "<b>1</b> sin enviar" in text
+
+
+class _FakeMoodleClient(MoodleClient):
+    def __init__(self, pages):
+        self.pages = pages
+        self.requested = []
+
+    def get_html(self, url):
+        self.requested.append(url)
+        return self.pages[url]
+
+
+def test_detalle_fetches_missing_description_on_demand(tmp_path, monkeypatch):
+    from ues_bot.models import Event
+
+    settings = Settings(tg_chat_id="123", state_file=str(tmp_path / "state.json"), tz_name="UTC", dry_run=True)
+    app = _FakeApp(settings)
+    client = _FakeMoodleClient({"https://x/ev/1": '<div class="description-content">Leer capítulo 3</div>'})
+    app.bot_data[MOODLE_CLIENT_KEY] = client
+    sent = []
+
+    def _fake_run_scrape_cycle(_settings, _run_args, _manager=None, _session=None):
+        return [
+            Event(event_id="1", title="Lectura", due_text="", url="https://x/ev/1"),
+            Event(event_id="2", title="Otra", due_text="", url="https://x/ev/2"),
+        ], []
+
+    async def _fake_send(text, *_args, **_kwargs):
+        sent.append(text)
+
+    monkeypatch.setattr("ues_bot.commands.run_scrape_cycle", _fake_run_scrape_cycle)
+    monkeypatch.setattr("ues_bot.commands.tg_send", _fake_send)
+    context = _FakeContext(app, ["Lectura"])
+    context.bot = None
+    asyncio.run(cmd_detalle(_FakeUpdate(123), context))
+
+    assert client.requested == ["https://x/ev/1"]  # only the event shown
+    assert "Leer capítulo 3" in sent[-1]
+    assert load_state(settings.state_file)["descriptions"]["1"]["text"] == "Leer capítulo 3"
+
+
+def test_detalle_description_fetch_keeps_state_saved_meanwhile(tmp_path, monkeypatch):
+    from ues_bot.models import Event
+
+    settings = Settings(tg_chat_id="123", state_file=str(tmp_path / "state.json"), tz_name="UTC", dry_run=True)
+    app = _FakeApp(settings)
+
+    class _SlowClient(_FakeMoodleClient):
+        def get_html(self, url):
+            # A reminder job saves while the page is being fetched.
+            state = load_state(settings.state_file)
+            state["sent_reminders"] = {"1": ["24h"]}
+            save_state(settings.state_file, state)
+            return super().get_html(url)
+
+    app.bot_data[MOODLE_CLIENT_KEY] = _SlowClient({"https://x/ev/1": '<div class="description-content">Leer</div>'})
+
+    def _fake_run_scrape_cycle(_settings, _run_args, _manager=None, _session=None):
+        return [Event(event_id="1", title="Lectura", due_text="", url="https://x/ev/1")], []
+
+    async def _fake_send(*_args, **_kwargs):
+        return None
+
+    monkeypatch.setattr("ues_bot.commands.run_scrape_cycle", _fake_run_scrape_cycle)
+    monkeypatch.setattr("ues_bot.commands.tg_send", _fake_send)
+    context = _FakeContext(app, ["Lectura"])
+    context.bot = None
+    asyncio.run(cmd_detalle(_FakeUpdate(123), context))
+
+    state = load_state(settings.state_file)
+    assert state["sent_reminders"] == {"1": ["24h"]}
+    assert state["descriptions"]["1"]["text"] == "Leer"
+
+
+def test_detalle_loads_description_in_shared_browser_without_http_client(tmp_path, monkeypatch):
+    from ues_bot.browser import BrowserManager
+    from ues_bot.models import Event
+
+    settings = Settings(tg_chat_id="123", state_file=str(tmp_path / "state.json"), tz_name="UTC", dry_run=True)
+    app = _FakeApp(settings)
+    manager = BrowserManager()
+    manager.ensure_context = lambda: "context"
+    app.bot_data[BROWSER_MANAGER_KEY] = manager
+    loaded = []
+    sent = []
+
+    def _fake_fetch_pages_html(context, urls, concurrency=4):
+        loaded.append((context, urls))
+        return {url: '<div class="description-content">Leer capítulo 3</div>' for url in urls}
+
+    def _fake_run_scrape_cycle(_settings, _run_args, _manager=None, _session=None):
+        return [Event(event_id="1", title="Lectura", due_text="", url="https://x/ev/1")], []
+
+    async def _fake_send(text, *_args, **_kwargs):
+        sent.append(text)
+
+    monkeypatch.setattr("ues_bot.commands.fetch_pages_html", _fake_fetch_pages_html)
+    monkeypatch.setattr("ues_bot.commands.run_scrape_cycle", _fake_run_scrape_cycle)
+    monkeypatch.setattr("ues_bot.commands.tg_send", _fake_send)
+    context = _FakeContext(app, ["Lectura"])
+    context.bot = None
+    try:
+        asyncio.run(cmd_detalle(_FakeUpdate(123), context))
+    finally:
+        manager.shutdown()
+
+    assert loaded == [("context", ["https://x/ev/1"])]
+    assert "Leer capítulo 3" in sent[-1]
@@ -0,0 +1,59 @@
+from ues_bot.descriptions import fill_descriptions, parse_description, record_missing_descriptions
+from ues_bot.models import Event
+
+BASE = "https://ueslearning.ues.mx"
+
+CALENDAR_PAGE = """
+<a href="https://ueslearning.ues.mx/course/view.php?id=5">Cálculo</a>
+<div class="description-content"><p>Resolver la guía</p><p>Subir PDF</p></div>
+"""
+ACTIVITY_PAGE = """
+<div class="activity-header"><div class="activity-description" id="intro">
+  <div class="no-overflow"><p>Ensayo de 2 cuartillas</p></div></div></div>
+<table class="generaltable"><tr><th>Estatus de la entrega</th><td>Sin entrega</td></tr></table>
+"""
+
+
+def test_parse_description_reads_calendar_and_activity_pages():
+    assert parse_description(CALENDAR_PAGE) == "Resolver la guía\nSubir PDF"
+    assert parse_description(ACTIVITY_PAGE) == "Ensayo de 2 cuartillas"
+    assert parse_description("<html><body></body></html>") == ""
+
+
+def test_fill_descriptions_fetches_once_then_uses_cache():
+    state: dict = {}
+    calendar = Event("1", "A", "Hoy", f"{BASE}/calendar/view.php?view=day#event_1")
+    activity = Event("tl_7", "B", "Mañana", f"{BASE}/mod/assign/view.php?id=7", description="")
+    described = Event("2", "C", "Hoy", f"{BASE}/calendar/view.php?view=day#event_2", description="Ya la tengo")
+    record_missing_descriptions(state, [calendar, activity, described])
+    assert set(state["descriptions"]) == {"1", "tl_7"}
+
+    pages = {calendar.url: CALENDAR_PAGE, activity.url: ACTIVITY_PAGE}
+    requested = []
+
+    def get_html(url):
+        requested.append(url)
+        return pages[url]
+
+    assert fill_descriptions(state, [calendar, described], get_html) == 1
+    assert calendar.description == "Resolver la guía\nSubir PDF"
+    assert requested == [calendar.url]
+
+    # The next cycle rebuilds the events without descriptions: the cached text is kept.
+    fresh = Event("1", "A", "Hoy", calendar.url)
+    record_missing_descriptions(state, [fresh])
+    assert set(state["descriptions"]) == {"1"}
+    assert fill_descriptions(state, [fresh], get_html) == 0
+    assert fresh.description == "Resolver la guía\nSubir PDF"
+
+
+def test_fill_descriptions_skips_failed_pages():
+    state: dict = {}
+    event = Event("1", "A", "Hoy", f"{BASE}/calendar/view.php?view=day#event_1")
+
+    def get_html(url):
+        raise RuntimeError("timeout")
+
+    assert fill_descriptions(state, [event], get_html) == 0
+    assert event.description == ""
+    assert "text" not in state.get("descriptions", {}).get("1", {})
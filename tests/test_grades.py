@@ -0,0 +1,111 @@
+from ues_bot.grades import (
+    apply_grade_reports,
+    apply_grades_to_events,
+    courses_to_read,
+    grade_change_events,
+    grades_due,
+    parse_grade_overview,
+    parse_user_report,
+    user_report_url,
+)
+from ues_bot.models import Event
+
+BASE = "https://ueslearning.ues.mx"
+
+OVERVIEW_HTML = f"""
+<table id="overview-grade" class="generaltable boxaligncenter">
+  <thead><tr><th class="header c0">Nombre del curso</th><th class="header c1 lastcol">Calificación</th></tr></thead>
+  <tbody>
+    <tr><td class="cell c0"><a href="{BASE}/grade/report/user/index.php?id=5&amp;userid=2">Cálculo</a></td>
+        <td class="cell c1 lastcol">85,00</td></tr>
+    <tr><td class="cell c0"><a href="{BASE}/course/user.php?mode=grade&amp;id=6&amp;user=2">Física</a></td>
+        <td class="cell c1 lastcol">-</td></tr>
+  </tbody>
+</table>
+"""
+
+
+def _report(grade_10="95,00", grade_11="-") -> str:
+    return f"""
+    <table class="boxaligncenter generaltable user-grade">
+      <thead><tr><th class="header column-itemname">Ítem de calificación</th>
+                 <th class="header column-grade">Calificación</th></tr></thead>
+      <tbody>
+        <tr><th class="level1 column-itemname">Cálculo</th></tr>
+        <tr><th class="level2 column-itemname"><a class="gradeitemheader"
+              href="{BASE}/mod/assign/view.php?id=10">Act 1</a></th>
+            <td class="level2 column-grade">{grade_10}</td></tr>
+        <tr><th class="level2 column-itemname"><a class="gradeitemheader"
+              href="{BASE}/mod/quiz/view.php?id=11">Examen 1</a></th>
+            <td class="level2 column-grade">{grade_11}</td></tr>
+        <tr><th class="level1 column-itemname">Total del curso</th>
+            <td class="level1 column-grade">85,00</td></tr>
+      </tbody>
+    </table>
+    """
+
+
+def test_parse_grade_overview_reads_course_totals():
+    assert parse_grade_overview(OVERVIEW_HTML) == {"5": ("Cálculo", "85,00"), "6": ("Física", "")}
+
+
+def test_parse_user_report_skips_category_and_total_rows():
+    items = parse_user_report(_report(), "5", "Cálculo")
+
+    assert [(i.cmid, i.item_name, i.grade) for i in items] == [("10", "Act 1", "95,00"), ("11", "Examen 1", "")]
+    assert items[0].url == f"{BASE}/mod/assign/view.php?id=10"
+
+
+def test_apply_grade_reports_baseline_then_changes():
+    state: dict = {}
+    overview = parse_grade_overview(OVERVIEW_HTML)
+    assert grades_due(state, 3600) is True
+    assert courses_to_read(state, overview) == ["5", "6"]
+
+    reports = {user_report_url(BASE, "5"): _report(), user_report_url(BASE, "6"): "<html></html>"}
+    # First sync: baseline only, nothing to announce.
+    assert apply_grade_reports(state, overview, reports, BASE, now=1000) == []
+    assert grades_due(state, 3600, now=2000) is False
+    assert courses_to_read(state, overview, now=2000) == []
+
+    # A course total moved: only that course is re-read.
+    overview["5"] = ("Cálculo", "90,00")
+    assert courses_to_read(state, overview, now=2000) == ["5"]
+    changed = apply_grade_reports(
+        state, overview, {user_report_url(BASE, "5"): _report(grade_11="80,00")}, BASE, now=2000
+    )
+    assert [(i.cmid, i.grade) for i in changed] == [("11", "80,00")]
+    # A day later every course is read again.
+    assert courses_to_read(state, overview, now=1000 + 24 * 3600) == ["5", "6"]
+
+
+def test_failed_report_keeps_course_for_retry():
+    state: dict = {}
+    overview = parse_grade_overview(OVERVIEW_HTML)
+    apply_grade_reports(state, overview, {user_report_url(BASE, "5"): RuntimeError("timeout")}, BASE, now=1000)
+
+    assert "5" not in state["grades"]["courses"]
+    assert "full_at" not in state["grades"]
+    assert "5" in courses_to_read(state, overview, now=1000)
+
+
+def test_grade_change_events_split_dashboard_and_past_activities():
+    state: dict = {}
+    overview = parse_grade_overview(OVERVIEW_HTML)
+    apply_grade_reports(state, overview, {user_report_url(BASE, "5"): _report(grade_10="-")}, BASE, now=1000)
+    changed = apply_grade_reports(
+        state, overview, {user_report_url(BASE, "5"): _report(grade_11="70,00")}, BASE, now=2000
+    )
+    on_dashboard = Event("1", "Act 1", "Hoy, 23:59", "u", assignment_url=f"{BASE}/mod/assign/view.php?id=10")
+
+    graded, standalone = grade_change_events(changed, [on_dashboard])
+
+    assert graded == [on_dashboard]
+    assert on_dashboard.grading_status == "Calificado: 95,00"
+    assert [(e.event_id, e.title, e.grading_status) for e in standalone] == [
+        ("grade_5_11", "Examen 1", "Calificado: 70,00")
+    ]
+
+    fresh = Event("1", "Act 1", "Hoy, 23:59", "u", assignment_url=f"{BASE}/mod/assign/view.php?id=10")
+    apply_grades_to_events(state, [fresh])
+    assert fresh.grading_status == "Calificado: 95,00"
@@ -0,0 +1,88 @@
+from ues_bot.identity import event_module_id, resolve_event_ids
+from ues_bot.models import Event
+from ues_bot.scrape import canonical_event_id
+from ues_bot.state import load_state, migrate_event_keys
+
+BASE = "https://ueslearning.ues.mx"
+
+
+def _calendar(event_id, title, assignment_url=""):
+    url = f"{BASE}/calendar/view.php?view=day&time=1772605260#event_{event_id}"
+    return Event(event_id, title, "Hoy, 23:59", url, assignment_url=assignment_url)
+
+
+def _activity(cmid, title):
+    url = f"{BASE}/mod/assign/view.php?id={cmid}"
+    return Event(canonical_event_id("", cmid, url), title, "8 de marzo", url, course_name="Cálculo", assignment_url=url)
+
+
+def test_canonical_event_id_prefers_calendar_id():
+    assert canonical_event_id("101854", "7", "x") == "101854"
+    assert canonical_event_id("", "7", "x") == "cm_7"
+    assert canonical_event_id("", "", "x") == "x"
+    assert event_module_id(_activity("7", "T")) == "7"
+    assert event_module_id(_calendar("1", "T")) == ""
+
+
+def test_resolve_folds_activity_listing_into_its_calendar_event(tmp_path):
+    state = load_state(str(tmp_path / "state.json"))
+    upcoming = _calendar("101854", "Tarea 3", assignment_url=f"{BASE}/mod/assign/view.php?id=7")
+    timeline = _activity("7", "Tarea 3: Integrales")
+
+    events = resolve_event_ids(state, [upcoming, timeline, _calendar("2", "Otra")])
+
+    assert [e.event_id for e in events] == ["101854", "2"]
+    assert events[0].course_name == "Cálculo"
+    assert state["event_modules"] == {"101854": "7"}
+
+    # Next cycle the event page is not read again: the index joins them.
+    fresh = resolve_event_ids(state, [_calendar("101854", "Tarea 3"), _activity("7", "Tarea 3: Integrales")])
+    assert [e.event_id for e in fresh] == ["101854"]
+    assert fresh[0].assignment_url.endswith("id=7")
+
+
+def test_resolve_keeps_events_sharing_a_module_apart(tmp_path):
+    state = load_state(str(tmp_path / "state.json"))
+    quiz = f"{BASE}/mod/quiz/view.php?id=30"
+    opens, closes = _calendar("5", "Cuestionario abre", quiz), _calendar("6", "Cuestionario cierra", quiz)
+
+    events = resolve_event_ids(state, [opens, closes, _activity("30", "Cuestionario")])
+
+    assert [e.event_id for e in events] == ["5", "6", "cm_30"]
+
+
+def test_resolve_migrates_state_from_legacy_ids(tmp_path):
+    state = load_state(str(tmp_path / "state.json"))
+    state["events"] = {"tl_7": {"title": "Tarea 3", "due_text": "Hoy, 23:59", "url": "u"}}
+    state["status_checks"] = {"tl_7": {"submitted": True}}
+    state["sent_reminders"] = {"tl_7": ["24h"], "101854": ["6h"]}
+
+    resolve_event_ids(state, [_calendar("101854", "Tarea 3", assignment_url=f"{BASE}/mod/assign/view.php?id=7")])
+
+    assert set(state["events"]) == {"101854"}
+    assert state["status_checks"] == {"101854": {"submitted": True}}
+    assert state["sent_reminders"] == {"101854": ["6h", "24h"]}
+
+
+def test_migrate_event_keys_keeps_entries_under_the_new_id(tmp_path):
+    state = load_state(str(tmp_path / "state.json"))
+    state["events"] = {"old": {"title": "viejo"}, "new": {"title": "nuevo"}, "gone": {"title": "x"}}
+    state["descriptions"] = {"gone": {"url": "u", "text": "t"}}
+
+    assert migrate_event_keys(state, {"old": "new", "gone": "moved"}) == 2
+    assert state["events"] == {"new": {"title": "nuevo"}, "moved": {"title": "x"}}
+    assert state["descriptions"] == {"moved": {"url": "u", "text": "t"}}
+
+
+def test_resolve_migrates_legacy_timeline_only_entries(tmp_path):
+    state = load_state(str(tmp_path / "state.json"))
+    state["events"] = {"tl_5": {"title": "Tarea 5", "due_text": "8 de marzo", "url": "u"}}
+    state["sent_reminders"] = {"tl_5": ["24h"]}
+    state["status_checks"] = {"tl_5": {"submitted": False}}
+
+    events = resolve_event_ids(state, [_activity("5", "Tarea 5")])
+
+    assert [e.event_id for e in events] == ["cm_5"]
+    assert set(state["events"]) == {"cm_5"}
+    assert state["sent_reminders"] == {"cm_5": ["24h"]}
+    assert state["status_checks"] == {"cm_5": {"submitted": False}}
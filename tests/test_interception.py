@@ -0,0 +1,101 @@
+import asyncio
+
+from ues_bot.config import from_env
+from ues_bot.interception import RequestBlocker, build_request_blocker
+
+
+class _FakeRequest:
+    def __init__(self, resource_type, url):
+        self.resource_type = resource_type
+        self.url = url
+
+
+class _FakeRoute:
+    def __init__(self, resource_type, url):
+        self.request = _FakeRequest(resource_type, url)
+        self.outcome = None
+
+    def abort(self, error_code=None):
+        self.outcome = "abort"
+
+    def continue_(self):
+        self.outcome = "continue"
+
+
+class _FakeAsyncRoute(_FakeRoute):
+    async def abort(self, error_code=None):
+        self.outcome = "abort"
+
+    async def continue_(self):
+        self.outcome = "continue"
+
+
+BASE = "https://ueslearning.ues.mx"
+
+
+def test_default_policy_keeps_documents_scripts_and_ajax():
+    blocker = RequestBlocker()
+
+    assert blocker.should_block("image", f"{BASE}/theme/image.php/moove/core/1/logo") is True
+    assert blocker.should_block("font", f"{BASE}/theme/font.php/moove/core/1/fa.woff2") is True
+    assert blocker.should_block("stylesheet", f"{BASE}/theme/styles.php/moove/1/all") is True
+    assert blocker.should_block("script", "https://www.googletagmanager.com/gtag/js?id=G-1") is True
+
+    assert blocker.should_block("document", f"{BASE}/my/") is False
+    assert blocker.should_block("script", f"{BASE}/lib/requirejs.php/1/core/first.js") is False
+    assert blocker.should_block("xhr", f"{BASE}/lib/ajax/service.php?sesskey=x") is False
+
+
+def test_document_and_xhr_are_never_blocked():
+    blocker = RequestBlocker(resource_types=["document", "xhr", "image"], url_patterns=["ues.mx"])
+
+    assert blocker.should_block("document", f"{BASE}/my/") is False
+    assert blocker.should_block("xhr", f"{BASE}/lib/ajax/service.php") is False
+    assert blocker.should_block("image", f"{BASE}/pix/a.png") is True
+
+
+def test_handle_counts_blocked_requests_and_take_stats_resets():
+    blocker = RequestBlocker()
+    routes = [
+        _FakeRoute("image", f"{BASE}/a.png"),
+        _FakeRoute("image", f"{BASE}/b.png"),
+        _FakeRoute("font", f"{BASE}/f.woff2"),
+        _FakeRoute("document", f"{BASE}/my/"),
+    ]
+    for route in routes:
+        blocker.handle(route)
+
+    assert [r.outcome for r in routes] == ["abort", "abort", "abort", "continue"]
+    stats = blocker.take_stats()
+    assert stats["blocked_requests"] == 3
+    assert stats["allowed_requests"] == 1
+    assert stats["blocked_by_type"] == {"image": 2, "font": 1}
+    assert stats["estimated_bytes_saved"] > 0
+    assert blocker.take_stats()["blocked_requests"] == 0
+
+
+def test_handle_async_aborts_and_continues():
+    blocker = RequestBlocker()
+    blocked = _FakeAsyncRoute("stylesheet", f"{BASE}/all.css")
+    allowed = _FakeAsyncRoute("script", f"{BASE}/lib/javascript.php/1/x.js")
+
+    async def _run():
+        await blocker.handle_async(blocked)
+        await blocker.handle_async(allowed)
+
+    asyncio.run(_run())
+    assert (blocked.outcome, allowed.outcome) == ("abort", "continue")
+
+
+def test_blocker_settings_from_env(monkeypatch):
+    monkeypatch.setenv("UES_BLOCK_RESOURCE_TYPES", "image, media")
+    monkeypatch.setenv("UES_BLOCK_URL_PATTERNS", "Hotjar.com,")
+    settings = from_env()
+
+    blocker = build_request_blocker(settings)
+    assert settings.block_resource_types == ("image", "media")
+    assert blocker.should_block("font", f"{BASE}/f.woff2") is False
+    assert blocker.should_block("script", "https://static.hotjar.com/c/h.js") is True
+
+    monkeypatch.setenv("UES_BLOCK_RESOURCES", "false")
+    assert build_request_blocker(from_env()) is None
@@ -1,10 +1,13 @@
 import asyncio
+import time
 from types import SimpleNamespace
 
 import main
 from telegram.error import NetworkError
-from ues_bot.commands import ScrapeAlreadyRunningError
+from ues_bot.commands import MOODLE_CLIENT_KEY, SCRAPE_LOCK_KEY, ScrapeAlreadyRunningError
 from ues_bot.config import Settings
+from ues_bot.models import Event
+from ues_bot.moodle_api import MoodleClient
 from ues_bot.state import load_state, save_state
 
 
@@ -108,3 +111,173 @@ def test_periodic_scrape_job_marks_functional_error_metric(tmp_path, monkeypatch
     assert updated_state["last_error_kind"] == "functional"
     assert updated_state["metrics"]["functional_errors"] == 1
     assert updated_state["metrics"]["network_transient_errors"] == 0
+
+
+def test_periodic_scrape_job_keeps_the_state_the_cycle_saved(tmp_path, monkeypatch):
+    settings = Settings(
+        tg_bot_token="token",
+        tg_chat_id="123",
+        state_file=str(tmp_path / "state.json"),
+        quiet_start="",
+        quiet_end="",
+    )
+    state = load_state(settings.state_file)
+    state["consecutive_errors"] = 2
+    save_state(settings.state_file, state)
+    fail = False
+
+    async def _fake_run_scrape_now(_context, wait_for_lock_sec=0):
+        cycle_state = load_state(settings.state_file)
+        cycle_state["events"] = {"1": {"title": "Tarea"}}
+        cycle_state["enrichment_cache"] = {"1": {"course_name": "Cálculo"}}
+        cycle_state["status_checks"] = {"1": {"submitted": True}}
+        cycle_state["grades"] = {"items": {"7": "10"}}
+        save_state(settings.state_file, cycle_state)
+        if fail:
+            raise RuntimeError("fallo scrape")
+        return [], []
+
+    async def _fake_tg_send(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(main, "run_scrape_now", _fake_run_scrape_now)
+    monkeypatch.setattr(main, "tg_send", _fake_tg_send)
+    context = _FakeContext(settings)
+    context.job_queue = None
+
+    for fail in (False, True):
+        asyncio.run(main.periodic_scrape_job(context))
+        updated = load_state(settings.state_file)
+        assert updated["events"] == {"1": {"title": "Tarea"}}
+        assert updated["enrichment_cache"] == {"1": {"course_name": "Cálculo"}}
+        assert updated["status_checks"] == {"1": {"submitted": True}}
+        assert updated["grades"] == {"items": {"7": "10"}}
+        assert updated["consecutive_errors"] == (1 if fail else 0)
+
+
+class _FakeJob:
+    def __init__(self, callback, when, data, name):
+        self.callback, self.when, self.data, self.name = callback, when, data, name
+        self.removed = False
+
+    def schedule_removal(self):
+        self.removed = True
+
+
+class _FakeJobQueue:
+    def __init__(self):
+        self.jobs = []
+
+    def run_once(self, callback, when, data=None, name=None):
+        self.jobs.append(_FakeJob(callback, when, data, name))
+
+    def get_jobs_by_name(self, name):
+        return [job for job in self.jobs if job.name == name and not job.removed]
+
+
+class _FakeMoodleClient(MoodleClient):
+    def __init__(self, pages):
+        self.pages = pages
+
+    def get_html(self, url):
+        return self.pages[url]
+
+
+SUBMITTED_PAGE = (
+    '<table class="generaltable"><tr><th>Estatus de la entrega</th>'
+    '<td class="submissionstatussubmitted">Enviado para calificar</td></tr></table>'
+)
+
+
+def _due_event(event_id, due, assignment_url):
+    return Event(event_id, f"Tarea {event_id}", "", f"https://x/ev?time={due}", assignment_url=assignment_url)
+
+
+def test_reminder_prefetch_refreshes_status_before_the_threshold(tmp_path, monkeypatch):
+    settings = Settings(
+        tg_bot_token="token",
+        tg_chat_id="123",
+        state_file=str(tmp_path / "state.json"),
+        quiet_start="",
+        quiet_end="",
+        scrape_interval_min=60,
+        reminder_prefetch_min=5,
+    )
+    now = int(time.time())
+    submitted_meanwhile = _due_event("1", now + 24 * 3600 + 1800, "https://x/mod/assign/view.php?id=1")
+    later = _due_event("2", now + 24 * 3600 + 3 * 3600, "https://x/mod/assign/view.php?id=2")
+    queue = _FakeJobQueue()
+
+    # Only the crossing before the next cycle (+ lead) is prefetched.
+    assert main.schedule_reminder_prefetch(queue, settings, [submitted_meanwhile, later], {}, now=now) == 1
+    job = queue.jobs[0]
+    assert job.callback is main.reminder_prefetch_job
+    assert job.when == 1800 - 300
+    assert job.data["events"] == [submitted_meanwhile]
+
+    sent = []
+
+    async def _fake_tg_send(text, *args, **kwargs):
+        sent.append(text)
+
+    monkeypatch.setattr(main, "tg_send", _fake_tg_send)
+    context = _FakeContext(settings)
+    context.job_queue = queue
+    context.job = job
+    context.application.bot_data[MOODLE_CLIENT_KEY] = _FakeMoodleClient(
+        {"https://x/mod/assign/view.php?id=1": SUBMITTED_PAGE}
+    )
+    asyncio.run(main.reminder_prefetch_job(context))
+
+    assert submitted_meanwhile.submitted is True
+    assert load_state(settings.state_file)["status_checks"]["1"]["submitted"] is True
+    send = queue.jobs[-1]
+    assert send.callback is main.reminder_send_job
+    context.job = send
+    asyncio.run(main.reminder_send_job(context))
+    assert sent == []  # no "pendiente" reminder for work already submitted
+
+    # Rescheduling after the next cycle replaces pending prefetch jobs.
+    main.schedule_reminder_prefetch(queue, settings, [later], {}, now=now + 2 * 3600)
+    assert [j.data["events"] for j in queue.get_jobs_by_name(main.REMINDER_PREFETCH_JOB_NAME)] == [[later]]
+
+
+def test_reminder_send_waits_for_a_running_cycle_and_keeps_its_labels(tmp_path, monkeypatch):
+    settings = Settings(
+        tg_bot_token="token",
+        tg_chat_id="123",
+        state_file=str(tmp_path / "state.json"),
+        quiet_start="",
+        quiet_end="",
+    )
+    now = int(time.time())
+    event = _due_event("1", now + 23 * 3600, "https://x/mod/assign/view.php?id=1")
+    sent = []
+
+    async def _fake_tg_send(text, *args, **kwargs):
+        sent.append(text)
+
+    monkeypatch.setattr(main, "tg_send", _fake_tg_send)
+    context = _FakeContext(settings)
+    context.job = SimpleNamespace(data=[event])
+    lock = asyncio.Lock()
+    context.application.bot_data[SCRAPE_LOCK_KEY] = lock
+
+    async def _cycle_holding_stale_state():
+        async with lock:
+            stale = load_state(settings.state_file)
+            await asyncio.sleep(0.05)
+            save_state(settings.state_file, stale)
+
+    async def _run():
+        cycle = asyncio.create_task(_cycle_holding_stale_state())
+        await asyncio.sleep(0)
+        await main.reminder_send_job(context)
+        await cycle
+
+    asyncio.run(_run())
+
+    assert len(sent) == 1
+    assert load_state(settings.state_file)["sent_reminders"] == {"1": ["24h"]}
+    asyncio.run(main.reminder_send_job(context))
+    assert len(sent) == 1
@@ -0,0 +1,267 @@
+import json
+import os
+import time
+
+import pytest
+
+from ues_bot.config import Settings
+from ues_bot.moodle_api import (
+    MoodleClient,
+    action_events_from_service_call,
+    MoodleSessionExpired,
+    event_from_action_event,
+    fetch_dashboard_events,
+    fetch_timeline_window,
+    format_due_text,
+    load_session_cookies,
+    submission_from_status,
+    sync_timeline,
+    timeline_events_from_items,
+)
+from ues_bot.scrape_job import run_scrape_cycle_ajax
+from ues_bot.state import load_state
+
+from .moodle_stub import MoodleStub
+
+
+def _settings(stub, tmp_path):
+    return Settings(
+        base=stub.base,
+        dashboard_url=f"{stub.base}/my/",
+        state_file=str(tmp_path / "state.json"),
+        storage_file=str(tmp_path / "storage_state.json"),
+        scrape_engine="ajax",
+    )
+
+
+def test_load_session_cookies_filters_by_host(tmp_path):
+    storage = tmp_path / "storage_state.json"
+    storage.write_text(
+        json.dumps({
+            "cookies": [
+                {"name": "MoodleSession", "value": "abc", "domain": "ueslearning.ues.mx"},
+                {"name": "_ga", "value": "x", "domain": ".google.com"},
+            ]
+        }),
+        encoding="utf-8",
+    )
+
+    assert load_session_cookies(str(storage), "https://ueslearning.ues.mx") == {"MoodleSession": "abc"}
+    assert load_session_cookies(str(tmp_path / "missing.json"), "https://ueslearning.ues.mx") == {}
+
+
+def test_event_from_action_event_maps_timeline_json():
+    ts = int(time.mktime((2026, 3, 8, 23, 59, 0, 0, 0, -1)))
+    item = {
+        "id": 77,
+        "name": "Tarea 1 vence",
+        "description": "<p>Leer <b>cap. 2</b></p><p>Entregar &amp; comentar</p>",
+        "timesort": ts,
+        "course": {"fullnamedisplay": "Cálculo"},
+        "url": "https://ueslearning.ues.mx/mod/assign/view.php?id=10",
+        "viewurl": "https://ueslearning.ues.mx/calendar/view.php?view=day#event_77",
+    }
+
+    event = event_from_action_event(item, "America/Mazatlan")
+
+    assert event.event_id == "77"
+    assert event_from_action_event({**item, "id": None}, "UTC").event_id == "cm_10"
+    assert event.course_name == "Cálculo"
+    assert event.assignment_url.endswith("/mod/assign/view.php?id=10")
+    assert event.description == "Leer cap. 2\nEntregar & comentar"
+    assert event.due_text == format_due_text(ts, "America/Mazatlan")
+
+
+def test_action_events_from_captured_service_batch():
+    item = {"id": 7, "name": "Tarea", "timesort": 1772605140, "url": "https://x/mod/assign/view.php?id=10"}
+    calls = [
+        {"index": 0, "methodname": "core_course_get_enrolled_courses_by_timeline_classification", "args": {}},
+        {"index": 1, "methodname": "core_calendar_get_action_events_by_timesort", "args": {}},
+    ]
+
+    ok = [{"error": False, "data": {}}, {"error": False, "data": {"events": [item]}}]
+    assert action_events_from_service_call(calls, ok) == [item]
+    assert action_events_from_service_call(calls, [{"error": False}, {"error": True, "exception": {}}]) is None
+    assert action_events_from_service_call(calls[:1], [{"error": False, "data": {}}]) is None
+    assert action_events_from_service_call(None, None) is None
+
+    [event] = timeline_events_from_items([item], "UTC")
+    assert event.event_id == "7"
+    assert event.due_text == "4 de marzo de 2026, 06:19"
+
+
+def test_submission_from_status_maps_moodle_states():
+    assert submission_from_status(
+        {"lastattempt": {"submission": {"status": "submitted"}, "gradingstatus": "graded"}}
+    ) == (True, "Enviado para calificar", "Calificado")
+    assert submission_from_status({"lastattempt": {"submission": {"status": "new"}}})[0] is False
+    assert submission_from_status({})[0] is None
+
+
+def test_fetch_dashboard_events_batches_status_calls(tmp_path):
+    with MoodleStub() as stub:
+        stub.write_storage_state(tmp_path / "storage_state.json")
+        client = MoodleClient(stub.base, str(tmp_path / "storage_state.json"))
+        try:
+            events = fetch_dashboard_events(client, "America/Mazatlan")
+        finally:
+            client.close()
+
+    assert [e.event_id for e in events] == ["1501", "1502", "1503"]
+    assert [e.course_name for e in events] == ["Cálculo Integral", "Física I", "Química"]
+    assert events[0].submitted is True
+    assert events[0].grading_status == "No calificado"
+    assert events[1].submitted is False
+    assert events[2].submitted is None  # quiz: no assignment status
+    # Timeline + both submission statuses in two service.php round trips.
+    assert stub.ajax_batches == [
+        ["core_calendar_get_action_events_by_timesort"],
+        ["mod_assign_get_submission_status", "mod_assign_get_submission_status"],
+    ]
+
+
+def test_fetch_dashboard_events_falls_back_to_assignment_html(tmp_path):
+    with MoodleStub(failing_methods={"mod_assign_get_submission_status"}) as stub:
+        stub.write_storage_state(tmp_path / "storage_state.json")
+        client = MoodleClient(stub.base, str(tmp_path / "storage_state.json"))
+        try:
+            events = fetch_dashboard_events(client, "America/Mazatlan")
+        finally:
+            client.close()
+
+    assert events[1].submitted is False
+    assert events[1].submission_status == "Sin entrega"
+    # Page for id=10 is not recorded: that event just stays undetected.
+    assert events[0].submitted is None
+
+
+def _add_far_event(stub, event_id=1504, days=40):
+    item = dict(stub.data["action_events"][2], id=event_id, name="Proyecto final")
+    item["timesort"] = int(stub.data["recorded_at"]) + days * 86400
+    stub.data["action_events"].append(item)
+
+
+def test_fetch_timeline_window_follows_aftereventid_cursor(tmp_path):
+    with MoodleStub() as stub:
+        stub.write_storage_state(tmp_path / "storage_state.json")
+        client = MoodleClient(stub.base, str(tmp_path / "storage_state.json"))
+        now = int(time.time())
+        try:
+            items, pages = fetch_timeline_window(client, now - 86400, now + 30 * 86400, page_size=2)
+        finally:
+            client.close()
+
+    assert [item["id"] for item in items] == [1501, 1502, 1503]
+    assert pages == 2
+    assert len(stub.ajax_batches) == 2
+
+
+def test_sync_timeline_only_rereads_near_window_and_new_horizon(tmp_path):
+    with MoodleStub() as stub:
+        _add_far_event(stub)
+        stub.write_storage_state(tmp_path / "storage_state.json")
+        client = MoodleClient(stub.base, str(tmp_path / "storage_state.json"))
+        cache: dict = {}
+        now = int(time.time())
+        sync = lambda when, full_sync_sec=86400: sync_timeline(  # noqa: E731
+            client, cache, overdue_days=14, days_ahead=60, full_sync_sec=full_sync_sec, now=when
+        )
+        try:
+            first = sync(now)
+            assert [item["id"] for item in first] == [1501, 1502, 1503, 1504]
+            assert cache["full_sync_at"] == now
+
+            # Far event changed server-side: incremental syncs keep the cached
+            # copy, near-window changes are picked up immediately.
+            stub.data["action_events"] = [e for e in stub.data["action_events"] if e["id"] not in (1502, 1504)]
+            stub.ajax_batches.clear()
+            second = sync(now + 3600)
+            assert [item["id"] for item in second] == [1501, 1503, 1504]
+            assert len(stub.ajax_batches) == 2  # near window + the hour the horizon moved
+
+            third = sync(now + 7200, full_sync_sec=0)
+            assert [item["id"] for item in third] == [1501, 1503]
+        finally:
+            client.close()
+
+
+def test_client_raises_session_expired_without_cookies(tmp_path):
+    with MoodleStub() as stub:
+        client = MoodleClient(stub.base, str(tmp_path / "missing.json"))
+        try:
+            with pytest.raises(MoodleSessionExpired):
+                client.get_action_events(timesortfrom=0)
+        finally:
+            client.close()
+
+
+def test_client_picks_up_cookies_written_by_a_later_login(tmp_path):
+    storage = tmp_path / "storage_state.json"
+    storage.write_text(json.dumps({"cookies": []}), encoding="utf-8")
+    with MoodleStub() as stub:
+        client = MoodleClient(stub.base, str(storage))
+        try:
+            with pytest.raises(MoodleSessionExpired):
+                client.get_action_events(timesortfrom=0)
+            # A browser login elsewhere rewrites the storage file; no explicit reload.
+            stub.write_storage_state(storage)
+            stat = storage.stat()
+            os.utime(storage, (stat.st_atime, stat.st_mtime + 5))
+            assert "events" in client.get_action_events(timesortfrom=0)
+        finally:
+            client.close()
+
+
+def test_run_scrape_cycle_ajax_produces_events_and_metrics(tmp_path):
+    with MoodleStub() as stub:
+        settings = _settings(stub, tmp_path)
+        stub.write_storage_state(settings.storage_file)
+
+        started = time.perf_counter()
+        events, changed = run_scrape_cycle_ajax(settings)
+        elapsed = time.perf_counter() - started
+
+        _, changed_again = run_scrape_cycle_ajax(settings)
+
+    assert len(events) == 3
+    assert len(changed) == 3
+    assert changed_again == []
+    assert elapsed < 5
+    state = load_state(settings.state_file)
+    assert state["metrics"]["successful_scrapes"] == 2
+    assert set(state["events"]) == {"1501", "1502", "1503"}
+
+
+def test_run_scrape_cycle_ajax_tracks_whole_timeline_window(tmp_path):
+    with MoodleStub() as stub:
+        _add_far_event(stub, days=90)
+        settings = _settings(stub, tmp_path)
+        stub.write_storage_state(settings.storage_file)
+
+        settings.timeline_days_ahead = 30
+        month, _ = run_scrape_cycle_ajax(settings)
+        settings.timeline_days_ahead = 120
+        term, changed = run_scrape_cycle_ajax(settings)
+
+    assert [e.event_id for e in month] == ["1501", "1502", "1503"]
+    assert [e.event_id for e in term] == ["1501", "1502", "1503", "1504"]
+    assert [e.event_id for e in changed] == ["1504"]
+    assert term[3].title == "Proyecto final"
+    assert set(load_state(settings.state_file)["timeline"]["items"]) == {"1501", "1502", "1503", "1504"}
+
+
+def test_run_scrape_cycle_ajax_logs_in_with_browser_when_session_invalid(tmp_path, monkeypatch):
+    with MoodleStub() as stub:
+        settings = _settings(stub, tmp_path)
+        logins = []
+
+        def _fake_login(cfg, headful):
+            logins.append(headful)
+            stub.write_storage_state(cfg.storage_file)
+
+        monkeypatch.setattr("ues_bot.scrape_job._refresh_session_with_browser", _fake_login)
+        events, _ = run_scrape_cycle_ajax(settings)
+
+    assert logins == [False]
+    assert len(events) == 3
+    assert stub.requests[0].startswith("/my/")  # the stale session was detected first
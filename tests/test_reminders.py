@@ -1,7 +1,8 @@
 import time
 
 from ues_bot.models import Event
-from ues_bot.reminders import get_pending_reminders
+from ues_bot.reminders import get_pending_reminders, next_reminder_crossings
+from ues_bot.summary import due_unix
 
 
 def _make_event(due_offset_sec: int, submitted=False):
@@ -39,3 +40,17 @@ def test_reminder_at_1h():
     event = _make_event(due_offset_sec=50 * 60)
     reminders = get_pending_reminders([event], sent_reminders={})
     assert any(reminder[1] == "1h" for reminder in reminders)
+
+
+def test_next_reminder_crossings_picks_next_unsent_threshold():
+    now = int(time.time())
+    far = _make_event(due_offset_sec=30 * 3600)
+    near = _make_event(due_offset_sec=5 * 3600)
+    near.event_id = "ev2"
+    done = _make_event(due_offset_sec=2 * 3600, submitted=True)
+
+    crossings = next_reminder_crossings([far, near, done], {"ev2": ["24h", "6h"]}, now=now)
+
+    assert [(event.event_id, label) for event, label, _ in crossings] == [("ev1", "24h"), ("ev2", "1h")]
+    assert crossings[0][2] == due_unix(far) - 24 * 3600
+    assert crossings[1][2] == due_unix(near) - 3600
@@ -0,0 +1,1139 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager, contextmanager
+from types import SimpleNamespace
+
+from ues_bot.browser import DashboardTab
+from ues_bot.config import Settings
+from ues_bot.interception import RequestBlocker
+from ues_bot.scrape import (
+    DASHBOARD_REFRESH_JS,
+    FETCH_PAGES_JS,
+    LoginRedirectError,
+    fetch_pages_html,
+    fetch_pages_html_async,
+    fetch_pages_http,
+    fetch_pages_http_async,
+)
+from ues_bot import scrape_job
+from ues_bot.models import Event
+from ues_bot.scrape_job import (
+    _dashboard_fingerprint,
+    _status_recheck_interval,
+    run_scrape_cycle,
+    run_scrape_cycle_async,
+)
+from ues_bot.session import SessionTracker
+from ues_bot.state import load_state, request_status_recheck, save_state
+
+BASE = "https://ueslearning.ues.mx"
+DASHBOARD = f"{BASE}/my/"
+
+
+def _upcoming(event_id: str, title: str) -> str:
+    return f"""
+    <div class="event" data-region="event-item">
+      <h6><a data-action="view-event" data-event-id="{event_id}"
+             href="{BASE}/calendar/view.php?view=day&amp;time=1772605260#event_{event_id}">{title}</a></h6>
+      <div class="date small"><a>Hoy</a>, 23:59</div>
+    </div>
+    """
+
+
+def _event_page(course: str, cmid: str, course_id: str = "") -> str:
+    return f"""
+    <a href="{BASE}/course/view.php?id={course_id or cmid}">{course}</a>
+    <div class="description-content">Descripción {cmid}</div>
+    <a class="card-link" href="{BASE}/mod/assign/view.php?id={cmid}">Ir a la actividad</a>
+    """
+
+
+SUBMITTED_PAGE = (
+    '<table class="generaltable"><tr><th>Estatus de la entrega</th>'
+    '<td class="submissionstatussubmitted">Enviado para calificar</td></tr>'
+    "<tr><th>Estatus de calificación</th><td>No calificado</td></tr></table>"
+)
+PENDING_PAGE = (
+    '<table class="generaltable"><tr><th>Estatus de la entrega</th>'
+    '<td class="submissionstatusnosubmission">Sin entrega</td></tr></table>'
+)
+
+
+class _FakeSite:
+    def __init__(self, pages, failing=()):
+        self.pages = dict(pages)
+        self.failing = set(failing)
+        self.redirects = {}
+        self.visits = []
+        self.logins = 0
+        self.timeline = None  # JSON items the dashboard's timeline AJAX call returns
+        self.selector_waits = 0
+        self.dom = {}  # url -> what the in-page extraction script returns there
+        self.contents = 0
+        self.refreshes = []  # timeline args of each in-place dashboard refresh
+        self.fetch_batches = []  # URLs of each ``FETCH_PAGES_JS`` call made from a tab
+
+    def load(self, url):
+        self.visits.append(url)
+        if url in self.failing:
+            raise RuntimeError(f"net::ERR_FAILED {url}")
+        return self.redirects.get(url, url)
+
+    def fetch(self, urls):
+        """What ``FETCH_PAGES_JS`` returns in a tab on the site."""
+        self.fetch_batches.append(list(urls))
+        results = []
+        for url in urls:
+            try:
+                final_url = self.load(url)
+            except RuntimeError as ex:
+                results.append({"url": url, "status": 0, "ok": False, "body": "", "error": str(ex)})
+                continue
+            body = "<form id='login'></form>" if final_url != url else self.pages.get(url, "<html></html>")
+            results.append({"url": final_url, "status": 200, "ok": True, "body": body})
+        return results
+
+    def log_in(self):
+        """Submitting the login form revives the session."""
+        self.logins += 1
+        self.redirects.clear()
+
+    def refresh_dashboard(self, arg):
+        """What ``DASHBOARD_REFRESH_JS`` returns in a kept dashboard tab."""
+        self.refreshes.append(arg["args"])
+        if DASHBOARD in self.redirects:
+            return {"ok": False, "reason": "login"}
+        return {"ok": True, "items": list(self.timeline or ())}
+
+
+class _FakeTimelineResponse:
+    url = f"{BASE}/lib/ajax/service.php?sesskey=k&info=core_calendar_get_action_events_by_timesort"
+
+    def __init__(self, items):
+        self.request = SimpleNamespace(
+            post_data_json=[{"index": 0, "methodname": "core_calendar_get_action_events_by_timesort", "args": {}}]
+        )
+        self.payload = [{"error": False, "data": {"events": items}}]
+
+    def json(self):
+        return self.payload
+
+
+def _timeline_response(site, predicate):
+    """What ``expect_response`` resolves to once the page body ran (raises like a timeout)."""
+    if site.timeline is None:
+        raise TimeoutError("Timeout 8000ms exceeded while waiting for event \"response\"")
+    response = _FakeTimelineResponse(site.timeline)
+    assert predicate(response)
+    return response
+
+
+class _FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.url = "about:blank"
+        self._target = None
+        self.closed = False
+
+    def goto(self, url, wait_until=None, timeout=None):
+        self.url = self.context.site.load(url)
+
+    def evaluate(self, script, url=None):
+        if script == DASHBOARD_REFRESH_JS:
+            return self.context.site.refresh_dashboard(url)
+        if script == FETCH_PAGES_JS:
+            if not hasattr(self.context, "request"):
+                raise RuntimeError("TypeError: Failed to fetch")  # sites built without HTTP support
+            return self.context.site.fetch(url)
+        if url is None:
+            return self.context.site.dom[self.url]
+        self._target = url
+
+    def wait_for_url(self, _predicate, wait_until=None, timeout=None):
+        self.url = self.context.site.load(self._target)
+
+    def wait_for_selector(self, _selector, timeout=None):
+        self.context.site.selector_waits += 1
+        return None
+
+    @contextmanager
+    def expect_response(self, predicate, timeout=None):
+        info = SimpleNamespace()
+        yield info
+        info.value = _timeline_response(self.context.site, predicate)
+
+    def fill(self, _selector, _value):
+        return None
+
+    def click(self, _selector):
+        self.context.site.log_in()
+        self.url = DASHBOARD
+
+    def wait_for_load_state(self, _state=None):
+        return None
+
+    def content(self):
+        self.context.site.contents += 1
+        return self.context.site.pages.get(self.url, "<html></html>")
+
+    def close(self):
+        self.closed = True
+
+    def is_closed(self):
+        return self.closed
+
+
+class _FakeResponse:
+    def __init__(self, url, body, status=200):
+        self.url = url
+        self.status = status
+        self.ok = 200 <= status < 300
+        self._body = body
+
+    def text(self):
+        return self._body
+
+
+class _FakeRequestClient:
+    """``context.request`` stand-in: plain GETs against the fake site."""
+
+    def __init__(self, site):
+        self.site = site
+        self.gets = []
+
+    def get(self, url, timeout=None):
+        self.gets.append(url)
+        self.site.load(url)
+        if url in self.site.redirects:
+            return _FakeResponse(self.site.redirects[url], "<form id='login'></form>")
+        return _FakeResponse(url, self.site.pages.get(url, "<html></html>"))
+
+
+class _FakeContext:
+    def __init__(self, site, http=False):
+        self.site = site
+        self.pages = []
+        if http:
+            self.request = _FakeRequestClient(site)
+
+    def new_page(self):
+        page = _FakePage(self)
+        self.pages.append(page)
+        return page
+
+    def storage_state(self, path=None):
+        return {}
+
+
+class _FakeManager:
+    def __init__(self, site, blocker=None, http=False):
+        self.context = _FakeContext(site, http=http)
+        self.blocker = blocker
+        self.tab = None
+
+    @contextmanager
+    def page(self):
+        page = self.context.new_page()
+        try:
+            yield page
+        finally:
+            page.close()
+
+    @contextmanager
+    def dashboard_tab(self):
+        if self.tab is None:
+            self.tab = DashboardTab(self.context.new_page())
+        yield self.tab
+
+
+class _FakeAsyncPage:
+    def __init__(self, context):
+        self.context = context
+        self.url = "about:blank"
+        self.closed = False
+
+    async def goto(self, url, wait_until=None, timeout=None):
+        self.context.open_now += 1
+        self.context.max_open = max(self.context.max_open, self.context.open_now)
+        try:
+            await asyncio.sleep(0)
+            self.url = self.context.site.load(url)
+        finally:
+            self.context.open_now -= 1
+
+    async def wait_for_selector(self, _selector, timeout=None):
+        self.context.site.selector_waits += 1
+        return None
+
+    @asynccontextmanager
+    async def expect_response(self, predicate, timeout=None):
+        info = SimpleNamespace()
+        yield info
+        response = _timeline_response(self.context.site, predicate)
+
+        async def _json():
+            return response.payload
+
+        async def _value():
+            return response
+
+        response.json = _json
+        info.value = _value()
+
+    async def content(self):
+        return self.context.site.pages.get(self.url, "<html></html>")
+
+    async def evaluate(self, script, arg=None):
+        assert script == DASHBOARD_REFRESH_JS
+        return self.context.site.refresh_dashboard(arg)
+
+    async def close(self):
+        self.closed = True
+
+
+class _FakeAsyncRequestClient(_FakeRequestClient):
+    async def get(self, url, timeout=None):
+        response = _FakeRequestClient.get(self, url, timeout)
+        text = response.text()
+
+        async def _text():
+            return text
+
+        response.text = _text
+        return response
+
+
+class _FakeAsyncContext:
+    def __init__(self, site, http=False):
+        self.site = site
+        self.pages = []
+        self.open_now = 0
+        self.max_open = 0
+        if http:
+            self.request = _FakeAsyncRequestClient(site)
+
+    async def new_page(self):
+        page = _FakeAsyncPage(self)
+        self.pages.append(page)
+        return page
+
+    async def storage_state(self, path=None):
+        return {}
+
+
+class _FakeAsyncManager:
+    def __init__(self, site, http=False):
+        self.context = _FakeAsyncContext(site, http=http)
+        self.tab = None
+
+    @asynccontextmanager
+    async def dashboard_tab(self):
+        if self.tab is None:
+            self.tab = DashboardTab(await self.context.new_page())
+        yield self.tab
+
+    @asynccontextmanager
+    async def page(self):
+        page = await self.context.new_page()
+        try:
+            yield page
+        finally:
+            await page.close()
+
+
+def _cycle_site(failing=()):
+    ev_urls = [
+        f"{BASE}/calendar/view.php?view=day&time=1772605260#event_{eid}" for eid in ("1", "2", "3")
+    ]
+    return _FakeSite(
+        {
+            DASHBOARD: "<html><body>"
+            + _upcoming("1", "Tarea A")
+            + _upcoming("2", "Tarea B")
+            + _upcoming("3", "Tarea C")
+            + "</body></html>",
+            ev_urls[0]: _event_page("Calculo", "10"),
+            ev_urls[1]: _event_page("Fisica", "20"),
+            ev_urls[2]: _event_page("Quimica", "30"),
+            f"{BASE}/mod/assign/view.php?id=10": SUBMITTED_PAGE,
+            f"{BASE}/mod/assign/view.php?id=30": PENDING_PAGE,
+        },
+        failing=failing,
+    )
+
+
+def _cycle_site_dom():
+    """``_cycle_site`` plus hand-written ``*_DOM_JS`` results for each page (the scripts run in test_scrape_parse)."""
+    site = _cycle_site()
+    site.dom[DASHBOARD] = {
+        "upcoming": [
+            {
+                "title": title,
+                "url": f"{BASE}/calendar/view.php?view=day&time=1772605260#event_{eid}",
+                "event_id": eid,
+                "date": "Hoy , 23:59",
+            }
+            for eid, title in (("1", "Tarea A"), ("2", "Tarea B"), ("3", "Tarea C"))
+        ],
+        "timeline": [],
+    }
+    for eid, course, cmid in (("1", "Calculo", "10"), ("2", "Fisica", "20"), ("3", "Quimica", "30")):
+        activity = f"{BASE}/mod/assign/view.php?id={cmid}"
+        site.dom[f"{BASE}/calendar/view.php?view=day&time=1772605260#event_{eid}"] = {
+            "course_links": [[f"{BASE}/course/view.php?id={cmid}", course]],
+            "description": f"Descripción {cmid}",
+            "card_links": [activity],
+            "links": [activity],
+        }
+    site.dom[f"{BASE}/mod/assign/view.php?id=10"] = {
+        "rows": [
+            ["Estatus de la entrega", "Enviado para calificar", ["submissionstatussubmitted"]],
+            ["Estatus de calificación", "No calificado", []],
+        ],
+        "status_cell": [["submissionstatussubmitted"], "Enviado para calificar"],
+        "text": None,
+    }
+    site.dom[f"{BASE}/mod/assign/view.php?id=30"] = {
+        "rows": [["Estatus de la entrega", "Sin entrega", ["submissionstatusnosubmission"]]],
+        "status_cell": [["submissionstatusnosubmission"], "Sin entrega"],
+        "text": None,
+    }
+    site.dom[f"{BASE}/mod/assign/view.php?id=20"] = {"rows": [], "status_cell": None, "text": ""}
+    return site
+
+
+def _settings(tmp_path, **kwargs):
+    kwargs.setdefault("grades_interval_hours", 0)  # gradebook requests have their own tests
+    return Settings(
+        base=BASE,
+        dashboard_url=DASHBOARD,
+        state_file=str(tmp_path / "state.json"),
+        storage_file=str(tmp_path / "storage.json"),
+        **kwargs,
+    )
+
+
+def test_fetch_pages_html_returns_html_per_url_and_isolates_failures():
+    site = _FakeSite({"u1": "<p>1</p>", "u3": "<p>3</p>"}, failing={"u2"})
+    context = _FakeContext(site)
+
+    results = fetch_pages_html(context, ["u1", "u2", "u3", "u1"], concurrency=2, tries=1)
+
+    assert results["u1"] == "<p>1</p>"
+    assert results["u3"] == "<p>3</p>"
+    assert isinstance(results["u2"], Exception)
+    # Duplicates are fetched once and every tab is closed afterwards.
+    assert site.visits.count("u1") == 1
+    assert all(page.closed for page in context.pages)
+
+
+def test_fetch_pages_html_respects_concurrency_limit():
+    site = _FakeSite({f"u{i}": f"<p>{i}</p>" for i in range(5)})
+    context = _FakeContext(site)
+    open_pages = []
+
+    original_new_page = context.new_page
+
+    def _tracking_new_page():
+        page = original_new_page()
+        open_pages.append(sum(1 for p in context.pages if not p.closed))
+        return page
+
+    context.new_page = _tracking_new_page
+    fetch_pages_html(context, [f"u{i}" for i in range(5)], concurrency=2)
+
+    assert max(open_pages) == 2
+
+
+def test_run_scrape_cycle_enriches_concurrently_and_keeps_order(tmp_path):
+    site = _cycle_site(failing={f"{BASE}/mod/assign/view.php?id=20"})
+    settings = _settings(tmp_path, scrape_concurrency=3)
+
+    events, changed = run_scrape_cycle(settings, browser_manager=_FakeManager(site))
+
+    assert [e.event_id for e in events] == ["1", "2", "3"]
+    assert [e.course_name for e in events] == ["Calculo", "Fisica", "Quimica"]
+    assert events[0].submitted is True
+    assert events[0].grading_status == "No calificado"
+    # The failing assignment page only degrades its own event.
+    assert events[1].submitted is None
+    assert events[1].assignment_url.endswith("id=20")
+    assert events[2].submitted is False
+    assert len(changed) == 3
+
+    state = load_state(settings.state_file)
+    assert state["metrics"]["successful_scrapes"] == 1
+    assert set(state["events"]) == {"1", "2", "3"}
+
+
+def test_dom_extraction_cycle_matches_html_cycle(tmp_path):
+    html_settings = _settings(tmp_path, assignment_fetch="navigate")
+    dom_settings = _settings(tmp_path, assignment_fetch="navigate", extraction_mode="dom")
+    dom_settings.state_file = str(tmp_path / "dom_state.json")
+    site = _cycle_site_dom()
+
+    html_events, _ = run_scrape_cycle(html_settings, browser_manager=_FakeManager(_cycle_site()))
+    dom_events, _ = run_scrape_cycle(dom_settings, browser_manager=_FakeManager(site))
+
+    assert dom_events == html_events
+    assert dom_events[0].description == "Descripción 10"
+    assert site.contents == 0  # no page was serialized to HTML
+
+
+def test_fetch_pages_html_async_bounds_concurrency():
+    site = _FakeSite({f"u{i}": f"<p>{i}</p>" for i in range(6)}, failing={"u4"})
+    context = _FakeAsyncContext(site)
+
+    results = asyncio.run(fetch_pages_html_async(context, [f"u{i}" for i in range(6)], concurrency=2, tries=1))
+
+    assert list(results) == [f"u{i}" for i in range(6)]
+    assert results["u0"] == "<p>0</p>"
+    assert isinstance(results["u4"], Exception)
+    assert context.max_open == 2
+
+
+def test_run_scrape_cycle_async_matches_sync_engine(tmp_path):
+    sync_settings = _settings(tmp_path, scrape_concurrency=2)
+    async_settings = _settings(tmp_path, scrape_concurrency=2, scrape_engine="async")
+    async_settings.state_file = str(tmp_path / "async_state.json")
+
+    sync_all, sync_changed = run_scrape_cycle(sync_settings, browser_manager=_FakeManager(_cycle_site()))
+    async_all, async_changed = asyncio.run(
+        run_scrape_cycle_async(async_settings, browser_manager=_FakeAsyncManager(_cycle_site()))
+    )
+
+    assert async_all == sync_all
+    assert async_changed == sync_changed
+    assert load_state(async_settings.state_file)["metrics"]["successful_scrapes"] == 1
+
+
+def test_run_scrape_cycle_records_blocked_requests_per_cycle(tmp_path):
+    class _Route:
+        def __init__(self, resource_type):
+            self.request = type("R", (), {"resource_type": resource_type, "url": f"{BASE}/theme/x"})()
+
+        def abort(self, error_code=None):
+            pass
+
+        def continue_(self):
+            pass
+
+    blocker = RequestBlocker()
+    blocker.handle(_Route("image"))  # left over from before the cycle: not counted
+    site = _cycle_site()
+    original_load = site.load
+
+    def _load_with_assets(url):
+        original_load(url)
+        for resource_type in ("image", "font", "script"):
+            blocker.handle(_Route(resource_type))
+
+    site.load = _load_with_assets
+    settings = _settings(tmp_path)
+
+    run_scrape_cycle(settings, browser_manager=_FakeManager(site, blocker))
+
+    metrics = load_state(settings.state_file)["metrics"]
+    pages = len(site.visits)
+    assert metrics["last_blocked_requests"] == 2 * pages
+    assert metrics["total_blocked_requests"] == 2 * pages
+    assert metrics["last_estimated_bytes_saved"] > 0
+
+
+def test_run_scrape_cycle_reuses_enrichment_cache_between_cycles(tmp_path):
+    settings = _settings(tmp_path)
+    run_scrape_cycle(settings, browser_manager=_FakeManager(_cycle_site()))
+
+    site = _cycle_site()
+    site.pages[DASHBOARD] = site.pages[DASHBOARD].replace("Tarea B", "Tarea B (corregida)")
+    events, _ = run_scrape_cycle(settings, browser_manager=_FakeManager(site))
+
+    event_page_visits = [url for url in site.visits if "/calendar/" in url]
+    # Only the renamed event re-opens its calendar page.
+    assert event_page_visits == [f"{BASE}/calendar/view.php?view=day&time=1772605260#event_2"]
+    assert [e.course_name for e in events] == ["Calculo", "Fisica", "Quimica"]
+    assert events[0].assignment_url.endswith("id=10")
+    assert events[0].submitted is True  # assignment pages are still checked
+
+    metrics = load_state(settings.state_file)["metrics"]
+    assert (metrics["last_cache_hits"], metrics["last_cache_misses"]) == (2, 1)
+    assert metrics["total_cache_misses"] == 4
+
+
+def test_run_scrape_cycle_cache_disabled_with_zero_ttl(tmp_path):
+    settings = _settings(tmp_path, enrichment_cache_ttl_hours=0)
+    run_scrape_cycle(settings, browser_manager=_FakeManager(_cycle_site()))
+
+    site = _cycle_site()
+    run_scrape_cycle(settings, browser_manager=_FakeManager(site))
+
+    assert len([url for url in site.visits if "/calendar/" in url]) == 3
+
+
+def _assignment_visits(site):
+    return [url for url in site.visits if "/mod/assign/" in url]
+
+
+def test_run_scrape_cycle_skips_recently_checked_submitted_assignments(tmp_path):
+    settings = _settings(tmp_path)
+    run_scrape_cycle(settings, browser_manager=_FakeManager(_cycle_site()))
+
+    site = _cycle_site()
+    events, _ = run_scrape_cycle(settings, browser_manager=_FakeManager(site))
+
+    # id=10 was submitted: its status is reused. id=20 (undetected) and
+    # id=30 (pending, due soon) are checked again.
+    assert sorted(_assignment_visits(site)) == [
+        f"{BASE}/mod/assign/view.php?id=20",
+        f"{BASE}/mod/assign/view.php?id=30",
+    ]
+    assert events[0].submitted is True
+    assert events[0].submission_status == "Enviado para calificar"
+    assert events[0].grading_status == "No calificado"
+    metrics = load_state(settings.state_file)["metrics"]
+    assert (metrics["last_status_checked"], metrics["last_status_skipped"]) == (2, 1)
+
+
+def test_run_scrape_cycle_rechecks_on_due_change_and_forced_recheck(tmp_path):
+    settings = _settings(tmp_path)
+    run_scrape_cycle(settings, browser_manager=_FakeManager(_cycle_site()))
+
+    state = load_state(settings.state_file)
+    state["status_checks"]["1"]["due_text"] = "otra fecha"
+    save_state(settings.state_file, state)
+    site = _cycle_site()
+    run_scrape_cycle(settings, browser_manager=_FakeManager(site))
+    assert f"{BASE}/mod/assign/view.php?id=10" in _assignment_visits(site)
+
+    state = load_state(settings.state_file)
+    request_status_recheck(state)
+    save_state(settings.state_file, state)
+    site = _cycle_site()
+    run_scrape_cycle(settings, browser_manager=_FakeManager(site))
+    assert len(_assignment_visits(site)) == 3
+    assert load_state(settings.state_file)["force_status_check"] is False
+
+
+def test_status_recheck_interval_policy():
+    now = 1_800_000_000
+    far = Event("1", "A", "", f"{BASE}/calendar/view.php?view=day&time={now + 7 * 86400}")
+    near = Event("2", "B", "", f"{BASE}/calendar/view.php?view=day&time={now + 3600}")
+
+    assert _status_recheck_interval(far, {"submitted": True, "grading_status": "Calificado"}, now) == 24 * 3600
+    assert _status_recheck_interval(far, {"submitted": True, "grading_status": "No calificado"}, now) == 6 * 3600
+    assert _status_recheck_interval(far, {"submitted": False}, now) == 3 * 3600
+    assert _status_recheck_interval(near, {"submitted": False}, now) == 0
+    assert _status_recheck_interval(far, {"submitted": None}, now) == 0
+
+
+def _settled_site():
+    """Every assignment already submitted: nothing due for a recheck."""
+    site = _cycle_site()
+    site.pages[f"{BASE}/mod/assign/view.php?id=20"] = SUBMITTED_PAGE
+    site.pages[f"{BASE}/mod/assign/view.php?id=30"] = SUBMITTED_PAGE
+    return site
+
+
+def test_run_scrape_cycle_short_circuits_unchanged_dashboard(tmp_path):
+    settings = _settings(tmp_path)
+    first, _ = run_scrape_cycle(settings, browser_manager=_FakeManager(_settled_site()))
+
+    site = _settled_site()
+    events, changed = run_scrape_cycle(settings, browser_manager=_FakeManager(site))
+
+    assert site.visits == [DASHBOARD]  # the dashboard only
+    assert events == first
+    assert changed == []
+    metrics = load_state(settings.state_file)["metrics"]
+    assert (metrics["full_cycles"], metrics["short_circuit_cycles"]) == (1, 1)
+    assert metrics["last_cycle_short_circuit"] is True
+    assert (metrics["last_status_checked"], metrics["last_status_skipped"]) == (0, 3)
+
+
+def test_run_scrape_cycle_full_cycle_when_dashboard_changes(tmp_path):
+    settings = _settings(tmp_path)
+    run_scrape_cycle(settings, browser_manager=_FakeManager(_settled_site()))
+
+    site = _settled_site()
+    site.pages[DASHBOARD] = site.pages[DASHBOARD].replace("Tarea C", "Tarea C v2")
+    events, changed = run_scrape_cycle(settings, browser_manager=_FakeManager(site))
+
+    assert [e.event_id for e in changed] == ["3"]
+    assert [url for url in site.visits if "/calendar/" in url] == [
+        f"{BASE}/calendar/view.php?view=day&time=1772605260#event_3"
+    ]
+    assert load_state(settings.state_file)["metrics"]["last_cycle_short_circuit"] is False
+
+
+def test_run_scrape_cycle_no_short_circuit_when_recheck_due_or_disabled(tmp_path):
+    settings = _settings(tmp_path)
+    run_scrape_cycle(settings, browser_manager=_FakeManager(_settled_site()))
+
+    state = load_state(settings.state_file)
+    request_status_recheck(state)
+    save_state(settings.state_file, state)
+    site = _settled_site()
+    run_scrape_cycle(settings, browser_manager=_FakeManager(site))
+    assert len(_assignment_visits(site)) == 3
+
+    run_scrape_cycle(_settings(tmp_path, dashboard_short_circuit=False), browser_manager=_FakeManager(_settled_site()))
+    metrics = load_state(settings.state_file)["metrics"]
+    assert (metrics["full_cycles"], metrics["short_circuit_cycles"]) == (3, 0)
+
+
+def test_run_scrape_cycle_no_short_circuit_inside_reminder_window(tmp_path, monkeypatch):
+    due = 1772605260
+
+    def site_without_assignment():
+        # Event 3 has no assignment page, so only the reminder window guards it.
+        site = _settled_site()
+        site.pages[f"{BASE}/calendar/view.php?view=day&time={due}#event_3"] = (
+            f'<a href="{BASE}/course/view.php?id=5">Quimica</a>'
+        )
+        return site
+
+    settings = _settings(tmp_path)
+    monkeypatch.setattr("ues_bot.scrape_job.time.time", lambda: due - 5 * 86400)
+    run_scrape_cycle(settings, browser_manager=_FakeManager(site_without_assignment()))
+    run_scrape_cycle(settings, browser_manager=_FakeManager(site_without_assignment()))
+    assert load_state(settings.state_file)["metrics"]["last_cycle_short_circuit"] is True
+
+    monkeypatch.setattr("ues_bot.scrape_job.time.time", lambda: due - 2 * 3600)
+    state = load_state(settings.state_file)
+    for check in state["status_checks"].values():
+        check["checked_at"] = due - 2 * 3600  # submitted statuses are still fresh
+    save_state(settings.state_file, state)
+    run_scrape_cycle(settings, browser_manager=_FakeManager(site_without_assignment()))
+    assert load_state(settings.state_file)["metrics"]["last_cycle_short_circuit"] is False
+
+
+def test_run_scrape_cycle_failed_page_is_not_replayed(tmp_path):
+    settings = _settings(tmp_path)
+    failing_url = f"{BASE}/calendar/view.php?view=day&time=1772605260#event_2"
+    site = _settled_site()
+    site.failing.add(failing_url)
+    run_scrape_cycle(settings, browser_manager=_FakeManager(site))
+    assert load_state(settings.state_file)["dashboard_snapshot"] is None
+
+    site = _settled_site()
+    events, _ = run_scrape_cycle(settings, browser_manager=_FakeManager(site))
+    assert failing_url in site.visits
+    assert events[1].course_name == "Fisica"
+
+
+def test_dashboard_fingerprint_tracks_dashboard_fields_only():
+    a = Event("1", "Tarea", "Hoy, 23:59", f"{BASE}/calendar/view.php?time=1#event_1", assignment_url="u")
+    b = Event("1", "Tarea", "Hoy, 23:59", f"{BASE}/calendar/view.php?time=1#event_1", assignment_url="u")
+    b.course_name, b.submitted = "Calculo", True
+
+    assert _dashboard_fingerprint([a]) == _dashboard_fingerprint([b])
+    b.due_text = "Mañana, 23:59"
+    assert _dashboard_fingerprint([a]) != _dashboard_fingerprint([b])
+
+
+def test_fetch_pages_http_uses_plain_get_and_falls_back_to_navigation():
+    site = _FakeSite({"a1": SUBMITTED_PAGE, "a2": PENDING_PAGE, "a3": "<div id='app'></div>"})
+    site.redirects["a2"] = f"{BASE}/login/index.php"
+    context = _FakeContext(site, http=True)
+
+    results = fetch_pages_http(context, ["a1", "a2", "a3"], concurrency=2, tries=1)
+
+    assert results["a1"] == SUBMITTED_PAGE
+    assert isinstance(results["a2"], LoginRedirectError)
+    assert results["a3"] == "<div id='app'></div>"
+    assert context.request.gets == ["a1", "a2", "a3"]
+    # A login redirect would land on the login form in a tab too: only the
+    # page without the status table opens a tab.
+    assert len(context.pages) == 1
+
+
+def test_fetch_pages_http_batches_gets_from_a_tab_on_the_site():
+    urls = [f"{BASE}/mod/assign/view.php?id={cmid}" for cmid in ("1", "2", "3")]
+    site = _FakeSite({urls[0]: SUBMITTED_PAGE, urls[1]: PENDING_PAGE, urls[2]: "<table class='user-grade'></table>"})
+    site.failing.add(urls[1])
+    context = _FakeContext(site, http=True)
+    context.new_page().goto(DASHBOARD)
+
+    results = fetch_pages_http(context, urls, concurrency=2, tries=1)
+
+    assert site.fetch_batches == [urls[:2], urls[2:]]
+    assert context.request.gets == []
+    assert results[urls[0]] == SUBMITTED_PAGE
+    # The failed GET and the page without the marker are opened in tabs.
+    assert isinstance(results[urls[1]], RuntimeError)
+    assert results[urls[2]] == "<table class='user-grade'></table>"
+    assert len(context.pages) == 3
+
+    site.fetch_batches.clear()
+    assert fetch_pages_http(context, urls[2:], tries=1, marker="user-grade") == {urls[2]: site.pages[urls[2]]}
+    assert site.fetch_batches == [urls[2:]] and len(context.pages) == 3
+
+
+def test_fetch_pages_http_async_matches_sync():
+    pages = {"a1": SUBMITTED_PAGE, "a2": "<html></html>"}
+    context = _FakeAsyncContext(_FakeSite(pages), http=True)
+
+    results = asyncio.run(fetch_pages_http_async(context, ["a1", "a2"], concurrency=2, tries=1))
+
+    assert results == pages
+    assert len(context.pages) == 1
+
+
+def test_run_scrape_cycle_reads_assignments_over_http(tmp_path):
+    site = _cycle_site()
+    manager = _FakeManager(site, http=True)
+
+    events, _ = run_scrape_cycle(_settings(tmp_path), browser_manager=manager)
+
+    assert [e.submitted for e in events] == [True, None, False]
+    # The dashboard tab is on the site: the GETs run from it, in one batch.
+    assert site.fetch_batches == [[f"{BASE}/mod/assign/view.php?id={cmid}" for cmid in ("10", "20", "30")]]
+    assert manager.context.request.gets == []
+    # Dashboard + 3 event pages + the id=20 fallback (no status table).
+    assert len(manager.context.pages) == 5
+
+
+def test_headful_run_does_not_use_the_headless_shared_browser(tmp_path, monkeypatch):
+    site = _cycle_site()
+    shared = _FakeManager(site)
+    shared.headless = True
+    launched = []
+
+    class _OwnManager(_FakeManager):
+        def __init__(self, _storage_file, headless=True, blocker=None):
+            super().__init__(site)
+            launched.append(headless)
+
+        def close(self):
+            launched.append("closed")
+
+    monkeypatch.setattr(scrape_job, "BrowserManager", _OwnManager)
+
+    events, _ = run_scrape_cycle(_settings(tmp_path), {"headful": True}, browser_manager=shared)
+
+    assert len(events) == 3
+    assert launched == [False, "closed"]
+    assert shared.context.pages == []
+
+    run_scrape_cycle(_settings(tmp_path), {"headful": False}, browser_manager=shared)
+    assert launched == [False, "closed"] and shared.context.pages
+
+
+def test_run_scrape_cycle_navigate_mode_skips_http(tmp_path):
+    manager = _FakeManager(_cycle_site(), http=True)
+
+    run_scrape_cycle(_settings(tmp_path, assignment_fetch="navigate"), browser_manager=manager)
+
+    assert manager.context.request.gets == []
+
+
+def test_run_scrape_cycle_logs_in_when_dashboard_redirects(tmp_path):
+    site = _cycle_site()
+    site.redirects[DASHBOARD] = f"{BASE}/login/index.php"
+    settings = _settings(tmp_path, ues_user="u", ues_pass="p")
+    session = SessionTracker(settings.storage_file, BASE, idle_timeout_sec=3600)
+
+    events, _ = run_scrape_cycle(settings, browser_manager=_FakeManager(site), session=session)
+
+    assert site.logins == 1
+    assert [e.event_id for e in events] == ["1", "2", "3"]
+    assert session.expired is False
+    assert session.expires_at() is not None
+
+
+def test_run_scrape_cycle_reports_expired_session_on_page_redirect(tmp_path):
+    site = _cycle_site()
+    site.redirects[f"{BASE}/mod/assign/view.php?id=30"] = f"{BASE}/login/index.php"
+    session = SessionTracker(str(tmp_path / "storage.json"), BASE, idle_timeout_sec=3600)
+
+    events, _ = run_scrape_cycle(_settings(tmp_path), browser_manager=_FakeManager(site), session=session)
+
+    # Only the redirected page degrades; the keepalive job handles the login.
+    assert [e.submitted for e in events] == [True, None, None]
+    assert site.logins == 0
+    assert session.expired is True
+
+
+def _index_page(rows) -> str:
+    body = "".join(
+        f'<tr><td><a href="{BASE}/mod/assign/view.php?id={cmid}">A</a></td><td>-</td><td>{status}</td><td>-</td></tr>'
+        for cmid, status in rows
+    )
+    return (
+        '<table class="generaltable"><thead><tr><th>Tareas</th><th>Fecha de entrega</th>'
+        f"<th>Entrega</th><th>Calificación</th></tr></thead><tbody>{body}</tbody></table>"
+    )
+
+
+def test_run_scrape_cycle_reads_statuses_from_course_index(tmp_path):
+    site = _cycle_site()
+    ev_urls = [f"{BASE}/calendar/view.php?view=day&time=1772605260#event_{eid}" for eid in ("1", "2", "3")]
+    site.pages[ev_urls[0]] = _event_page("Calculo", "10", course_id="7")
+    site.pages[ev_urls[1]] = _event_page("Calculo", "20", course_id="7")
+    site.pages[f"{BASE}/mod/assign/index.php?id=7"] = _index_page([("10", "Enviado para calificar"), ("20", "Reabierto")])
+    site.pages[f"{BASE}/mod/assign/view.php?id=20"] = PENDING_PAGE
+
+    events, _ = run_scrape_cycle(_settings(tmp_path), browser_manager=_FakeManager(site))
+
+    assert [e.submitted for e in events] == [True, False, False]
+    assert [e.course_id for e in events] == ["7", "7", "30"]
+    # id=10 came from the index; the unreadable row and the lone course
+    # (id=30) still open their own assignment page.
+    assert _assignment_visits(site) == [
+        f"{BASE}/mod/assign/index.php?id=7",
+        f"{BASE}/mod/assign/view.php?id=20",
+        f"{BASE}/mod/assign/view.php?id=30",
+    ]
+    assert load_state(tmp_path / "state.json")["status_checks"]["1"]["submitted"] is True
+
+
+def test_course_index_without_grade_cell_keeps_known_grading_status(tmp_path):
+    site = _cycle_site()
+    ev_urls = [f"{BASE}/calendar/view.php?view=day&time=1772605260#event_{eid}" for eid in ("1", "2")]
+    site.pages[ev_urls[0]] = _event_page("Calculo", "10", course_id="7")
+    site.pages[ev_urls[1]] = _event_page("Calculo", "20", course_id="7")
+    site.pages[f"{BASE}/mod/assign/index.php?id=7"] = (
+        '<table class="generaltable"><thead><tr><th>Tareas</th><th>Entrega</th></tr></thead><tbody>'
+        f'<tr><td><a href="{BASE}/mod/assign/view.php?id=10">A</a></td><td>Enviado para calificar</td></tr>'
+        f'<tr><td><a href="{BASE}/mod/assign/view.php?id=20">B</a></td><td>Enviado para calificar</td></tr>'
+        "</tbody></table>"
+    )
+    settings = _settings(tmp_path)
+    state = load_state(settings.state_file)
+    state["status_checks"] = {
+        "1": {"due_text": "", "submitted": False, "grading_status": "No calificado", "checked_at": int(time.time())}
+    }
+    request_status_recheck(state)
+    save_state(settings.state_file, state)
+
+    events, _ = run_scrape_cycle(settings, browser_manager=_FakeManager(site))
+
+    assert [e.submitted for e in events[:2]] == [True, True]
+    assert [e.grading_status for e in events[:2]] == ["No calificado", ""]
+    assert load_state(settings.state_file)["status_checks"]["1"]["grading_status"] == "No calificado"
+
+
+def test_run_scrape_cycle_course_index_disabled(tmp_path):
+    site = _cycle_site()
+    ev_urls = [f"{BASE}/calendar/view.php?view=day&time=1772605260#event_{eid}" for eid in ("1", "2")]
+    site.pages[ev_urls[0]] = _event_page("Calculo", "10", course_id="7")
+    site.pages[ev_urls[1]] = _event_page("Calculo", "20", course_id="7")
+
+    run_scrape_cycle(_settings(tmp_path, assignment_index=False), browser_manager=_FakeManager(site))
+
+    assert not any("/mod/assign/index.php" in url for url in site.visits)
+
+
+def test_run_scrape_cycle_announces_gradebook_changes(tmp_path):
+    site = _cycle_site()
+    overview = f"{BASE}/grade/report/overview/index.php"
+    report = f"{BASE}/grade/report/user/index.php?id=10"
+
+    def _gradebook(total, grade_10, grade_99):
+        site.pages[overview] = (
+            '<table id="overview-grade" class="generaltable"><tbody><tr>'
+            f'<td><a href="{report}">Calculo</a></td><td>{total}</td></tr></tbody></table>'
+        )
+        site.pages[report] = (
+            '<table class="generaltable user-grade"><tbody>'
+            f'<tr><th class="column-itemname"><a href="{BASE}/mod/assign/view.php?id=10">Tarea A</a></th>'
+            f'<td class="column-grade">{grade_10}</td></tr>'
+            f'<tr><th class="column-itemname"><a href="{BASE}/mod/assign/view.php?id=99">Tarea vieja</a></th>'
+            f'<td class="column-grade">{grade_99}</td></tr></tbody></table>'
+        )
+
+    settings = _settings(tmp_path, grades_interval_hours=6)
+    _gradebook("-", "-", "-")
+    run_scrape_cycle(settings, browser_manager=_FakeManager(site))
+
+    _gradebook("90,00", "100,00", "80,00")
+    state = load_state(settings.state_file)
+    state["grades"]["checked_at"] = 0
+    save_state(settings.state_file, state)
+    events, changed = run_scrape_cycle(settings, browser_manager=_FakeManager(site))
+
+    assert events[0].grading_status == "Calificado: 100,00"
+    assert [(e.event_id, e.grading_status) for e in changed] == [
+        ("1", "Calificado: 100,00"),
+        ("grade_10_99", "Calificado: 80,00"),
+    ]
+    # Grades are not re-read before the interval.
+    site.visits.clear()
+    run_scrape_cycle(settings, browser_manager=_FakeManager(site))
+    assert overview not in site.visits
+
+
+def test_gradebook_replaces_submitted_status_rechecks():
+    now = 1_800_000_000
+    far = Event("1", "A", "", f"{BASE}/calendar/view.php?view=day&time={now + 7 * 86400}")
+    check = {"submitted": True, "grading_status": "No calificado"}
+
+    assert _status_recheck_interval(far, check, now, gradebook=True) == 7 * 24 * 3600
+    assert _status_recheck_interval(far, {"submitted": False}, now, gradebook=True) == 3 * 3600
+
+
+def _timeline_item(event_id, cmid, name, course, due):
+    return {
+        "id": event_id,
+        "name": name,
+        "description": f"<p>Descripción {cmid}</p>",
+        "timesort": due,
+        "course": {"id": 5, "fullnamedisplay": course},
+        "url": f"{BASE}/mod/assign/view.php?id={cmid}",
+        "viewurl": f"{BASE}/calendar/view.php?view=day&time={due}#event_{event_id}",
+    }
+
+
+def test_run_scrape_cycle_builds_timeline_from_captured_json(tmp_path):
+    site = _cycle_site()
+    site.timeline = [
+        _timeline_item(1, "10", "Tarea A", "Calculo", 1772605260),
+        _timeline_item(4, "40", "Tarea D", "Historia", 1772691660),
+    ]
+
+    events, _ = run_scrape_cycle(_settings(tmp_path), browser_manager=_FakeManager(site))
+
+    # No wait for the rendered block; the JSON enriches the matching
+    # upcoming event and adds the timeline-only one with its exact time.
+    assert site.selector_waits == 0
+    assert [e.event_id for e in events] == ["1", "2", "3", "4"]
+    assert events[0].course_name == "Calculo"
+    assert events[0].description == "Descripción 10"
+    assert events[3].course_name == "Historia"
+    assert events[3].url.endswith("time=1772691660#event_4")
+    assert events[3].assignment_url == f"{BASE}/mod/assign/view.php?id=40"
+    # Event 1 and the timeline-only event need no calendar page.
+    assert not any("#event_1" in url for url in site.visits[1:])
+
+
+def test_run_scrape_cycle_async_captures_timeline_json(tmp_path):
+    site = _cycle_site()
+    site.timeline = [_timeline_item(4, "40", "Tarea D", "Historia", 1772691660)]
+
+    events, _ = asyncio.run(run_scrape_cycle_async(_settings(tmp_path), browser_manager=_FakeAsyncManager(site)))
+
+    assert site.selector_waits == 0
+    assert [e.event_id for e in events] == ["1", "2", "3", "4"]
+
+
+def test_unchanged_assignment_pages_are_not_parsed_again(tmp_path, monkeypatch):
+    site = _cycle_site()
+    settings = _settings(tmp_path, dashboard_short_circuit=False)
+    parsed = []
+    real_parse = scrape_job.parse_assignment_page
+    monkeypatch.setattr(scrape_job, "parse_assignment_page", lambda html: parsed.append(html) or real_parse(html))
+
+    run_scrape_cycle(settings, browser_manager=_FakeManager(site))
+    assert len(parsed) == 3  # id=20 has no status table: always parsed
+
+    def recheck(page=None):
+        state = load_state(settings.state_file)
+        request_status_recheck(state)
+        save_state(settings.state_file, state)
+        if page is not None:
+            site.pages[f"{BASE}/mod/assign/view.php?id=30"] = page
+
+    recheck()
+    events, _ = run_scrape_cycle(settings, browser_manager=_FakeManager(site))
+    assert len(parsed) == 4
+    assert [(e.submitted, e.grading_status) for e in events] == [(True, "No calificado"), (None, ""), (False, "")]
+    metrics = load_state(settings.state_file)["metrics"]
+    assert (metrics["last_page_hash_hits"], metrics["last_page_hash_misses"]) == (2, 1)
+
+    recheck(SUBMITTED_PAGE)
+    events, _ = run_scrape_cycle(settings, browser_manager=_FakeManager(site))
+    assert len(parsed) == 6
+    assert events[2].submitted is True
+
+
+def _rendered_timeline_item(cmid: str, title: str, course: str) -> str:
+    return f"""
+    <div data-region="event-list-item">
+      <h6 class="event-name"><a href="{BASE}/mod/assign/view.php?id={cmid}"
+         aria-label="{title} actividad en {course} está pendiente para 8 de marzo de 2026, 23:59">{title}</a></h6>
+    </div>
+    """
+
+
+def test_run_scrape_cycle_lists_an_assignment_once_across_blocks(tmp_path):
+    site = _cycle_site()
+    # The rendered timeline titles the assignment of upcoming event 1 differently.
+    site.pages[DASHBOARD] = site.pages[DASHBOARD].replace(
+        "</body>", _rendered_timeline_item("10", "Tarea A: Integrales", "Calculo") + "</body>"
+    )
+    settings = _settings(tmp_path, timeline_capture=False, dashboard_short_circuit=False)
+
+    events, _ = run_scrape_cycle(settings, browser_manager=_FakeManager(site))
+
+    assert [e.event_id for e in events] == ["1", "2", "3"]
+    assert events[0].submitted is True
+    assert site.visits.count(f"{BASE}/mod/assign/view.php?id=10") == 1
+    state = load_state(settings.state_file)
+    assert set(state["events"]) == {"1", "2", "3"}
+    assert state["event_modules"] == {"1": "10", "2": "20", "3": "30"}
+
+    request_status_recheck(state)
+    save_state(settings.state_file, state)
+    site.visits.clear()
+    events, changed = run_scrape_cycle(settings, browser_manager=_FakeManager(site))
+    assert [e.event_id for e in events] == ["1", "2", "3"]
+    assert changed == []
+    assert site.visits.count(f"{BASE}/mod/assign/view.php?id=10") == 1
+
+
+def test_dashboard_tab_is_refreshed_in_place_between_cycles(tmp_path):
+    site = _cycle_site()
+    site.timeline = [_timeline_item(4, "40", "Tarea D", "Historia", 1772691660)]
+    manager = _FakeManager(site)
+    settings = _settings(tmp_path, dashboard_tab=True, ues_user="u", ues_pass="p")
+
+    run_scrape_cycle(settings, browser_manager=manager)
+    assert manager.tab.timeline_args == {}  # the block's captured call
+    site.visits.clear()
+    site.timeline.append(_timeline_item(5, "50", "Tarea E", "Historia", 1772778060))
+    events, changed = run_scrape_cycle(settings, browser_manager=manager)
+
+    assert DASHBOARD not in site.visits
+    assert site.refreshes == [{}]
+    assert [e.event_id for e in events] == ["1", "2", "3", "4", "5"]
+    assert [e.event_id for e in changed] == ["5"]
+    assert not manager.tab.page.closed
+
+    # Logged out: the refresh reports it and the cycle navigates and logs in.
+    site.redirects[DASHBOARD] = f"{BASE}/login/index.php"
+    events, _ = run_scrape_cycle(settings, browser_manager=manager)
+    assert site.logins == 1
+    assert DASHBOARD in site.visits
+    assert len(events) == 5
+    metrics = load_state(settings.state_file)["metrics"]
+    assert (metrics["dashboard_tab_refreshes"], metrics["dashboard_tab_reloads"]) == (1, 2)
+
+
+def test_dashboard_tab_loaded_on_another_day_is_navigated_again(tmp_path):
+    site = _cycle_site()
+    site.timeline = [_timeline_item(4, "40", "Tarea D", "Historia", 1772691660)]
+    manager = _FakeAsyncManager(site)
+    settings = _settings(tmp_path, dashboard_tab=True)
+
+    asyncio.run(run_scrape_cycle_async(settings, browser_manager=manager))
+    asyncio.run(run_scrape_cycle_async(settings, browser_manager=manager))
+    assert site.refreshes == [{}]
+    assert site.visits.count(DASHBOARD) == 1
+
+    manager.tab.loaded_on = "2000-01-01"
+    asyncio.run(run_scrape_cycle_async(settings, browser_manager=manager))
+    assert site.refreshes == [{}]
+    assert site.visits.count(DASHBOARD) == 2
+
+
+def test_run_scrape_cycle_falls_back_to_rendered_timeline(tmp_path):
+    site = _cycle_site()
+    site.timeline = [_timeline_item(4, "40", "Tarea D", "Historia", 1772691660)]
+
+    events, _ = run_scrape_cycle(_settings(tmp_path, timeline_capture=False), browser_manager=_FakeManager(site))
+    assert site.selector_waits == 1
+    assert [e.event_id for e in events] == ["1", "2", "3"]
+
+    site.timeline = None  # capture on, but the response never came
+    run_scrape_cycle(_settings(tmp_path), browser_manager=_FakeManager(site))
+    assert site.selector_waits == 2
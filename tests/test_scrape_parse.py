@@ -1,13 +1,37 @@
 from ues_bot.scrape import (
+    ASSIGNMENT_PAGE_DOM_JS,
+    DASHBOARD_DOM_JS,
+    EVENT_PAGE_DOM_JS,
     assignment_is_submitted,
+    assignment_region_hash,
+    assignment_status_from_dom,
+    event_page_from_dom,
+    events_from_dashboard_dom,
     enrich_from_event_page,
     find_assignment_url,
+    parse_assignment_index,
+    parse_assignment_page,
+    parse_event_page,
     parse_events_from_dashboard,
     parse_grading_status,
     _parse_upcoming_events,
     _parse_timeline_items,
 )
+from ues_bot.scrape import available_backends, get_default_backend, set_html_parser
+from ues_bot.scrape import _norm_text, _PhraseMatcher, normalize_title
+from ues_bot.html_backends import Region, parse_html
+import ues_bot.scrape as scrape
 from bs4 import BeautifulSoup
+import pytest
+
+
+@pytest.fixture(autouse=True, params=available_backends())
+def html_backend(request):
+    """Run every parser test on each installed backend (bs4 is the reference)."""
+    previous = get_default_backend()
+    set_html_parser(request.param)
+    yield request.param
+    set_html_parser(previous)
 
 
 # ---- Realistic HTML from the live UES Moodle dashboard ----
@@ -320,6 +344,72 @@ def test_enrich_from_event_page_no_course():
     assert "Sin materia asociada" in desc
 
 
+def test_parse_event_page_reads_course_id_and_activity_link():
+    html = """
+    <a href="https://ueslearning.ues.mx/course/view.php?id=11904#section-0">General</a>
+    <a href="https://ueslearning.ues.mx/course/view.php?id=11904">IS N Auditoria en Informatica 001</a>
+    <div class="description-content">Descripción de la tarea.</div>
+    <a class="card-link" href="https://ueslearning.ues.mx/mod/assign/view.php?id=100">Ir a la actividad</a>
+    """
+    page = parse_event_page(html, base="https://ueslearning.ues.mx")
+    assert page.course_name == "IS N Auditoria en Informatica 001"
+    assert page.course_id == "11904"
+    assert page.description == "Descripción de la tarea."
+    assert page.assignment_url == "https://ueslearning.ues.mx/mod/assign/view.php?id=100"
+
+
+# ---------------------------------------------------------------------------
+# parse_assignment_index
+# ---------------------------------------------------------------------------
+
+ASSIGN_INDEX_HTML_ES = """
+<table class="generaltable mod_index">
+  <thead><tr>
+    <th class="header c0">Tema</th><th class="header c1">Tareas</th>
+    <th class="header c2">Fecha de entrega</th><th class="header c3">Entrega</th>
+    <th class="header c4">Calificación</th>
+  </tr></thead>
+  <tbody>
+    <tr><td>Unidad 1</td>
+        <td><a href="https://ueslearning.ues.mx/mod/assign/view.php?id=100">Act 1</a></td>
+        <td>martes, 3 de marzo de 2026, 23:59</td><td>Enviado para calificar</td><td>95,00</td></tr>
+    <tr><td></td>
+        <td><a href="https://ueslearning.ues.mx/mod/assign/view.php?id=101">Act 2</a></td>
+        <td>martes, 10 de marzo de 2026, 23:59</td><td>No entregado</td><td>-</td></tr>
+    <tr><td></td>
+        <td><a href="https://ueslearning.ues.mx/mod/assign/view.php?id=102">Act 3</a></td>
+        <td>martes, 17 de marzo de 2026, 23:59</td><td>Reabierto</td><td>-</td></tr>
+  </tbody>
+</table>
+"""
+
+
+def test_parse_assignment_index_reads_every_row():
+    statuses = parse_assignment_index(ASSIGN_INDEX_HTML_ES)
+
+    assert set(statuses) == {"100", "101", "102"}
+    assert statuses["100"].submitted is True
+    assert statuses["100"].submission_status == "Enviado para calificar"
+    assert statuses["100"].grading_status == "Calificado"
+    assert statuses["101"].submitted is False
+    assert statuses["101"].grading_status == ""
+    # Status text we can't classify: the caller opens that view.php instead.
+    assert statuses["102"].submitted is None
+
+
+def test_parse_assignment_index_english_without_section_column():
+    html = """
+    <table class="generaltable">
+      <thead><tr><th>Assignments</th><th>Due date</th><th>Submission</th><th>Grade</th></tr></thead>
+      <tbody><tr><td><a href="/mod/assign/view.php?id=7">Essay</a></td><td>-</td>
+                 <td>No submission</td><td>-</td></tr></tbody>
+    </table>
+    """
+    statuses = parse_assignment_index(html)
+    assert statuses["7"].submitted is False
+    assert parse_assignment_index("<table class='generaltable'></table>") == {}
+
+
 # ---------------------------------------------------------------------------
 # parse_grading_status
 # ---------------------------------------------------------------------------
@@ -348,3 +438,326 @@ def test_parse_grading_status_missing():
     assert parse_grading_status(html) == ""
 
 
+# ---------------------------------------------------------------------------
+# parse_assignment_page
+# ---------------------------------------------------------------------------
+
+FULL_ASSIGNMENT_TABLE = """
+<table class="generaltable table-bordered">
+  <tr><th class="cell c0">Número del intento</th><td class="cell c1 lastcol">Este es el intento 1.</td></tr>
+  <tr><th class="cell c0">Estatus de la entrega</th>
+      <td class="submissionstatusnosubmission cell c1 lastcol">No se ha enviado nada en esta tarea</td></tr>
+  <tr><th class="cell c0">Estatus de calificación</th>
+      <td class="submissionnotgraded cell c1 lastcol">Sin calificar</td></tr>
+  <tr><th class="cell c0">Tiempo restante</th><td class="cell c1 lastcol">2 días 4 horas</td></tr>
+  <tr><th class="cell c0">Última modificación</th><td class="cell c1 lastcol">-</td></tr>
+</table>
+"""
+
+
+def test_parse_assignment_page_returns_all_rows_in_one_pass():
+    status = parse_assignment_page(FULL_ASSIGNMENT_TABLE)
+
+    assert status.submitted is False
+    assert status.submission_status == "No se ha enviado nada en esta tarea"
+    assert status.grading_status == "Sin calificar"
+    assert status.time_remaining == "2 días 4 horas"
+    assert status.last_modified == "-"
+    assert status.rows["Número del intento"] == "Este es el intento 1."
+
+
+def test_assignment_region_hash_ignores_time_remaining_and_request_ids():
+    page = (
+        '<html><form><input name="sesskey" value="a1"></form>'
+        + FULL_ASSIGNMENT_TABLE.replace(
+            "</table>",
+            '<tr><th>Comentarios</th><td><a id="cmt-5f1" href="/comment?sesskey=a1">Comentarios (0)</a></td></tr>'
+            "</table>",
+        )
+        + "</html>"
+    )
+    later = page.replace("2 días 4 horas", "2 días 3 horas").replace("5f1", "9c2").replace("a1", "b7")
+    submitted = page.replace("submissionstatusnosubmission", "submissionstatussubmitted")
+    graded = page.replace("Sin calificar", "Calificado")
+
+    assert assignment_region_hash(page) == assignment_region_hash(later)
+    assert len({assignment_region_hash(p) for p in (page, submitted, graded)}) == 3
+    # Without a status cell the parser may read the whole page: never reused.
+    plain = '<table class="generaltable"><tr><th>Estado del envío</th><td>No</td></tr></table>'
+    assert assignment_region_hash(plain) == ""
+
+
+def test_parse_assignment_page_matches_legacy_wrappers():
+    samples = [
+        FULL_ASSIGNMENT_TABLE,
+        '<table class="generaltable"><tr><th>Estado del envío</th><td>No enviado</td></tr></table>',
+        '<table class="generaltable"><tr><th>Submission status</th><td>Something else</td></tr></table>',
+        "<html><body><p>Enviado para calificar</p></body></html>",
+        "<html><body>Nothing here</body></html>",
+    ]
+    for html in samples:
+        status = parse_assignment_page(html)
+        assert (status.submitted, status.submission_status) == assignment_is_submitted(html)
+        assert status.grading_status == parse_grading_status(html)
+
+    assert parse_assignment_page(samples[2]).submission_status == "Something else"
+    assert parse_assignment_page(samples[3]).submission_status == "Detectado por texto global"
+    assert parse_assignment_page(samples[4]).submitted is None
+
+
+# ---------------------------------------------------------------------------
+# Normalization / phrase matching
+# ---------------------------------------------------------------------------
+
+def test_norm_text_folds_accents_and_whitespace():
+    assert _norm_text("  Estado   del\xa0ENVÍO \n") == "estado del envio"
+    assert _norm_text("Última modificación") == "ultima modificacion"
+    assert _norm_text("") == ""
+
+
+def test_norm_text_repairs_mojibake_before_lowercasing():
+    assert _norm_text("Estado del envÃ­o") == "estado del envio"
+    assert _norm_text("AÃºn no se ha hecho ninguna tarea") == "aun no se ha hecho ninguna tarea"
+
+
+def test_norm_text_folds_characters_outside_latin_tables():
+    # Fullwidth letters are outside the precomputed table (NFKD fallback).
+    assert _norm_text("Ｅnviado") == "enviado"
+
+
+def test_phrase_matcher_matches_any_phrase():
+    matcher = _PhraseMatcher(["no enviado", "no entregado", "not submitted", "no"])
+    assert matcher.search(_norm_text("Borrador (no enviado)"))
+    assert matcher.search("draft (not submitted)")
+    assert matcher.search("no")  # prefix of longer phrases is still a phrase
+    assert not matcher.search("nada")
+    assert not matcher.search("enviado para calificar")
+
+
+def test_normalize_title_strips_due_suffixes():
+    assert normalize_title("Act 1: Investigación  está en fecha de entrega") == "act 1: investigacion"
+    assert normalize_title("Essay is due") == "essay"
+    assert normalize_title("Tarea debe entregarse está en fecha de entrega") == "tarea"
+    assert normalize_title("is due") == "is due"
+
+
+# ---------------------------------------------------------------------------
+# Region-restricted parsing
+# ---------------------------------------------------------------------------
+
+# Dashboard chrome the parsers never read, including look-alike links.
+NOISY_DASHBOARD_HTML = f"""
+<html><body>
+<nav class="drawer"><ul>
+  <li><a href="https://ueslearning.ues.mx/course/view.php?id=1">Curso 1</a></li>
+  <li><a href="https://ueslearning.ues.mx/mod/assign/view.php?id=9">Tarea suelta</a></li>
+</ul></nav>
+<section data-region="course-overview">
+  <div class="card dashboard-card"><a href="/course/view.php?id=2"><span>Curso 2</span></a>
+    <div class="description-content">Resumen del curso</div></div>
+</section>
+{UPCOMING_BLOCK_HTML}
+<div data-region="timeline"><div data-region="event-list-container">{TIMELINE_BLOCK_HTML}</div></div>
+<footer><a href="https://ueslearning.ues.mx/mod/forum/view.php?id=1">Foro</a></footer>
+</body></html>
+"""
+
+
+def _parse_with_full_tree(monkeypatch):
+    monkeypatch.setattr(scrape, "_DASHBOARD_REGIONS", None)
+    monkeypatch.setattr(scrape, "_EVENT_PAGE_REGIONS", None)
+    return (
+        parse_events_from_dashboard(NOISY_DASHBOARD_HTML),
+        parse_events_from_dashboard(FULL_DASHBOARD_HTML),
+        enrich_from_event_page(EVENT_PAGE_HTML),
+        find_assignment_url(EVENT_PAGE_HTML, base="https://ueslearning.ues.mx"),
+        find_assignment_url(NOISY_DASHBOARD_HTML, base="https://ueslearning.ues.mx"),
+    )
+
+
+def test_region_parsing_returns_same_events_as_full_tree(monkeypatch):
+    restricted = (
+        parse_events_from_dashboard(NOISY_DASHBOARD_HTML),
+        parse_events_from_dashboard(FULL_DASHBOARD_HTML),
+        enrich_from_event_page(EVENT_PAGE_HTML),
+        find_assignment_url(EVENT_PAGE_HTML, base="https://ueslearning.ues.mx"),
+        find_assignment_url(NOISY_DASHBOARD_HTML, base="https://ueslearning.ues.mx"),
+    )
+    assert restricted == _parse_with_full_tree(monkeypatch)
+    assert len(restricted[0]) == 2
+
+
+def test_bs4_region_parse_builds_only_matching_subtrees():
+    html = (
+        '<html><body><nav><div class="x">menú</div></nav>'
+        '<div class="card description-content">Texto <b>uno</b></div>'
+        '<a href="/a">A</a><a name="sin-href">B</a></body></html>'
+    )
+    regions = (Region("a", "href"), Region("div", "class", frozenset({"description-content"})))
+    soup = parse_html(html, backend="bs4", regions=regions)
+
+    assert soup.find("nav") is None
+    assert soup.find("body") is None
+    assert [a.get("href") for a in soup.select("a")] == ["/a"]
+    assert soup.select_one("div.description-content").get_text(" ", strip=True) == "Texto uno"
+
+
+# ---------------------------------------------------------------------------
+# Backend parity
+# ---------------------------------------------------------------------------
+
+EVENT_PAGE_HTML = """
+<html><body>
+<div class="card">
+  <a href="https://ueslearning.ues.mx/course/view.php?id=5#section-1">General</a>
+  <a href="https://ueslearning.ues.mx/course/view.php?id=5">IS N Auditoria en Informatica 001</a>
+  <div class="description-content"><p>Leer el <b>capítulo&nbsp;3</b>.</p><!-- nota --><p>Subir PDF</p>
+    <script>var x = 1;</script></div>
+  <a class="card-link" href="https://ueslearning.ues.mx/mod/assign/view.php?id=100">Ir a la actividad</a>
+</div>
+</body></html>
+"""
+
+
+def _parse_all_fixtures():
+    return (
+        parse_events_from_dashboard(FULL_DASHBOARD_HTML),
+        parse_events_from_dashboard(LEGACY_DASHBOARD_HTML),
+        enrich_from_event_page(EVENT_PAGE_HTML),
+        find_assignment_url(EVENT_PAGE_HTML, base="https://ueslearning.ues.mx"),
+        parse_assignment_page(FULL_ASSIGNMENT_TABLE),
+    )
+
+
+def test_backend_output_matches_beautifulsoup(html_backend):
+    results = _parse_all_fixtures()
+    set_html_parser("bs4")
+    assert results == _parse_all_fixtures()
+    assert results[2] == ("IS N Auditoria en Informatica 001", "Leer el\ncapítulo\xa03\n.\nSubir PDF")
+
+
+# ---------------------------------------------------------------------------
+# In-page extraction. The dicts below are hand-written in the shape the
+# *_DOM_JS scripts return and only test the Python half; the scripts
+# themselves run on the fixture HTML in Chromium further down.
+# ---------------------------------------------------------------------------
+
+DASHBOARD_DOM = {
+    "upcoming": [
+        {
+            "title": "Act 8: Investigación de conceptos. está en fecha de entrega",
+            "url": "https://ueslearning.ues.mx/calendar/view.php?view=day&course=11904&time=1772605260#event_101854",
+            "event_id": "101854",
+            "date": "Hoy , 23:21",
+        },
+        {
+            "title": "Act 13: Resumen del Modelo OSI. está en fecha de entrega",
+            "url": "https://ueslearning.ues.mx/calendar/view.php?view=day&course=11944&time=1773039540#event_101838",
+            "event_id": "101838",
+            "date": "domingo, 8 marzo , 23:59",
+        },
+    ],
+    "timeline": [
+        {
+            "title": "Act 13: Resumen del Modelo OSI.",
+            "url": "https://ueslearning.ues.mx/mod/assign/view.php?id=479843",
+            "aria": "Act 13: Resumen del Modelo OSI. actividad en IS N Redes de Computo 001 "
+            "está pendiente para 8 de marzo de 2026, 23:59",
+            "subtitle": "Tarea está en fecha de entrega · IS N Redes de Computo 001",
+            "time": "23:59",
+            "action_url": "https://ueslearning.ues.mx/mod/assign/view.php?id=479843&action=editsubmission",
+        }
+    ],
+}
+
+EVENT_PAGE_DOM = {
+    "course_links": [
+        ["https://ueslearning.ues.mx/course/view.php?id=5#section-1", "General"],
+        ["https://ueslearning.ues.mx/course/view.php?id=5", "IS N Auditoria en Informatica 001"],
+    ],
+    "description": "Leer el\ncapítulo\xa03\n.\nSubir PDF",
+    "card_links": ["https://ueslearning.ues.mx/mod/assign/view.php?id=100"],
+    "links": ["https://ueslearning.ues.mx/mod/assign/view.php?id=100"],
+}
+
+FULL_ASSIGNMENT_DOM = {
+    "rows": [
+        ["Número del intento", "Este es el intento 1.", ["cell", "c1", "lastcol"]],
+        ["Estatus de la entrega", "No se ha enviado nada en esta tarea",
+         ["submissionstatusnosubmission", "cell", "c1", "lastcol"]],
+        ["Estatus de calificación", "Sin calificar", ["submissionnotgraded", "cell", "c1", "lastcol"]],
+        ["Tiempo restante", "2 días 4 horas", ["cell", "c1", "lastcol"]],
+        ["Última modificación", "-", ["cell", "c1", "lastcol"]],
+    ],
+    "status_cell": [["submissionstatusnosubmission", "cell", "c1", "lastcol"], "No se ha enviado nada en esta tarea"],
+    "text": None,
+}
+
+
+def test_dom_extraction_builds_the_same_objects_as_html():
+    base = "https://ueslearning.ues.mx"
+    assert events_from_dashboard_dom(DASHBOARD_DOM) == parse_events_from_dashboard(FULL_DASHBOARD_HTML)
+    assert event_page_from_dom(EVENT_PAGE_DOM, base) == parse_event_page(EVENT_PAGE_HTML, base)
+    assert assignment_status_from_dom(FULL_ASSIGNMENT_DOM) == parse_assignment_page(FULL_ASSIGNMENT_TABLE)
+
+    # Without a status cell the rows, then the page text, decide.
+    row_only = {"rows": [["Estado del envío", "No enviado", []]], "status_cell": None, "text": "Estado del envío No enviado"}
+    html = '<table class="generaltable"><tr><th>Estado del envío</th><td>No enviado</td></tr></table>'
+    assert assignment_status_from_dom(row_only) == parse_assignment_page(html)
+    text_only = {"rows": [], "status_cell": None, "text": "Enviado para calificar"}
+    html = "<html><body><p>Enviado para calificar</p></body></html>"
+    assert assignment_status_from_dom(text_only) == parse_assignment_page(html)
+
+
+def test_dom_extraction_reuses_captured_timeline():
+    captured = events_from_dashboard_dom({"upcoming": [], "timeline": DASHBOARD_DOM["timeline"]})
+    events = events_from_dashboard_dom({"upcoming": DASHBOARD_DOM["upcoming"], "timeline": []}, timeline=captured)
+    assert events == parse_events_from_dashboard(FULL_DASHBOARD_HTML)
+
+
+def test_set_html_parser_auto_and_unknown():
+    assert set_html_parser("auto") == available_backends()[0]
+    assert set_html_parser("no-such-parser") == "bs4"
+
+
+
+BASE_URL = "https://ueslearning.ues.mx"
+
+
+@pytest.fixture(scope="module")
+def chromium_page():
+    """A real Chromium tab (tests using it are skipped when Playwright's Chromium is not installed)."""
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as playwright:
+        try:
+            browser = playwright.chromium.launch()
+        except Exception as ex:
+            pytest.skip(f"Chromium de Playwright no disponible: {ex}")
+        page = browser.new_page()
+        yield page
+        browser.close()
+
+
+def _evaluate_on(page, html: str, script: str):
+    """Serve ``html`` at a Moodle URL (so relative links resolve as on the site) and run ``script`` there."""
+    page.route(f"{BASE_URL}/fixture", lambda route: route.fulfill(body=html, content_type="text/html; charset=utf-8"))
+    try:
+        page.goto(f"{BASE_URL}/fixture")
+        return page.evaluate(script)
+    finally:
+        page.unroute(f"{BASE_URL}/fixture")
+
+
+def test_dom_scripts_match_html_parsers_on_fixtures(chromium_page):
+    dashboard = _evaluate_on(chromium_page, FULL_DASHBOARD_HTML, DASHBOARD_DOM_JS)
+    assert events_from_dashboard_dom(dashboard) == parse_events_from_dashboard(FULL_DASHBOARD_HTML)
+
+    event_page = _evaluate_on(chromium_page, EVENT_PAGE_HTML, EVENT_PAGE_DOM_JS)
+    assert event_page_from_dom(event_page, BASE_URL) == parse_event_page(EVENT_PAGE_HTML, BASE_URL)
+
+    row_only = '<table class="generaltable"><tr><th>Estado del envío</th><td>No enviado</td></tr></table>'
+    text_only = "<html><body><p>Enviado para calificar</p></body></html>"
+    for html in (FULL_ASSIGNMENT_TABLE, row_only, text_only):
+        assignment = _evaluate_on(chromium_page, html, ASSIGNMENT_PAGE_DOM_JS)
+        assert assignment_status_from_dom(assignment) == parse_assignment_page(html)
@@ -0,0 +1,165 @@
+import asyncio
+import json
+import time
+from contextlib import contextmanager
+
+from ues_bot.commands import MOODLE_CLIENT_KEY, SCRAPE_LOCK_KEY, SESSION_TRACKER_KEY, run_session_keepalive
+from ues_bot.config import Settings
+from ues_bot.moodle_api import MoodleClient
+from ues_bot.session import SessionTracker, relogin_browser, session_cookie_expiry, touch_session
+
+from .moodle_stub import MoodleStub
+
+BASE = "https://ueslearning.ues.mx"
+
+
+def _write_storage(path, expires):
+    path.write_text(
+        json.dumps({
+            "cookies": [
+                {"name": "MoodleSession", "value": "abc", "domain": "ueslearning.ues.mx", "expires": expires},
+                {"name": "MoodleSession", "value": "x", "domain": ".other.edu", "expires": 1},
+            ]
+        }),
+        encoding="utf-8",
+    )
+
+
+def test_session_cookie_expiry_reads_matching_cookie(tmp_path):
+    storage = tmp_path / "storage_state.json"
+    _write_storage(storage, 1_900_000_000)
+    assert session_cookie_expiry(str(storage), BASE) == 1_900_000_000
+
+    _write_storage(storage, -1)
+    assert session_cookie_expiry(str(storage), BASE) is None
+    assert session_cookie_expiry(str(tmp_path / "missing.json"), BASE) is None
+
+
+def test_tracker_refresh_window(tmp_path):
+    storage = tmp_path / "storage_state.json"
+    tracker = SessionTracker(str(storage), BASE, idle_timeout_sec=3600)
+    assert tracker.needs_refresh(600) is True  # never seen alive
+
+    tracker.mark_alive()
+    now = time.time()
+    assert tracker.needs_refresh(600, now=now) is False
+    assert tracker.needs_refresh(600, now=now + 3100) is True
+
+    _write_storage(storage, now + 300)
+    assert tracker.cookie_expiring(600, now=now) is True
+    assert tracker.needs_refresh(600, now=now) is True
+
+    tracker.mark_expired()
+    assert tracker.expired is True
+    assert tracker.needs_refresh(600, now=now) is True
+
+
+def test_touch_session_extends_or_marks_expired(tmp_path):
+    with MoodleStub() as stub:
+        storage = tmp_path / "storage_state.json"
+        stub.write_storage_state(storage)
+        client = MoodleClient(stub.base, str(storage), f"{stub.base}/my/")
+        tracker = SessionTracker(str(storage), stub.base, idle_timeout_sec=60)
+
+        assert touch_session(client, tracker) is True
+        assert tracker.expires_at() - time.time() > 7000
+
+        stub.session_valid = False
+        assert touch_session(client, tracker) is False
+        assert tracker.expired is True
+        client.close()
+
+
+class _FakeContextPage:
+    def __init__(self):
+        self.url = ""
+        self.cleared = 0
+        self.saved = []
+
+    # the page doubles as its own browser context
+    @property
+    def context(self):
+        return self
+
+    def clear_cookies(self):
+        self.cleared += 1
+
+    def storage_state(self, path):
+        self.saved.append(path)
+
+    def goto(self, url, **_kwargs):
+        self.url = f"{BASE}/login/index.php" if self.cleared and not self.saved else url
+
+    def wait_for_selector(self, *_args, **_kwargs):
+        return None
+
+    def fill(self, *_args):
+        return None
+
+    def click(self, *_args):
+        self.url = f"{BASE}/my/"
+
+    def wait_for_load_state(self, *_args):
+        return None
+
+
+class _FakeManager:
+    def __init__(self):
+        self.tab = _FakeContextPage()
+
+    @contextmanager
+    def page(self):
+        yield self.tab
+
+
+def test_relogin_browser_clears_cookies_and_saves_state(tmp_path):
+    settings = Settings(ues_user="u", ues_pass="p", dashboard_url=f"{BASE}/my/", storage_file=str(tmp_path / "s.json"))
+    manager = _FakeManager()
+
+    relogin_browser(manager, settings)
+
+    assert manager.tab.cleared == 1
+    assert manager.tab.saved == [settings.storage_file]
+
+
+class _FakeApp:
+    def __init__(self, bot_data):
+        self.bot_data = bot_data
+
+
+class _FakeContext:
+    def __init__(self, app):
+        self.application = app
+
+
+def test_run_session_keepalive_touches_when_due(tmp_path):
+    with MoodleStub() as stub:
+        storage = tmp_path / "storage_state.json"
+        stub.write_storage_state(storage)
+        settings = Settings(base=stub.base, storage_file=str(storage), session_keepalive_min=20)
+        tracker = SessionTracker(str(storage), stub.base, idle_timeout_sec=7200)
+        client = MoodleClient(stub.base, str(storage), f"{stub.base}/my/")
+        app = _FakeApp({
+            "settings": settings,
+            SESSION_TRACKER_KEY: tracker,
+            MOODLE_CLIENT_KEY: client,
+        })
+        context = _FakeContext(app)
+
+        assert asyncio.run(run_session_keepalive(context)) == "extendida"
+        assert asyncio.run(run_session_keepalive(context)) == "vigente"
+
+        tracker.mark_expired()
+
+        async def _while_scraping():
+            app.bot_data[SCRAPE_LOCK_KEY] = asyncio.Lock()
+            async with app.bot_data[SCRAPE_LOCK_KEY]:
+                return await run_session_keepalive(context)
+
+        assert asyncio.run(_while_scraping()) == "ocupado"
+        client.close()
+
+
+def test_run_session_keepalive_without_client_is_noop():
+    context = _FakeContext(_FakeApp({"settings": Settings()}))
+    assert asyncio.run(run_session_keepalive(context)) == "sin sesión"
@@ -5,12 +5,22 @@ import pytest
 
 from ues_bot.state import (
     cancel_sleep,
+    clear_dashboard_snapshot,
+    get_cached_enrichment,
+    get_dashboard_snapshot,
     increment_error_metrics,
     is_sleeping,
     load_state,
+    prune_enrichment_cache,
+    prune_status_checks,
+    record_blocking_metrics,
+    record_cycle_kind,
     record_scrape_metrics,
+    record_status_check,
     save_state,
     set_sleep,
+    store_dashboard_snapshot,
+    store_enrichment,
     update_digest_evening_hour,
     update_notification_mode,
     update_quiet_hours,
@@ -126,3 +136,66 @@ def test_increment_error_metrics_by_kind(tmp_path):
     metrics = state["metrics"]
     assert metrics["network_transient_errors"] == 1
     assert metrics["functional_errors"] == 2
+
+
+def test_enrichment_cache_invalidates_on_title_due_and_ttl(tmp_path):
+    sf = str(tmp_path / "state.json")
+    state = load_state(sf)
+    store_enrichment(state, "ev1", "Tarea", "8 de marzo", "Cálculo", "Desc", "https://x/mod/assign/view.php?id=1")
+    save_state(sf, state)
+    state = load_state(sf)
+
+    hit = get_cached_enrichment(state, "ev1", "Tarea", "8 de marzo", ttl_sec=3600)
+    assert hit["course_name"] == "Cálculo"
+    assert get_cached_enrichment(state, "ev1", "Tarea (v2)", "8 de marzo", ttl_sec=3600) is None
+    assert get_cached_enrichment(state, "ev1", "Tarea", "9 de marzo", ttl_sec=3600) is None
+    assert get_cached_enrichment(state, "ev2", "Tarea", "8 de marzo", ttl_sec=3600) is None
+
+    state["enrichment_cache"]["ev1"]["cached_at"] = int(time.time()) - 7200
+    assert get_cached_enrichment(state, "ev1", "Tarea", "8 de marzo", ttl_sec=3600) is None
+    assert prune_enrichment_cache(state, ttl_sec=3600) == 1
+    assert state["enrichment_cache"] == {}
+
+
+def test_prune_status_checks_drops_entries_not_refreshed(tmp_path):
+    state = load_state(str(tmp_path / "state.json"))
+    record_status_check(state, "listed", "Hoy", True, "Enviado", "")
+    record_status_check(state, "gone", "8 de marzo", False, "Sin entrega", "")
+    state["status_checks"]["gone"]["checked_at"] = int(time.time()) - 31 * 86400
+
+    assert prune_status_checks(state, ttl_sec=30 * 86400) == 1
+    assert set(state["status_checks"]) == {"listed"}
+
+
+def test_dashboard_snapshot_roundtrip_and_cycle_counters(tmp_path):
+    sf = str(tmp_path / "state.json")
+    state = load_state(sf)
+    assert get_dashboard_snapshot(state) is None
+
+    store_dashboard_snapshot(state, "abc", [{"event_id": "1", "title": "Tarea"}])
+    record_cycle_kind(state, short_circuit=False)
+    record_cycle_kind(state, short_circuit=True)
+    save_state(sf, state)
+    state = load_state(sf)
+
+    assert get_dashboard_snapshot(state)["fingerprint"] == "abc"
+    assert get_dashboard_snapshot(state)["events"][0]["title"] == "Tarea"
+    metrics = state["metrics"]
+    assert (metrics["full_cycles"], metrics["short_circuit_cycles"]) == (1, 1)
+    assert metrics["last_cycle_short_circuit"] is True
+
+    clear_dashboard_snapshot(state)
+    assert get_dashboard_snapshot(state) is None
+
+
+def test_blocking_metrics_name_the_byte_figure_an_estimate(tmp_path):
+    state = load_state(str(tmp_path / "state.json"))
+    state["metrics"]["total_blocked_bytes"] = 2048  # written by older versions
+    state["metrics"]["last_blocked_bytes"] = 1024
+
+    record_blocking_metrics(state, blocked_requests=3, estimated_bytes_saved=512)
+
+    metrics = state["metrics"]
+    assert metrics["last_estimated_bytes_saved"] == 512
+    assert metrics["total_estimated_bytes_saved"] == 2560
+    assert "total_blocked_bytes" not in metrics and "last_blocked_bytes" not in metrics
@@ -0,0 +1,488 @@
+"""Long-lived Chromium session shared across scrape cycles."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from playwright.async_api import async_playwright
+from playwright.sync_api import sync_playwright
+
+from .interception import RequestBlocker
+
+log = logging.getLogger(__name__)
+
+# Persistent profile (``UES_BROWSER_PROFILE``), kept next to the state file.
+BROWSER_PROFILE_DIRNAME = "chromium_profile"
+# Parts of a profile Chromium rebuilds on its own; dropped first when the
+# profile outgrows its limit.
+_PROFILE_CACHE_DIRS = (
+    "Cache",
+    "Code Cache",
+    "GPUCache",
+    "DawnCache",
+    "GrShaderCache",
+    "ShaderCache",
+    os.path.join("Service Worker", "CacheStorage"),
+    "Crashpad",
+)
+# How often a running profile is measured against its limit.
+_PROFILE_CHECK_SEC = 6 * 3600
+
+
+def browser_profile_dir(state_file: str) -> str:
+    """Where the persistent profile lives: next to the state file."""
+    return os.path.join(os.path.dirname(os.path.abspath(state_file)), BROWSER_PROFILE_DIRNAME)
+
+
+def profile_size(profile_dir: str) -> int:
+    """Bytes on disk under ``profile_dir`` (0 when it does not exist)."""
+    total = 0
+    for root, _dirs, files in os.walk(profile_dir):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def prune_profile(profile_dir: str, max_bytes: int) -> int:
+    """Bring a profile no browser is using back under ``max_bytes``; return the bytes freed.
+
+    Cache directories go first; if that is not enough the whole profile is
+    removed (the login comes back from ``storage_state.json``).
+    """
+    if max_bytes <= 0:
+        return 0
+    before = profile_size(profile_dir)
+    if before <= max_bytes:
+        return 0
+    for parent in (profile_dir, os.path.join(profile_dir, "Default")):
+        for name in _PROFILE_CACHE_DIRS:
+            shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+    if profile_size(profile_dir) > max_bytes:
+        shutil.rmtree(profile_dir, ignore_errors=True)
+    freed = before - profile_size(profile_dir)
+    log.info("Perfil de Chromium podado: %d MB liberados.", freed // 1_048_576)
+    return freed
+
+
+def profile_launch_args(max_bytes: int) -> List[str]:
+    # Chromium keeps its HTTP cache under half the budget by itself.
+    return [f"--disk-cache-size={max_bytes // 2}"] if max_bytes > 0 else []
+
+
+def storage_cookies(storage_file: str) -> List[Dict[str, Any]]:
+    """Cookies saved in ``storage_state.json``; a persistent context cannot load the file itself."""
+    if not storage_file or not os.path.exists(storage_file):
+        return []
+    try:
+        with open(storage_file, "r", encoding="utf-8") as f:
+            cookies = json.load(f).get("cookies")
+    except (OSError, ValueError, AttributeError):
+        return []
+    return [cookie for cookie in cookies if isinstance(cookie, dict)] if isinstance(cookies, list) else []
+
+
+@dataclass
+class DashboardTab:
+    """The dashboard tab a cycle reads, kept open between cycles with ``UES_DASHBOARD_TAB``.
+
+    ``loaded_on`` (local date) and ``timeline_args`` (the timeline block's
+    own service call) are set by the last full load; a refresh in place
+    replays that call instead of navigating again.
+    """
+
+    page: Any
+    loaded_on: str = ""
+    timeline_args: Optional[Dict[str, Any]] = None
+
+
+class BrowserManager:
+    """Keep one Chromium process and one ``BrowserContext`` alive between cycles.
+
+    The context is created once (restoring ``storage_state`` when available) and
+    reused, so the login cookies it picks up stay valid for the next cycle.
+    If the browser disconnects or the context closes, the next ``page()`` call
+    relaunches both.
+
+    Sync Playwright objects are bound to the thread that created them, so async
+    callers must go through ``run()``, which uses a dedicated worker thread.
+
+    With a ``blocker`` every new context gets its request-interception route.
+
+    With a ``profile_dir`` Chromium runs on that persistent profile
+    (``launch_persistent_context``), so its HTTP cache survives relaunches;
+    cookies still come from ``storage_state``. A profile over
+    ``profile_max_mb`` is pruned before launching, and a running one is
+    measured every few hours and relaunched to be pruned.
+    """
+
+    def __init__(
+        self,
+        storage_file: str = "",
+        headless: bool = True,
+        blocker: RequestBlocker | None = None,
+        profile_dir: str = "",
+        profile_max_mb: int = 0,
+    ) -> None:
+        self.storage_file = storage_file
+        self.headless = headless
+        self.blocker = blocker
+        self.profile_dir = profile_dir
+        self.profile_max_bytes = max(0, int(profile_max_mb)) * 1_048_576
+        self.launches = 0
+        self._playwright: Any = None
+        self._browser: Any = None
+        self._context: Any = None
+        self._dashboard: DashboardTab | None = None
+        self._profile_checked_at = 0.0
+        self._executor: ThreadPoolExecutor | None = None
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def is_alive(self) -> bool:
+        if self._context is None:
+            return False
+        if self._browser is None:
+            # A persistent context has no Browser; its "close" event covers a crash.
+            return bool(self.profile_dir)
+        return self._browser.is_connected()
+
+    def _profile_over_limit(self) -> bool:
+        if not self.profile_dir or not self.profile_max_bytes:
+            return False
+        now = time.monotonic()
+        if now - self._profile_checked_at < _PROFILE_CHECK_SEC:
+            return False
+        self._profile_checked_at = now
+        return profile_size(self.profile_dir) > self.profile_max_bytes
+
+    def ensure_context(self) -> Any:
+        """Return the live context, (re)launching Chromium if needed."""
+        if self.is_alive():
+            if not self._profile_over_limit():
+                return self._context
+            log.info("Perfil de Chromium sobre su límite; reiniciando el navegador para podarlo.")
+        elif self._browser is not None or self._context is not None:
+            log.warning("Chromium desconectado o contexto cerrado; relanzando navegador.")
+        self.reset()
+
+        if self._playwright is None:
+            self._playwright = sync_playwright().start()
+        if self.profile_dir:
+            browser = None
+            context = self._launch_profile()
+        else:
+            browser = self._playwright.chromium.launch(headless=self.headless)
+            browser.on("disconnected", self._on_browser_disconnected)
+            context = self._new_context(browser)
+        context.on("close", self._on_context_closed)
+        if self.blocker is not None:
+            self.blocker.install(context)
+
+        self._browser = browser
+        self._context = context
+        self.launches += 1
+        log.info("Chromium iniciado (lanzamiento #%d).", self.launches)
+        return context
+
+    def _new_context(self, browser: Any) -> Any:
+        if self.storage_file and os.path.exists(self.storage_file):
+            return browser.new_context(storage_state=self.storage_file)
+        return browser.new_context()
+
+    def _launch_profile(self) -> Any:
+        prune_profile(self.profile_dir, self.profile_max_bytes)
+        self._profile_checked_at = time.monotonic()
+        context = self._playwright.chromium.launch_persistent_context(
+            self.profile_dir, headless=self.headless, args=profile_launch_args(self.profile_max_bytes)
+        )
+        cookies = storage_cookies(self.storage_file)
+        if cookies:
+            context.add_cookies(cookies)
+        return context
+
+    def _on_browser_disconnected(self, _browser: Any) -> None:
+        self._browser = None
+        self._context = None
+
+    def _on_context_closed(self, _context: Any) -> None:
+        self._context = None
+
+    @contextmanager
+    def page(self) -> Iterator[Any]:
+        """Yield a fresh page in the shared context and close it afterwards."""
+        context = self.ensure_context()
+        try:
+            page = context.new_page()
+        except Exception:
+            # The context died between cycles without firing an event.
+            log.warning("No se pudo abrir pestaña; relanzando navegador.", exc_info=True)
+            self.reset()
+            page = self.ensure_context().new_page()
+
+        try:
+            yield page
+        except Exception:
+            if not self.is_alive():
+                self.reset()
+            raise
+        finally:
+            try:
+                page.close()
+            except Exception:
+                pass
+
+    @contextmanager
+    def dashboard_tab(self) -> Iterator[DashboardTab]:
+        """Yield the dashboard tab, opening it on first use; unlike ``page()`` it stays open.
+
+        A tab whose cycle raised is closed, so the next one starts over.
+        """
+        context = self.ensure_context()
+        tab = self._dashboard
+        if tab is None or tab.page.is_closed():
+            try:
+                page = context.new_page()
+            except Exception:
+                log.warning("No se pudo abrir pestaña; relanzando navegador.", exc_info=True)
+                self.reset()
+                page = self.ensure_context().new_page()
+            tab = self._dashboard = DashboardTab(page)
+
+        try:
+            yield tab
+        except Exception:
+            self._dashboard = None
+            try:
+                tab.page.close()
+            except Exception:
+                pass
+            if not self.is_alive():
+                self.reset()
+            raise
+
+    def reset(self) -> None:
+        """Close context and browser (the Playwright driver stays up)."""
+        context, browser = self._context, self._browser
+        self._context = None
+        self._browser = None
+        self._dashboard = None
+        for closable in (context, browser):
+            if closable is None:
+                continue
+            try:
+                closable.close()
+            except Exception:
+                pass
+
+    def close(self) -> None:
+        self.reset()
+        if self._playwright is not None:
+            try:
+                self._playwright.stop()
+            except Exception:
+                pass
+            self._playwright = None
+
+    # -- thread affinity ---------------------------------------------------
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run ``fn(*args)`` on the manager's dedicated browser thread."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ues-browser")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args))
+
+    def shutdown(self) -> None:
+        """Close the browser from its own thread and stop the worker."""
+        if self._executor is None:
+            self.close()
+            return
+        try:
+            self._executor.submit(self.close).result(timeout=30)
+        except Exception:
+            log.warning("No se pudo cerrar Chromium limpiamente.", exc_info=True)
+        self._executor.shutdown(wait=False)
+        self._executor = None
+
+
+class AsyncBrowserManager:
+    """``async_playwright`` twin of ``BrowserManager``.
+
+    Lives on the bot's event loop, so scrape cycles share the browser without
+    any thread handoff.
+    """
+
+    def __init__(
+        self,
+        storage_file: str = "",
+        headless: bool = True,
+        blocker: RequestBlocker | None = None,
+        profile_dir: str = "",
+        profile_max_mb: int = 0,
+    ) -> None:
+        self.storage_file = storage_file
+        self.headless = headless
+        self.blocker = blocker
+        self.profile_dir = profile_dir
+        self.profile_max_bytes = max(0, int(profile_max_mb)) * 1_048_576
+        self.launches = 0
+        self._playwright: Any = None
+        self._browser: Any = None
+        self._context: Any = None
+        self._dashboard: DashboardTab | None = None
+        self._profile_checked_at = 0.0
+        self._launch_lock = asyncio.Lock()
+
+    def is_alive(self) -> bool:
+        if self._context is None:
+            return False
+        if self._browser is None:
+            return bool(self.profile_dir)
+        return self._browser.is_connected()
+
+    async def _profile_over_limit(self) -> bool:
+        if not self.profile_dir or not self.profile_max_bytes:
+            return False
+        now = time.monotonic()
+        if now - self._profile_checked_at < _PROFILE_CHECK_SEC:
+            return False
+        self._profile_checked_at = now
+        return await asyncio.to_thread(profile_size, self.profile_dir) > self.profile_max_bytes
+
+    async def ensure_context(self) -> Any:
+        """Return the live context, (re)launching Chromium if needed."""
+        async with self._launch_lock:
+            if self.is_alive():
+                if not await self._profile_over_limit():
+                    return self._context
+                log.info("Perfil de Chromium sobre su límite; reiniciando el navegador para podarlo.")
+            elif self._browser is not None or self._context is not None:
+                log.warning("Chromium desconectado o contexto cerrado; relanzando navegador.")
+            await self.reset()
+
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            if self.profile_dir:
+                browser = None
+                context = await self._launch_profile()
+            else:
+                browser = await self._playwright.chromium.launch(headless=self.headless)
+                browser.on("disconnected", self._on_browser_disconnected)
+                context = await self._new_context(browser)
+            context.on("close", self._on_context_closed)
+            if self.blocker is not None:
+                await self.blocker.install_async(context)
+
+            self._browser = browser
+            self._context = context
+            self.launches += 1
+            log.info("Chromium (async) iniciado (lanzamiento #%d).", self.launches)
+            return context
+
+    async def _new_context(self, browser: Any) -> Any:
+        if self.storage_file and os.path.exists(self.storage_file):
+            return await browser.new_context(storage_state=self.storage_file)
+        return await browser.new_context()
+
+    async def _launch_profile(self) -> Any:
+        await asyncio.to_thread(prune_profile, self.profile_dir, self.profile_max_bytes)
+        self._profile_checked_at = time.monotonic()
+        context = await self._playwright.chromium.launch_persistent_context(
+            self.profile_dir, headless=self.headless, args=profile_launch_args(self.profile_max_bytes)
+        )
+        cookies = storage_cookies(self.storage_file)
+        if cookies:
+            await context.add_cookies(cookies)
+        return context
+
+    def _on_browser_disconnected(self, _browser: Any) -> None:
+        self._browser = None
+        self._context = None
+
+    def _on_context_closed(self, _context: Any) -> None:
+        self._context = None
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator[Any]:
+        """Yield a fresh page in the shared context and close it afterwards."""
+        context = await self.ensure_context()
+        try:
+            page = await context.new_page()
+        except Exception:
+            log.warning("No se pudo abrir pestaña; relanzando navegador.", exc_info=True)
+            await self.reset()
+            page = await (await self.ensure_context()).new_page()
+
+        try:
+            yield page
+        except Exception:
+            if not self.is_alive():
+                await self.reset()
+            raise
+        finally:
+            try:
+                await page.close()
+            except Exception:
+                pass
+
+    @asynccontextmanager
+    async def dashboard_tab(self) -> AsyncIterator[DashboardTab]:
+        """Yield the dashboard tab, opening it on first use; unlike ``page()`` it stays open."""
+        context = await self.ensure_context()
+        tab = self._dashboard
+        if tab is None or tab.page.is_closed():
+            try:
+                page = await context.new_page()
+            except Exception:
+                log.warning("No se pudo abrir pestaña; relanzando navegador.", exc_info=True)
+                await self.reset()
+                page = await (await self.ensure_context()).new_page()
+            tab = self._dashboard = DashboardTab(page)
+
+        try:
+            yield tab
+        except Exception:
+            self._dashboard = None
+            try:
+                await tab.page.close()
+            except Exception:
+                pass
+            if not self.is_alive():
+                await self.reset()
+            raise
+
+    async def reset(self) -> None:
+        """Close context and browser (the Playwright driver stays up)."""
+        context, browser = self._context, self._browser
+        self._context = None
+        self._browser = None
+        self._dashboard = None
+        for closable in (context, browser):
+            if closable is None:
+                continue
+            try:
+                await closable.close()
+            except Exception:
+                pass
+
+    async def close(self) -> None:
+        await self.reset()
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception:
+                pass
+            self._playwright = None
@@ -17,12 +17,27 @@ except Exception:  # pragma: no cover
 from telegram import Update
 from telegram.ext import Application, CommandHandler, ContextTypes
 
-from .ical import build_ics_filename, build_iphone_calendar_ics
-from .scrape_job import run_scrape_cycle
+from .browser import AsyncBrowserManager, BrowserManager
+from .descriptions import fill_descriptions, html_from_pages, pending_description_urls
+from .ical import build_ics_filename, build_iphone_calendar_ics, events_for_ics
+from .moodle_api import MoodleClient
+from .scrape import fetch_pages_html, fetch_pages_html_async
+from .scrape_job import refresh_assignment_statuses, run_scrape_cycle, run_scrape_cycle_ajax, run_scrape_cycle_async
+from .session import (
+    SessionTracker,
+    describe_expiry,
+    keepalive_margin_sec,
+    relogin_browser,
+    relogin_browser_async,
+    relogin_with_new_browser,
+    touch_session,
+)
 from .state import (
     cancel_sleep,
     is_sleeping,
     load_state,
+    merge_descriptions,
+    request_status_recheck,
     save_state,
     set_sleep,
     update_digest_evening_hour,
@@ -49,6 +64,9 @@ SCRAPE_JOB_CALLBACK_KEY = "scrape_job_callback"
 SCRAPE_LOCK_KEY = "scrape_lock"
 SCRAPE_COMMAND_COOLDOWN = 60
 LAST_SCRAPE_TS_KEY = "last_scrape_command_ts"
+BROWSER_MANAGER_KEY = "browser_manager"
+MOODLE_CLIENT_KEY = "moodle_client"
+SESSION_TRACKER_KEY = "session_tracker"
 
 
 CommandFn = Callable[[Update, ContextTypes.DEFAULT_TYPE], Coroutine[Any, Any, None]]
@@ -121,12 +139,97 @@ async def run_scrape_now(
         except TimeoutError as ex:
             raise ScrapeAlreadyRunningError("Ya hay un scraping en curso. Intenta de nuevo en unos segundos.") from ex
 
+    session = context.application.bot_data.get(SESSION_TRACKER_KEY)
+    session = session if isinstance(session, SessionTracker) else None
     try:
-        return await asyncio.to_thread(run_scrape_cycle, settings, run_args)
+        engine = getattr(settings, "scrape_engine", "thread")
+        if engine == "ajax":
+            client = context.application.bot_data.get(MOODLE_CLIENT_KEY)
+            client = client if isinstance(client, MoodleClient) else None
+            return await asyncio.to_thread(run_scrape_cycle_ajax, settings, run_args, client, session)
+        manager = context.application.bot_data.get(BROWSER_MANAGER_KEY)
+        if engine == "async":
+            async_manager = manager if isinstance(manager, AsyncBrowserManager) else None
+            return await run_scrape_cycle_async(settings, run_args, async_manager, session)
+        if isinstance(manager, BrowserManager):
+            return await manager.run(run_scrape_cycle, settings, run_args, manager, session)
+        return await asyncio.to_thread(run_scrape_cycle, settings, run_args, None, session)
     finally:
         lock.release()
 
 
+async def run_session_keepalive(context: ContextTypes.DEFAULT_TYPE) -> str:
+    """Keep the Moodle session alive between cycles; returns what was done.
+
+    Touches the session over HTTP when it would lapse before the next run,
+    and logs in again (in the shared browser when there is one) if it
+    already died or its cookie is about to expire. Skipped while a scrape
+    holds the lock: the cycle checks the session itself.
+    """
+    bot_data = context.application.bot_data
+    settings = bot_data["settings"]
+    session = bot_data.get(SESSION_TRACKER_KEY)
+    client = bot_data.get(MOODLE_CLIENT_KEY)
+    if not isinstance(session, SessionTracker) or not isinstance(client, MoodleClient):
+        return "sin sesión"
+
+    margin = keepalive_margin_sec(settings)
+    if not session.needs_refresh(margin):
+        return "vigente"
+
+    lock = bot_data.get(SCRAPE_LOCK_KEY)
+    if not isinstance(lock, asyncio.Lock):
+        lock = asyncio.Lock()
+        bot_data[SCRAPE_LOCK_KEY] = lock
+    if lock.locked():
+        return "ocupado"
+
+    async with lock:
+        if not session.cookie_expiring(margin) and await asyncio.to_thread(touch_session, client, session):
+            logging.info("Sesión Moodle extendida (expira en %s).", describe_expiry(session))
+            return "extendida"
+
+        logging.info("Renovando sesión Moodle en segundo plano.")
+        manager = bot_data.get(BROWSER_MANAGER_KEY)
+        if isinstance(manager, AsyncBrowserManager):
+            await relogin_browser_async(manager, settings)
+        elif isinstance(manager, BrowserManager):
+            await manager.run(relogin_browser, manager, settings)
+        else:
+            headful = bool(bot_data.get("run_scrape_args", {}).get("headful", settings.headful))
+            await asyncio.to_thread(relogin_with_new_browser, settings, headful)
+        client.reload_cookies()
+        session.mark_alive()
+        return "renovada"
+
+
+async def refresh_reminder_statuses(context: ContextTypes.DEFAULT_TYPE, events: list) -> int:
+    """Re-read the submission status of ``events`` ahead of their reminder; returns how many were refreshed.
+
+    Uses the pooled HTTP client, no browser or dashboard. Skipped while a
+    scrape holds the lock: that cycle refreshes near-deadline items itself.
+    """
+    bot_data = context.application.bot_data
+    settings = bot_data["settings"]
+    client = bot_data.get(MOODLE_CLIENT_KEY)
+    if not isinstance(client, MoodleClient):
+        return 0
+    lock = bot_data.get(SCRAPE_LOCK_KEY)
+    if not isinstance(lock, asyncio.Lock):
+        lock = asyncio.Lock()
+        bot_data[SCRAPE_LOCK_KEY] = lock
+    if lock.locked():
+        return 0
+
+    async with lock:
+        state = load_state(settings.state_file)
+        failed = await asyncio.to_thread(refresh_assignment_statuses, client, state, events)
+        save_state(settings.state_file, state)
+    refreshed = sum(1 for event in events if event.assignment_url and event.event_id not in failed)
+    logging.info("Prefetch de recordatorios: %d estatus actualizados (%d fallidos).", refreshed, len(failed))
+    return refreshed
+
+
 def _reschedule_interval_job(app: Application, minutes: int) -> None:
     callback = app.bot_data.get(SCRAPE_JOB_CALLBACK_KEY)
     if callback is None:
@@ -196,6 +299,67 @@ async def _scrape_or_reply(
         return None
 
 
+def _browser_description_pages(manager: BrowserManager, urls: list, concurrency: int) -> dict:
+    return fetch_pages_html(manager.ensure_context(), urls, concurrency=concurrency)
+
+
+async def _fill_descriptions(context: ContextTypes.DEFAULT_TYPE, events: list) -> None:
+    """Fetch the missing descriptions of just the events about to be shown (cached in state).
+
+    Pages come from the pooled HTTP client or, without one, from tabs of the
+    shared browser. The fetch runs on a copy of the state; afterwards only
+    the new descriptions are merged into a freshly loaded state under the
+    scrape lock, so a cycle or reminder that saved meanwhile keeps its data.
+    """
+    if all(event.description for event in events):
+        return
+    bot_data = context.application.bot_data
+    settings = bot_data["settings"]
+    state = load_state(settings.state_file)
+    client = bot_data.get(MOODLE_CLIENT_KEY)
+    manager = bot_data.get(BROWSER_MANAGER_KEY)
+    if isinstance(client, MoodleClient):
+        get_html = client.get_html
+    elif isinstance(manager, (BrowserManager, AsyncBrowserManager)):
+        urls = pending_description_urls(state, events)
+        concurrency = max(1, int(settings.scrape_concurrency))
+        if not urls:
+            pages = {}
+        elif isinstance(manager, AsyncBrowserManager):
+            pages = await fetch_pages_html_async(await manager.ensure_context(), urls, concurrency=concurrency)
+        else:
+            pages = await manager.run(_browser_description_pages, manager, urls, concurrency)
+        get_html = html_from_pages(pages)
+    else:
+        logging.debug("Sin cliente HTTP ni navegador compartido; descripciones faltantes no se cargan.")
+        return
+
+    cached = {event_id for event_id, entry in state.get("descriptions", {}).items() if "text" in entry}
+    if not await asyncio.to_thread(fill_descriptions, state, events, get_html):
+        return
+    fetched = {
+        event_id: entry
+        for event_id, entry in state["descriptions"].items()
+        if "text" in entry and event_id not in cached
+    }
+
+    lock = bot_data.get(SCRAPE_LOCK_KEY)
+    if not isinstance(lock, asyncio.Lock):
+        lock = asyncio.Lock()
+        bot_data[SCRAPE_LOCK_KEY] = lock
+    try:
+        await asyncio.wait_for(lock.acquire(), timeout=max(1.0, float(getattr(settings, "scrape_lock_wait_sec", 0))))
+    except TimeoutError:
+        logging.info("Scraping en curso; %d descripciones mostradas sin guardar en caché.", len(fetched))
+        return
+    try:
+        fresh = load_state(settings.state_file)
+        merge_descriptions(fresh, fetched)
+        save_state(settings.state_file, fresh)
+    finally:
+        lock.release()
+
+
 @_restricted
 async def cmd_dormir(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     settings = context.application.bot_data["settings"]
@@ -294,6 +458,7 @@ async def cmd_iphonecal(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         return
     events_all, _ = result
 
+    await _fill_descriptions(context, events_for_ics(events_all, days_ahead=30))
     ics_data, count = build_iphone_calendar_ics(events_all, tz_name=settings.tz_name, days_ahead=30)
     if count == 0:
         await _reply(update, "No hay pendientes con fecha en los próximos 30 días para exportar.")
@@ -503,6 +668,7 @@ async def cmd_config(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
         f"  Quiet hours: <b>{esc(settings.quiet_start)} - {esc(settings.quiet_end)}</b>\n\n"
         f"<b>⚡ Scraping</b>\n"
         f"  Intervalo: <b>{settings.scrape_interval_min} min</b>\n"
+        f"  Motor: <b>{esc(getattr(settings, 'scrape_engine', 'thread'))}</b>\n"
         f"  Urgencia: <b>{settings.urgent_hours}h</b>\n\n"
         f"<b>📋 Display</b>\n"
         f"  Máx cambios: <b>{settings.max_change_items}</b>\n"
@@ -529,7 +695,23 @@ async def cmd_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         f"• Errores funcionales: <b>{metrics.get('functional_errors', 0)}</b>\n"
         f"• Último scrape: <b>{metrics.get('last_scrape_seconds', 0)}s</b>\n"
         f"• Promedio: <b>{metrics.get('avg_scrape_seconds', 0)}s</b>\n"
-        f"• Eventos último ciclo: <b>{metrics.get('last_event_count', 0)}</b>"
+        f"• Eventos último ciclo: <b>{metrics.get('last_event_count', 0)}</b>\n"
+        f"• Recursos bloqueados último ciclo: <b>{metrics.get('last_blocked_requests', 0)}</b>"
+        f" (estimado ~{int(metrics.get('last_estimated_bytes_saved', 0)) // 1024} KB)\n"
+        "• Ahorro estimado acumulado (tamaño típico por tipo, no medido): "
+        f"<b>~{int(metrics.get('total_estimated_bytes_saved', 0)) / 1_048_576:.1f} MB</b>\n"
+        f"• Caché de eventos último ciclo: <b>{metrics.get('last_cache_hits', 0)}</b> aciertos / "
+        f"<b>{metrics.get('last_cache_misses', 0)}</b> fallos\n"
+        f"• Caché acumulado: <b>{metrics.get('total_cache_hits', 0)}</b> / "
+        f"<b>{metrics.get('total_cache_misses', 0)}</b>\n"
+        f"• Assignments revisados último ciclo: <b>{metrics.get('last_status_checked', 0)}</b>"
+        f" (omitidos: {metrics.get('last_status_skipped', 0)})\n"
+        f"• Ciclos sin cambios en dashboard: <b>{metrics.get('short_circuit_cycles', 0)}</b> / "
+        f"completos: <b>{metrics.get('full_cycles', 0)}</b>\n"
+        f"• Pestaña del dashboard: <b>{metrics.get('dashboard_tab_refreshes', 0)}</b> refrescos / "
+        f"<b>{metrics.get('dashboard_tab_reloads', 0)}</b> cargas completas\n"
+        f"• Páginas de assignment sin cambios último ciclo: <b>{metrics.get('last_page_hash_hits', 0)}</b>"
+        f" (parseadas: {metrics.get('last_page_hash_misses', 0)})"
     )
     await _reply(update, text, parse_mode="HTML", disable_web_page_preview=True)
 
@@ -559,6 +741,7 @@ async def cmd_proxima(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         return
 
     e = pending[0]
+    await _fill_descriptions(context, [e])
     du = due_unix(e)
     _, rem = remaining_parts_from_unix(du) if du else (0, "N/D")
     g_badge = grading_badge(e.grading_status)
@@ -659,6 +842,7 @@ async def cmd_detalle(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         await _reply(update, f"No encontré evento «{esc(query)}». Usa /resumen para ver la lista numerada.")
         return
 
+    await _fill_descriptions(context, [e])
     du = due_unix(e)
     _, rem = remaining_parts_from_unix(du) if du else (0, "N/D")
     g_badge = grading_badge(e.grading_status)
@@ -721,6 +905,27 @@ async def cmd_preview(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         await tg_send(part, settings.tg_bot_token, settings.tg_chat_id, dry_run=settings.dry_run, bot=context.bot)
 
 
+@_restricted
+async def cmd_verificar(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Re-read every assignment page now, ignoring the status refresh policy."""
+    settings = context.application.bot_data["settings"]
+    state = load_state(settings.state_file)
+    request_status_recheck(state)
+    save_state(settings.state_file, state)
+
+    result = await _scrape_or_reply(update, context, "verificar", "Re-verificando estado de entrega de todas las tareas...")
+    if result is None:
+        return
+    events_all, _ = result
+    checked = [e for e in events_all if e.assignment_url]
+    pending = sum(1 for e in checked if e.submitted is not True)
+    await _reply(
+        update,
+        f"✅ Estado de entrega re-verificado en <b>{len(checked)}</b> tareas (<b>{pending}</b> sin enviar).",
+        parse_mode="HTML",
+    )
+
+
 @_restricted
 async def cmd_help(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     text = (
@@ -736,7 +941,8 @@ async def cmd_help(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         "/materia [nombre] — Filtrar por materia\n"
         "/detalle &lt;n|texto&gt; — Detalles de un evento\n"
         "/calendario — Vista semanal\n"
-        "/materiastats — Estadísticas por materia\n\n"
+        "/materiastats — Estadísticas por materia\n"
+        "/verificar — Re-verifica el estado de entrega de todas las tareas\n\n"
 
         "<b>📤 Exportar</b>\n"
         "/iphonecal — Exportar .ics para iPhone Calendar\n\n"
@@ -772,6 +978,7 @@ def register_handlers(application: Application) -> None:
     application.add_handler(CommandHandler("calendario", cmd_calendario))
     application.add_handler(CommandHandler("iphonecal", cmd_iphonecal))
     application.add_handler(CommandHandler("materiastats", cmd_materiastats))
+    application.add_handler(CommandHandler("verificar", cmd_verificar))
     application.add_handler(CommandHandler("notificar", cmd_notificar))
     application.add_handler(CommandHandler("digestpm", cmd_digestpm))
     application.add_handler(CommandHandler("estado", cmd_estado))
@@ -4,6 +4,9 @@ from __future__ import annotations
 
 import os
 from dataclasses import dataclass
+from typing import Tuple
+
+from .interception import DEFAULT_BLOCK_RESOURCE_TYPES, DEFAULT_BLOCK_URL_PATTERNS, parse_csv
 
 DEFAULT_BASE = "https://ueslearning.ues.mx"
 DEFAULT_DASHBOARD_PATH = "/my/"
@@ -37,6 +40,17 @@ class Settings:
     urgent_hours: int = 24
     scrape_interval_min: int = 60
     scrape_lock_wait_sec: int = 12
+    scrape_concurrency: int = 4  # tabs used in parallel for event/assignment pages
+    enrichment_cache_ttl_hours: int = 24  # 0 = always re-open event pages
+    timeline_capture: bool = True  # build timeline events from its AJAX JSON while the dashboard loads
+    extraction_mode: str = "html"  # "html" (page.content() + parser) | "dom" (in-page script returns the fields)
+    html_parser: str = "auto"  # "auto" (fastest installed) | "selectolax" | "lxml" | "bs4"
+    assignment_fetch: str = "request"  # "request" (HTTP GET with context cookies) | "navigate" (open a tab)
+    assignment_index: bool = True  # read submission status from each course's mod/assign/index.php
+    grades_interval_hours: int = 6  # gradebook check for new grades; 0 = off (grading read from assignment pages)
+    adaptive_status_refresh: bool = True  # recheck assignment pages by status/deadline instead of every cycle
+    dashboard_short_circuit: bool = True  # reuse last cycle's events when the dashboard fingerprint is unchanged
+    dashboard_tab: bool = False  # keep the dashboard tab open and refresh its blocks in place each cycle
     max_change_items: int = 12
     max_summary_lines: int = 18
 
@@ -49,6 +63,19 @@ class Settings:
     digest_hour: str = "07:00"
     digest_evening_hour: str = "20:00"  # empty string = disabled
     notification_mode: str = "smart"  # "smart" | "silent" | "all"
+    keep_browser: bool = True  # reuse one Chromium across cycles
+    browser_profile: bool = False  # kept Chromium runs on a persistent profile next to the state file (disk cache)
+    browser_profile_max_mb: int = 256  # profile size limit; half of it caps the HTTP cache
+    scrape_engine: str = "thread"  # "thread" (sync Playwright in a worker) | "async" | "ajax" (no browser)
+    block_resources: bool = True  # abort images/fonts/CSS/analytics in the scraper context
+    block_resource_types: Tuple[str, ...] = DEFAULT_BLOCK_RESOURCE_TYPES
+    block_url_patterns: Tuple[str, ...] = DEFAULT_BLOCK_URL_PATTERNS
+    session_keepalive_min: int = 20  # 0 = no background keepalive/re-login
+    session_idle_timeout_min: int = 120  # Moodle's sessiontimeout when the site does not report it
+    reminder_prefetch_min: int = 5  # refresh assignments this long before a reminder threshold; 0 = off
+    timeline_days_ahead: int = 0  # ajax engine: explicit timeline window; 0 = the dashboard's first page
+    timeline_overdue_days: int = 14
+    timeline_full_sync_hours: int = 24  # between full syncs only the near window and new horizon are fetched
 
 
 def from_env() -> Settings:
@@ -71,6 +98,17 @@ def from_env() -> Settings:
         urgent_hours=int(os.getenv("UES_URGENT_HOURS", "24")),
         scrape_interval_min=int(os.getenv("UES_SCRAPE_INTERVAL_MIN", "60")),
         scrape_lock_wait_sec=int(os.getenv("UES_SCRAPE_LOCK_WAIT_SEC", "12")),
+        scrape_concurrency=int(os.getenv("UES_SCRAPE_CONCURRENCY", "4")),
+        enrichment_cache_ttl_hours=int(os.getenv("UES_ENRICHMENT_CACHE_TTL_HOURS", "24")),
+        timeline_capture=os.getenv("UES_TIMELINE_CAPTURE", "true").lower() in {"1", "true", "yes", "on"},
+        extraction_mode=os.getenv("UES_EXTRACTION_MODE", "html").lower(),
+        html_parser=os.getenv("UES_HTML_PARSER", "auto").lower(),
+        assignment_fetch=os.getenv("UES_ASSIGNMENT_FETCH", "request").lower(),
+        assignment_index=os.getenv("UES_ASSIGNMENT_INDEX", "true").lower() in {"1", "true", "yes", "on"},
+        grades_interval_hours=int(os.getenv("UES_GRADES_INTERVAL_HOURS", "6")),
+        adaptive_status_refresh=os.getenv("UES_ADAPTIVE_STATUS_REFRESH", "true").lower() in {"1", "true", "yes", "on"},
+        dashboard_short_circuit=os.getenv("UES_DASHBOARD_SHORT_CIRCUIT", "true").lower() in {"1", "true", "yes", "on"},
+        dashboard_tab=os.getenv("UES_DASHBOARD_TAB", "false").lower() in {"1", "true", "yes", "on"},
         max_change_items=int(os.getenv("UES_MAX_CHANGE_ITEMS", "12")),
         max_summary_lines=int(os.getenv("UES_MAX_SUMMARY_LINES", "18")),
         only_changes=os.getenv("UES_ONLY_CHANGES", "true").lower() in {"1", "true", "yes", "on"},
@@ -78,4 +116,17 @@ def from_env() -> Settings:
         digest_hour=os.getenv("UES_DIGEST_HOUR", "07:00"),
         digest_evening_hour=os.getenv("UES_DIGEST_EVENING_HOUR", "20:00"),
         notification_mode=os.getenv("UES_NOTIFICATION_MODE", "smart"),
+        keep_browser=os.getenv("UES_KEEP_BROWSER", "true").lower() in {"1", "true", "yes", "on"},
+        browser_profile=os.getenv("UES_BROWSER_PROFILE", "false").lower() in {"1", "true", "yes", "on"},
+        browser_profile_max_mb=int(os.getenv("UES_BROWSER_PROFILE_MAX_MB", "256")),
+        scrape_engine=os.getenv("UES_SCRAPE_ENGINE", "thread").lower(),
+        block_resources=os.getenv("UES_BLOCK_RESOURCES", "true").lower() in {"1", "true", "yes", "on"},
+        block_resource_types=parse_csv(os.getenv("UES_BLOCK_RESOURCE_TYPES", ",".join(DEFAULT_BLOCK_RESOURCE_TYPES))),
+        block_url_patterns=parse_csv(os.getenv("UES_BLOCK_URL_PATTERNS", ",".join(DEFAULT_BLOCK_URL_PATTERNS))),
+        session_keepalive_min=int(os.getenv("UES_SESSION_KEEPALIVE_MIN", "20")),
+        session_idle_timeout_min=int(os.getenv("UES_SESSION_IDLE_TIMEOUT_MIN", "120")),
+        reminder_prefetch_min=int(os.getenv("UES_REMINDER_PREFETCH_MIN", "5")),
+        timeline_days_ahead=int(os.getenv("UES_TIMELINE_DAYS_AHEAD", "0")),
+        timeline_overdue_days=int(os.getenv("UES_TIMELINE_OVERDUE_DAYS", "14")),
+        timeline_full_sync_hours=int(os.getenv("UES_TIMELINE_FULL_SYNC_HOURS", "24")),
     )
@@ -0,0 +1,103 @@
+"""On-demand event descriptions.
+
+Descriptions only appear in ``/detalle``, ``/proxima`` and the ``.ics``
+export, so periodic cycles never open a page just to read one: they keep
+whatever the dashboard JSON or an event page opened for other reasons
+already gave, and record in ``state["descriptions"]`` where each missing
+one can be read. The display commands call ``fill_descriptions`` for just
+the events they show; fetched text is cached there until the event's page
+changes or it leaves the dashboard.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from typing import Any, Callable, Dict, List, Mapping
+
+from .html_backends import parse_html
+from .models import Event
+from .scrape import parse_event_page
+from .state import get_description_entry, record_description_sources, store_description
+
+log = logging.getLogger(__name__)
+
+
+def description_url(event: Event) -> str:
+    """Page holding ``event``'s description: its calendar event page, or the activity page timeline items link to."""
+    return event.url
+
+
+def parse_description(page_html: str) -> str:
+    """Description text from a calendar event page, or the intro of an activity page."""
+    description = parse_event_page(page_html).description
+    if description:
+        return description
+    intro = parse_html(page_html).select_one("div.activity-description, div#intro")
+    if intro is None:
+        return ""
+    return re.sub(r"\n{3,}", "\n\n", intro.get_text("\n", strip=True)).strip()
+
+
+def record_missing_descriptions(state: Dict[str, Any], events: List[Event]) -> None:
+    """Called by the cycle: remember where each event without a description can get one."""
+    record_description_sources(
+        state,
+        {event.event_id: description_url(event) for event in events if not event.description and event.url},
+    )
+
+
+def pending_description_urls(state: Dict[str, Any], events: List[Event]) -> List[str]:
+    """Pages ``fill_descriptions`` would have to open for ``events`` (neither described nor cached)."""
+    urls = []
+    for event in events:
+        if event.description:
+            continue
+        entry = get_description_entry(state, event.event_id) or {}
+        url = entry.get("url") or description_url(event)
+        if url and "text" not in entry:
+            urls.append(url)
+    return list(dict.fromkeys(urls))
+
+
+def html_from_pages(pages: Mapping[str, object]) -> Callable[[str], str]:
+    """``get_html`` over pages already loaded (``fetch_pages_html`` results); a failed page raises its error."""
+
+    def get_html(url: str) -> str:
+        page = pages.get(url)
+        if isinstance(page, Exception):
+            raise page
+        if not isinstance(page, str):
+            raise LookupError(f"{url} no se cargó")
+        return page
+
+    return get_html
+
+
+def fill_descriptions(state: Dict[str, Any], events: List[Event], get_html: Callable[[str], str]) -> int:
+    """Set missing descriptions on ``events`` from the cache or ``get_html``; return how many pages were fetched.
+
+    A page that fails to load just leaves its event without a description.
+    """
+    fetched = 0
+    for event in events:
+        if event.description:
+            continue
+        entry = get_description_entry(state, event.event_id) or {}
+        url = entry.get("url") or description_url(event)
+        if not url:
+            continue
+        if "text" in entry:
+            event.description = entry["text"]
+            continue
+        try:
+            text = parse_description(get_html(url))
+        except Exception as ex:
+            log.warning("No pude leer la descripción de %s: %s", url, ex)
+            continue
+        fetched += 1
+        store_description(state, event.event_id, url, text)
+        event.description = text
+    if fetched:
+        log.info("Descripciones bajo demanda: %d páginas abiertas.", fetched)
+    return fetched
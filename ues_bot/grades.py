@@ -0,0 +1,190 @@
+"""Grade detection from Moodle's gradebook reports.
+
+One overview page (``grade/report/overview``) lists every course with its
+total; only courses whose total moved (plus a daily full pass) have their
+user report (``grade/report/user``) re-read, one page per course. Items are
+kept in ``state["grades"]`` and each new or changed grade becomes an
+``Event`` for the usual change notification.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import asdict
+from typing import Any, Dict, List, Mapping, Tuple
+
+from .html_backends import parse_html
+from .models import Event, GradeItem
+from .scrape import url_id
+from .state import get_grade_snapshot, store_grade_snapshot
+
+log = logging.getLogger(__name__)
+
+# Course reports are all re-read at least this often, in case a grade
+# changed without moving a (possibly hidden) course total.
+_FULL_REFRESH_SEC = 24 * 3600
+
+_NO_GRADE = {"", "-", "–"}
+
+
+# What a plain GET of each report must contain to be parsed (see ``fetch_pages_http``).
+OVERVIEW_MARKER = "overview-grade"
+USER_REPORT_MARKER = "user-grade"
+
+
+def overview_url(base: str) -> str:
+    return f"{base}/grade/report/overview/index.php"
+
+
+def user_report_url(base: str, course_id: str) -> str:
+    return f"{base}/grade/report/user/index.php?id={course_id}"
+
+
+def _grade_text(raw: str) -> str:
+    text = " ".join((raw or "").split())
+    return "" if text in _NO_GRADE else text
+
+
+def _cell_text(node: Any) -> str:
+    return node.get_text(" ", strip=True) if node is not None else ""
+
+
+def parse_grade_overview(overview_html: str) -> Dict[str, Tuple[str, str]]:
+    """Course id -> (course name, course total) from the grade overview report."""
+    soup = parse_html(overview_html)
+    courses: Dict[str, Tuple[str, str]] = {}
+    for row in soup.select("table#overview-grade tbody tr, table.overview-grade tbody tr"):
+        link = row.select_one("a[href]")
+        cells = row.select("td")
+        if link is None or len(cells) < 2:
+            continue
+        course_id = url_id(link.get("href") or "")
+        if course_id:
+            courses[course_id] = (link.get_text(" ", strip=True), _grade_text(_cell_text(cells[1])))
+    return courses
+
+
+def parse_user_report(report_html: str, course_id: str, course_name: str) -> List[GradeItem]:
+    """Activity grades from a course's user report; category and total rows are skipped."""
+    soup = parse_html(report_html)
+    items: List[GradeItem] = []
+    for row in soup.select("table.user-grade tr"):
+        name_cell = row.select_one(".column-itemname")
+        link = name_cell.select_one('a[href*="/mod/"]') if name_cell is not None else None
+        if link is None:
+            continue
+        href = link.get("href") or ""
+        items.append(GradeItem(
+            course_id=course_id,
+            course_name=course_name,
+            item_name=link.get_text(" ", strip=True),
+            cmid=url_id(href),
+            grade=_grade_text(_cell_text(row.select_one(".column-grade"))),
+            url=href,
+        ))
+    return items
+
+
+def grades_due(state: Dict[str, Any], interval_sec: float, now: float | None = None) -> bool:
+    if interval_sec <= 0:
+        return False
+    checked_at = float(get_grade_snapshot(state).get("checked_at") or 0)
+    return (now or time.time()) - checked_at >= interval_sec
+
+
+def courses_to_read(state: Dict[str, Any], overview: Mapping[str, Tuple[str, str]], now: float | None = None) -> List[str]:
+    """Courses whose user report must be fetched: new or moved totals, or all when a full pass is due."""
+    snapshot = get_grade_snapshot(state)
+    if (now or time.time()) - float(snapshot.get("full_at") or 0) >= _FULL_REFRESH_SEC:
+        return list(overview)
+    known = snapshot.get("courses") or {}
+    return [
+        course_id for course_id, (_name, total) in overview.items()
+        if course_id not in known or known[course_id].get("total") != total
+    ]
+
+
+def apply_grade_reports(
+    state: Dict[str, Any],
+    overview: Mapping[str, Tuple[str, str]],
+    reports: Mapping[str, object],
+    base: str,
+    now: float | None = None,
+) -> List[GradeItem]:
+    """Merge fetched user reports into the snapshot; return items whose grade appeared or changed.
+
+    ``reports`` maps report URL -> HTML (or the exception of a failed
+    fetch; that course keeps its old items and total so it is retried).
+    The very first sync only records a baseline.
+    """
+    now = time.time() if now is None else now
+    snapshot = get_grade_snapshot(state)
+    first_sync = "courses" not in snapshot
+    known_courses: Dict[str, Any] = dict(snapshot.get("courses") or {})
+    items: Dict[str, Any] = dict(snapshot.get("items") or {})
+
+    changed: List[GradeItem] = []
+    all_read = True
+    for course_id, (course_name, total) in overview.items():
+        report_url = user_report_url(base, course_id)
+        if report_url not in reports:
+            known_courses[course_id] = {"name": course_name, "total": total}
+            continue
+        report_html = reports[report_url]
+        if not isinstance(report_html, str):
+            log.warning("No pude abrir calificaciones de %s: %s", course_name, report_html)
+            all_read = False
+            continue
+        for item in parse_user_report(report_html, course_id, course_name):
+            key = f"{course_id}:{item.cmid}"
+            previous = items.get(key) or {}
+            if item.grade and item.grade != previous.get("grade") and not first_sync:
+                changed.append(item)
+            items[key] = asdict(item)
+        known_courses[course_id] = {"name": course_name, "total": total}
+
+    full = all_read and set(overview) <= {url_id(url) for url in reports}
+    store_grade_snapshot(state, known_courses, items, checked_at=now, full_at=now if full else None)
+    if changed:
+        log.info("Calificaciones nuevas o cambiadas: %d.", len(changed))
+    return changed
+
+
+def apply_grades_to_events(state: Dict[str, Any], events: List[Event]) -> None:
+    """Set ``grading_status`` from the gradebook on events whose activity has a grade."""
+    by_cmid = {
+        entry.get("cmid"): entry
+        for entry in (get_grade_snapshot(state).get("items") or {}).values()
+        if isinstance(entry, dict) and entry.get("cmid") and entry.get("grade")
+    }
+    for event in events:
+        entry = by_cmid.get(url_id(event.assignment_url)) if "/mod/" in event.assignment_url else None
+        if entry is not None:
+            event.grading_status = f"Calificado: {entry['grade']}"
+
+
+def grade_change_events(changed: List[GradeItem], events: List[Event]) -> Tuple[List[Event], List[Event]]:
+    """(dashboard events that got a grade, standalone events for graded past activities)."""
+    by_cmid = {url_id(event.assignment_url): event for event in events if "/mod/" in event.assignment_url}
+    on_dashboard: List[Event] = []
+    standalone: List[Event] = []
+    for item in changed:
+        status = f"Calificado: {item.grade}"
+        event = by_cmid.get(item.cmid)
+        if event is not None:
+            event.grading_status = status
+            on_dashboard.append(event)
+            continue
+        standalone.append(Event(
+            event_id=f"grade_{item.course_id}_{item.cmid}",
+            title=item.item_name,
+            due_text="",
+            url=item.url,
+            course_name=item.course_name,
+            assignment_url=item.url,
+            grading_status=status,
+            course_id=item.course_id,
+        ))
+    return on_dashboard, standalone
+
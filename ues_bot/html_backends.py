@@ -0,0 +1,274 @@
+"""HTML parser backends for the scrape parsers.
+
+Every parser in ``ues_bot.scrape`` only needs a small slice of the
+BeautifulSoup ``Tag`` API: ``select``, ``select_one``, ``find``, ``get`` and
+``get_text``. BeautifulSoup with ``html.parser`` is the reference backend;
+lxml (with cssselect) and selectolax/lexbor are wrapped in adapters that
+expose the same methods and mirror BeautifulSoup's text rules, so the same
+parser code returns identical ``Event`` objects on any backend.
+
+Parsers that read only a few regions of a large page pass ``regions`` so
+BeautifulSoup builds nodes for those subtrees only (``parse_only``). The
+native backends build the whole tree in C, which is cheaper than any
+Python-side pre-filter, so they ignore it.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Callable, Dict, FrozenSet, Iterator, List, NamedTuple, Optional, Sequence
+
+from bs4 import BeautifulSoup
+
+try:  # beautifulsoup4 >= 4.13
+    from bs4.filter import ElementFilter
+except ImportError:  # pragma: no cover - older beautifulsoup4
+    ElementFilter = None
+
+log = logging.getLogger(__name__)
+
+# Text that BeautifulSoup leaves out of ``get_text()``.
+_NON_TEXT_TAGS = frozenset({"script", "style"})
+
+# Attributes BeautifulSoup returns as a list of tokens.
+_MULTI_VALUED_ATTRS = frozenset({"class", "rel"})
+
+
+def _join_strings(strings: Iterator[str], separator: str, strip: bool) -> str:
+    if strip:
+        return separator.join(s for s in (text.strip() for text in strings) if s)
+    return separator.join(strings)
+
+
+def _attr_value(name: str, value: Optional[str]) -> Any:
+    if value is None:  # attribute present without a value
+        return ""
+    if name in _MULTI_VALUED_ATTRS:
+        return value.split()
+    return value
+
+
+class Region(NamedTuple):
+    """A subtree kept by a region-restricted parse.
+
+    Matches a ``name`` tag (any tag when empty) that has ``attr``; when
+    ``values`` is given the attribute must equal one of them (for ``class``,
+    contain one of them as a token).
+    """
+
+    name: str
+    attr: str
+    values: FrozenSet[str] = frozenset()
+
+    def matches(self, name: str, attrs: Dict[str, Any]) -> bool:
+        if self.name and name != self.name:
+            return False
+        value = attrs.get(self.attr)
+        if value is None:
+            return False
+        if not self.values:
+            return True
+        if self.attr in _MULTI_VALUED_ATTRS:
+            tokens = value.split() if isinstance(value, str) else value
+            return not self.values.isdisjoint(tokens)
+        return value in self.values
+
+
+def _region_filter(regions: Sequence[Region]) -> Any:
+    def keep(name: str, attrs: Optional[Dict[str, Any]]) -> bool:
+        return any(region.matches(name, attrs or {}) for region in regions)
+
+    if ElementFilter is None:  # pragma: no cover - older beautifulsoup4
+        from bs4 import SoupStrainer
+
+        # Before 4.13 a callable ``name`` is called with the tag's attributes.
+        return SoupStrainer(keep)
+
+    class _RegionFilter(ElementFilter):
+        def allow_tag_creation(self, nsprefix: Optional[str], name: str, attrs: Any) -> bool:
+            return keep(name, attrs)
+
+    return _RegionFilter()
+
+
+# ---------------------------------------------------------------------------
+# lxml + cssselect
+# ---------------------------------------------------------------------------
+
+class _LxmlNode:
+    __slots__ = ("_el",)
+
+    _selectors: Dict[str, Any] = {}
+
+    def __init__(self, el: Any) -> None:
+        self._el = el
+
+    @classmethod
+    def _compiled(cls, css: str) -> Any:
+        selector = cls._selectors.get(css)
+        if selector is None:
+            from lxml.cssselect import CSSSelector
+
+            selector = cls._selectors[css] = CSSSelector(css, translator="html")
+        return selector
+
+    def select(self, css: str) -> List["_LxmlNode"]:
+        # cssselect matches descendant-or-self; BeautifulSoup only descendants.
+        return [_LxmlNode(el) for el in self._compiled(css)(self._el) if el is not self._el]
+
+    def select_one(self, css: str) -> Optional["_LxmlNode"]:
+        for el in self._compiled(css)(self._el):
+            if el is not self._el:
+                return _LxmlNode(el)
+        return None
+
+    def find(self, name: str) -> Optional["_LxmlNode"]:
+        el = self._el.find(f".//{name}")
+        return _LxmlNode(el) if el is not None else None
+
+    def get(self, name: str, default: Any = None) -> Any:
+        value = self._el.get(name)
+        return default if value is None else _attr_value(name, value)
+
+    def _strings(self, el: Any) -> Iterator[str]:
+        if el.text and el.tag not in _NON_TEXT_TAGS:
+            yield el.text
+        for child in el:
+            # Comments and processing instructions have a non-string tag.
+            if isinstance(child.tag, str) and child.tag not in _NON_TEXT_TAGS:
+                yield from self._strings(child)
+            if child.tail:
+                yield child.tail
+
+    def get_text(self, separator: str = "", strip: bool = False) -> str:
+        return _join_strings(self._strings(self._el), separator, strip)
+
+
+def _parse_lxml(html: str, regions: Optional[Sequence[Region]] = None) -> _LxmlNode:
+    import lxml.html
+
+    if not html.strip():
+        html = "<html></html>"
+    try:
+        root = lxml.html.document_fromstring(html)
+    except ValueError:
+        # Unicode strings with an XML encoding declaration are rejected.
+        root = lxml.html.document_fromstring(html.encode("utf-8"))
+    return _LxmlNode(root)
+
+
+# ---------------------------------------------------------------------------
+# selectolax (lexbor)
+# ---------------------------------------------------------------------------
+
+class _LexborNode:
+    __slots__ = ("_node",)
+
+    def __init__(self, node: Any) -> None:
+        self._node = node
+
+    def select(self, css: str) -> List["_LexborNode"]:
+        own_id = self._node.mem_id
+        return [_LexborNode(node) for node in self._node.css(css) if node.mem_id != own_id]
+
+    def select_one(self, css: str) -> Optional["_LexborNode"]:
+        own_id = self._node.mem_id
+        for node in self._node.css(css):
+            if node.mem_id != own_id:
+                return _LexborNode(node)
+        return None
+
+    def find(self, name: str) -> Optional["_LexborNode"]:
+        return self.select_one(name)
+
+    def get(self, name: str, default: Any = None) -> Any:
+        attrs = self._node.attributes
+        if name not in attrs:
+            return default
+        return _attr_value(name, attrs[name])
+
+    def _strings(self, node: Any) -> Iterator[str]:
+        for child in node.iter(include_text=True):
+            tag = child.tag
+            if tag == "-text":
+                yield child.text_content or ""
+            elif not tag.startswith("-") and tag not in _NON_TEXT_TAGS:
+                yield from self._strings(child)
+
+    def get_text(self, separator: str = "", strip: bool = False) -> str:
+        return _join_strings(self._strings(self._node), separator, strip)
+
+
+def _parse_lexbor(html: str, regions: Optional[Sequence[Region]] = None) -> _LexborNode:
+    from selectolax.lexbor import LexborHTMLParser
+
+    return _LexborNode(LexborHTMLParser(html).root)
+
+
+def _parse_bs4(html: str, regions: Optional[Sequence[Region]] = None) -> BeautifulSoup:
+    if regions:
+        return BeautifulSoup(html, "html.parser", parse_only=_region_filter(regions))
+    return BeautifulSoup(html, "html.parser")
+
+
+def _lxml_available() -> bool:
+    try:
+        import lxml.cssselect  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _lexbor_available() -> bool:
+    try:
+        import selectolax.lexbor  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# Fastest first: "auto" picks the first one that is installed.
+_BACKENDS: Dict[str, tuple[Callable[..., Any], Callable[[], bool]]] = {
+    "selectolax": (_parse_lexbor, _lexbor_available),
+    "lxml": (_parse_lxml, _lxml_available),
+    "bs4": (_parse_bs4, lambda: True),
+}
+
+_default_backend = "bs4"
+
+
+def available_backends() -> List[str]:
+    return [name for name, (_parse, is_available) in _BACKENDS.items() if is_available()]
+
+
+def set_default_backend(name: str) -> str:
+    """Select the backend ``parse_html`` uses; returns the one actually chosen.
+
+    ``"auto"`` picks the fastest installed backend. An unknown or missing
+    backend falls back to BeautifulSoup with a warning.
+    """
+    global _default_backend
+    name = (name or "bs4").lower()
+    available = available_backends()
+    if name == "auto":
+        chosen = available[0]
+    elif name in available:
+        chosen = name
+    else:
+        log.warning("Parser HTML '%s' no disponible; usando BeautifulSoup (html.parser).", name)
+        chosen = "bs4"
+    _default_backend = chosen
+    return chosen
+
+
+def get_default_backend() -> str:
+    return _default_backend
+
+
+def parse_html(html: str, backend: Optional[str] = None, regions: Optional[Sequence[Region]] = None) -> Any:
+    """Parse ``html`` into a tree exposing the BeautifulSoup subset we use.
+
+    With ``regions``, only those subtrees are guaranteed to be present.
+    """
+    parse, _is_available = _BACKENDS[backend or _default_backend]
+    return parse(html or "", regions)
@@ -23,13 +23,29 @@ def _fmt_utc(dt: datetime) -> str:
     return dt.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
 
 
+def events_for_ics(events: list[Event], days_ahead: int = 30, now_utc: datetime | None = None) -> list[Event]:
+    """The events ``build_iphone_calendar_ics`` exports: unsubmitted, due within ``days_ahead`` days."""
+    now_utc = now_utc or datetime.now(timezone.utc)
+    cutoff = now_utc + timedelta(days=days_ahead)
+    selected = []
+    for event in events:
+        if event.submitted is True:
+            continue
+        due = due_unix(event)
+        if due is None:
+            continue
+        due_dt = datetime.fromtimestamp(due, tz=timezone.utc)
+        if now_utc < due_dt <= cutoff:
+            selected.append(event)
+    return selected
+
+
 def build_iphone_calendar_ics(
     events: list[Event],
     tz_name: str,
     days_ahead: int = 30,
 ) -> tuple[bytes, int]:
     now_utc = datetime.now(timezone.utc)
-    cutoff = now_utc + timedelta(days=days_ahead)
 
     lines = [
         "BEGIN:VCALENDAR",
@@ -41,18 +57,8 @@ def build_iphone_calendar_ics(
     ]
 
     count = 0
-    for event in events:
-        if event.submitted is True:
-            continue
-
-        due = due_unix(event)
-        if due is None:
-            continue
-
-        due_dt = datetime.fromtimestamp(due, tz=timezone.utc)
-        if due_dt <= now_utc or due_dt > cutoff:
-            continue
-
+    for event in events_for_ics(events, days_ahead, now_utc):
+        due_dt = datetime.fromtimestamp(due_unix(event) or 0, tz=timezone.utc)
         start_dt = due_dt - timedelta(minutes=30)
         url = event.assignment_url or event.url
         course = event.course_name or "Sin materia"
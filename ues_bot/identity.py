@@ -0,0 +1,91 @@
+"""Canonical event ids and duplicate-free event lists.
+
+The dashboard lists one activity in two blocks: "Eventos próximos" links
+its calendar event, the timeline block its activity (the calendar id only
+comes with the timeline JSON), and older versions keyed timeline events
+by ``tl_<cmid>``. ``resolve_event_ids`` gives each event its canonical id
+(``canonical_event_id``), folds listings of the same event into one and
+moves whatever the state kept under an old id to the new one, so an
+assignment is enriched, checked and notified once.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, List
+
+from .models import Event
+from .scrape import canonical_event_id, merge_event_fields, url_id
+from .state import get_event_modules, migrate_event_keys, store_event_modules
+
+log = logging.getLogger(__name__)
+
+
+def event_module_id(event: Event) -> str:
+    """Course-module id of the activity ``event`` belongs to, or "" while unknown."""
+    for url in (event.assignment_url, event.url):
+        if "/mod/" in url and "view.php" in url and url_id(url):
+            return url_id(url)
+    return ""
+
+
+def _calendar_id(event: Event) -> str:
+    return event.event_id if event.event_id.isdigit() else ""
+
+
+def resolve_event_ids(state: Dict[str, Any], events: List[Event]) -> List[Event]:
+    """``events`` under their canonical ids, each event listed once.
+
+    An event known only by its activity link takes the id of the calendar
+    event of the same course module, if exactly one is listed; the module
+    of a calendar event comes from its own links or, until its event page
+    is read again, from ``state["event_modules"]``, which keeps that index
+    for the events still on the dashboard. Duplicates are folded into
+    their first listing.
+    """
+    known_modules = get_event_modules(state)
+    modules: Dict[str, str] = {}
+    by_module: Dict[str, Dict[str, Event]] = {}
+    for event in events:
+        calendar_id = _calendar_id(event)
+        if not calendar_id:
+            continue
+        cmid = event_module_id(event) or known_modules.get(calendar_id, "")
+        if cmid:
+            modules[calendar_id] = cmid
+            by_module.setdefault(cmid, {}).setdefault(calendar_id, event)
+
+    aliases: Dict[str, str] = {}
+    resolved: Dict[str, Event] = {}
+    for event in events:
+        old_id = event.event_id
+        cmid = "" if _calendar_id(event) else event_module_id(event)
+        if cmid:
+            listed = by_module.get(cmid, {})
+            event.event_id = next(iter(listed)) if len(listed) == 1 else canonical_event_id("", cmid, old_id)
+            # Older versions keyed this listing as tl_<cmid>, whatever id it resolves to now.
+            aliases.setdefault(f"tl_{cmid}", event.event_id)
+        if event.event_id != old_id:
+            aliases[old_id] = event.event_id
+        first = resolved.get(event.event_id)
+        if first is None:
+            resolved[event.event_id] = event
+        else:
+            merge_event_fields(first, event)
+
+    # Ids the module went by before its calendar event was known.
+    for cmid, listed in by_module.items():
+        if len(listed) == 1:
+            calendar_id = next(iter(listed))
+            aliases.setdefault(f"tl_{cmid}", calendar_id)
+            aliases.setdefault(f"cm_{cmid}", calendar_id)
+
+    store_event_modules(state, modules)
+    moved = migrate_event_keys(state, aliases)
+    if len(resolved) < len(events) or moved:
+        log.info(
+            "Identidad de eventos: %d duplicados unidos, %d entradas de estado migradas.",
+            len(events) - len(resolved),
+            moved,
+        )
+    return list(resolved.values())
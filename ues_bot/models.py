@@ -2,8 +2,8 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import Dict, Optional
 
 
 @dataclass
@@ -18,3 +18,38 @@ class Event:
     submitted: Optional[bool] = None
     submission_status: str = ""
     grading_status: str = ""
+    course_id: str = ""
+
+
+@dataclass
+class AssignmentStatus:
+    """What an assignment page says about our submission."""
+
+    submitted: Optional[bool] = None
+    submission_status: str = "No detectado"
+    grading_status: str = ""
+    time_remaining: str = ""
+    last_modified: str = ""
+    rows: Dict[str, str] = field(default_factory=dict)  # every th -> td of the status table
+
+
+@dataclass
+class EventPage:
+    """What a calendar event page adds to its dashboard ``Event``."""
+
+    course_name: str = "Sin materia"
+    course_id: str = ""
+    description: str = ""
+    assignment_url: str = ""
+
+
+@dataclass
+class GradeItem:
+    """One graded activity from a course's gradebook user report."""
+
+    course_id: str
+    course_name: str
+    item_name: str
+    cmid: str = ""
+    grade: str = ""  # as Moodle prints it ("95,00", "A", ...); "" = not graded yet
+    url: str = ""
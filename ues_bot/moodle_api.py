@@ -0,0 +1,466 @@
+"""Browserless access to Moodle's AJAX web services (``lib/ajax/service.php``).
+
+The dashboard timeline is filled client-side from
+``core_calendar_get_action_events_by_timesort``; calling that endpoint
+directly with the session cookies from ``storage_state.json`` yields the
+same data as JSON, without rendering the page in Chromium.
+"""
+
+from __future__ import annotations
+
+import html
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+try:
+    from zoneinfo import ZoneInfo  # type: ignore
+except Exception:  # pragma: no cover
+    ZoneInfo = None  # type: ignore
+
+from .models import Event
+from .scrape import canonical_event_id, parse_assignment_page
+
+log = logging.getLogger(__name__)
+
+# Error codes Moodle returns when the session cookie or sesskey is not valid.
+_SESSION_ERROR_CODES = {
+    "servicerequireslogin",
+    "requireloginerror",
+    "invalidsesskey",
+    "sessionerroruser",
+}
+
+# Web service behind the dashboard's "Línea de tiempo" block.
+TIMELINE_METHOD = "core_calendar_get_action_events_by_timesort"
+
+# Moodle caps ``limitnum`` for the timeline service at 50.
+TIMELINE_PAGE_SIZE = 50
+# Between full syncs, this many days ahead are still re-read every cycle.
+TIMELINE_NEAR_DAYS = 7
+
+_CMID_RE = re.compile(r"[?&]id=(\d+)")
+_SESSKEY_RE = re.compile(r'"sesskey"\s*:\s*"([^"]+)"')
+
+_ES_MONTH_NAMES = [
+    "enero", "febrero", "marzo", "abril", "mayo", "junio",
+    "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre",
+]
+
+# Plain-text conversion for the small HTML fragments (event descriptions)
+# returned by the web services.
+_BLOCK_TAG_RE = re.compile(r"<\s*(br|/p|/div|/li|/h\d)\b[^>]*>", re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+class MoodleSessionExpired(RuntimeError):
+    """Raised when Moodle rejects the stored session (cookie expired or missing)."""
+
+
+def load_session_cookies(storage_file: str, base: str) -> Dict[str, str]:
+    """Read cookies for ``base``'s host from a Playwright ``storage_state.json``."""
+    if not storage_file or not os.path.exists(storage_file):
+        return {}
+    try:
+        with open(storage_file, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    host = httpx.URL(base).host
+    cookies: Dict[str, str] = {}
+    for cookie in raw.get("cookies", []) if isinstance(raw, dict) else []:
+        domain = str(cookie.get("domain", "")).lstrip(".")
+        if domain and (host == domain or host.endswith("." + domain)):
+            cookies[str(cookie.get("name", ""))] = str(cookie.get("value", ""))
+    return cookies
+
+
+def html_to_text(fragment: str) -> str:
+    """Cheap HTML → text for description fragments (no parser needed)."""
+    text = _BLOCK_TAG_RE.sub("\n", fragment or "")
+    text = html.unescape(_TAG_RE.sub("", text))
+    lines = [re.sub(r"[ \t\xa0]+", " ", line).strip() for line in text.splitlines()]
+    text = "\n".join(line for line in lines if line)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def format_due_text(ts: int, tz_name: str) -> str:
+    """Format a unix timestamp like the timeline aria-label: "8 de marzo de 2026, 23:59"."""
+    if ZoneInfo is not None:
+        dt = datetime.fromtimestamp(ts, ZoneInfo(tz_name))
+    else:
+        dt = datetime.fromtimestamp(ts, timezone.utc)
+    return f"{dt.day} de {_ES_MONTH_NAMES[dt.month - 1]} de {dt.year}, {dt:%H:%M}"
+
+
+class MoodleClient:
+    """Pooled HTTP client for ``lib/ajax/service.php`` using stored session cookies."""
+
+    def __init__(self, base: str, storage_file: str, dashboard_url: str = "", timeout: float = 20.0) -> None:
+        self.base = base.rstrip("/")
+        self.storage_file = storage_file
+        self.dashboard_url = dashboard_url or f"{self.base}/my/"
+        self._http = httpx.Client(timeout=timeout, follow_redirects=False)
+        self._sesskey: Optional[str] = None
+        self._cookies_mtime: Optional[float] = None
+        self.reload_cookies()
+
+    def _storage_mtime(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.storage_file) if self.storage_file else None
+        except OSError:
+            return None
+
+    def reload_cookies(self) -> None:
+        """Pick up cookies from ``storage_state.json`` (e.g. after a browser login)."""
+        self._cookies_mtime = self._storage_mtime()
+        self._http.cookies.clear()
+        for name, value in load_session_cookies(self.storage_file, self.base).items():
+            self._http.cookies.set(name, value)
+        self._sesskey = None
+
+    def _refresh_cookies(self) -> None:
+        """Reload the cookies when a login rewrote ``storage_state.json`` since the last read."""
+        if self._storage_mtime() != self._cookies_mtime:
+            log.debug("storage_state.json cambió; recargando cookies de sesión.")
+            self.reload_cookies()
+
+    def close(self) -> None:
+        self._http.close()
+
+    @staticmethod
+    def _is_login_redirect(response: httpx.Response) -> bool:
+        if response.is_redirect:
+            return "login" in response.headers.get("location", "").lower()
+        return "login" in str(response.url).lower()
+
+    def get_html(self, url: str) -> str:
+        """GET a page with the session cookies; raise if Moodle sends us to login."""
+        self._refresh_cookies()
+        response = self._http.get(url)
+        if self._is_login_redirect(response):
+            raise MoodleSessionExpired(f"Sesión expirada al abrir {url}")
+        response.raise_for_status()
+        return response.text
+
+    def sesskey(self) -> str:
+        """Session key required by service.php, read from ``M.cfg`` on the dashboard."""
+        if self._sesskey is None:
+            match = _SESSKEY_RE.search(self.get_html(self.dashboard_url))
+            if not match:
+                raise MoodleSessionExpired("No encontré sesskey en el dashboard (¿sesión inválida?).")
+            self._sesskey = match.group(1)
+        return self._sesskey
+
+    def call_many(self, calls: Sequence[Tuple[str, Dict[str, Any]]]) -> List[Any]:
+        """Run several web-service calls in as few HTTP requests as possible.
+
+        Moodle stops processing a batch at the first failing call, so the
+        rest are re-sent in the next request. Each result is the call's
+        ``data``, or a ``RuntimeError`` for the calls that failed.
+        """
+        self._refresh_cookies()
+        results: List[Any] = [None] * len(calls)
+        start = 0
+        while start < len(calls):
+            batch = calls[start:]
+            info = batch[0][0] if len(batch) == 1 else f"{len(batch)}_calls"
+            payload = [
+                {"index": i, "methodname": method, "args": args}
+                for i, (method, args) in enumerate(batch)
+            ]
+            response = self._http.post(
+                f"{self.base}/lib/ajax/service.php",
+                params={"sesskey": self.sesskey(), "info": info},
+                json=payload,
+            )
+            if self._is_login_redirect(response):
+                raise MoodleSessionExpired("service.php redirigió al login.")
+            response.raise_for_status()
+            body = response.json()
+
+            if isinstance(body, dict):
+                # Whole-request failure (e.g. invalid sesskey).
+                self._raise_for_exception(body.get("exception") or body)
+                raise RuntimeError(f"Respuesta inesperada de service.php: {body!r:.200}")
+
+            for offset, entry in enumerate(body):
+                if entry.get("error"):
+                    exception = entry.get("exception") or {}
+                    self._raise_for_exception(exception)
+                    results[start + offset] = RuntimeError(
+                        f"{batch[offset][0]}: {exception.get('message') or exception.get('errorcode') or 'error'}"
+                    )
+                else:
+                    results[start + offset] = entry.get("data")
+            start += max(1, len(body))
+        return results
+
+    def call(self, method: str, args: Dict[str, Any]) -> Any:
+        result = self.call_many([(method, args)])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _raise_for_exception(self, exception: Dict[str, Any]) -> None:
+        if exception.get("errorcode") in _SESSION_ERROR_CODES:
+            self._sesskey = None
+            raise MoodleSessionExpired(exception.get("message") or exception.get("errorcode"))
+
+    # -- endpoints ---------------------------------------------------------
+
+    def touch_session(self) -> Optional[int]:
+        """Extend the Moodle session; return its remaining seconds when known.
+
+        Falls back to a dashboard GET on sites without the session web
+        services (any page view also counts as activity).
+        """
+        touched, remaining = self.call_many([("core_session_touch", {}), ("core_session_time_remaining", {})])
+        if isinstance(touched, Exception):
+            self.get_html(self.dashboard_url)
+            return None
+        if isinstance(remaining, dict) and isinstance(remaining.get("timeremaining"), int):
+            return remaining["timeremaining"]
+        return None
+
+    def get_action_events(
+        self,
+        timesortfrom: int,
+        timesortto: Optional[int] = None,
+        limitnum: int = 50,
+        aftereventid: int = 0,
+    ) -> Dict[str, Any]:
+        args: Dict[str, Any] = {
+            "limitnum": limitnum,
+            "timesortfrom": timesortfrom,
+            "limittononsuspendedevents": True,
+        }
+        if timesortto is not None:
+            args["timesortto"] = timesortto
+        if aftereventid:
+            args["aftereventid"] = aftereventid
+        return self.call(TIMELINE_METHOD, args)
+
+
+def event_from_action_event(item: Dict[str, Any], tz_name: str) -> Event:
+    """Build an ``Event`` from one ``core_calendar_get_action_events_by_timesort`` item."""
+    course = item.get("course") or {}
+    module_url = str(item.get("url") or "")
+    assignment_url = module_url if "/mod/" in module_url and "view.php" in module_url else ""
+    timesort = int(item.get("timesort") or item.get("timestart") or 0)
+    cmid = _CMID_RE.search(module_url)
+    return Event(
+        event_id=canonical_event_id(str(item.get("id") or ""), cmid.group(1) if cmid else "", module_url),
+        title=str(item.get("name") or item.get("activityname") or ""),
+        due_text=format_due_text(timesort, tz_name) if timesort else "",
+        url=str(item.get("viewurl") or module_url),
+        course_name=str(course.get("fullnamedisplay") or course.get("fullname") or "Sin materia"),
+        description=html_to_text(str(item.get("description") or "")),
+        assignment_url=assignment_url,
+        course_id=str(course.get("id") or ""),
+    )
+
+
+def action_events_from_service_call(calls: Any, payload: Any) -> Optional[List[Dict[str, Any]]]:
+    """Timeline items from a captured ``service.php`` request/response pair.
+
+    ``calls`` is the request body (a batch of ``{"methodname", "args"}``)
+    and ``payload`` the JSON answer, one entry per call. None when the
+    batch holds no successful timeline call.
+    """
+    if not isinstance(calls, list) or not isinstance(payload, list):
+        return None
+    for call, entry in zip(calls, payload):
+        if not isinstance(call, dict) or call.get("methodname") != TIMELINE_METHOD:
+            continue
+        if isinstance(entry, dict) and not entry.get("error"):
+            items = (entry.get("data") or {}).get("events")
+            if isinstance(items, list):
+                return [item for item in items if isinstance(item, dict)]
+    return None
+
+
+def timeline_call_args(calls: Any) -> Optional[Dict[str, Any]]:
+    """Arguments of the timeline call in a captured ``service.php`` request body, if any."""
+    for call in calls if isinstance(calls, list) else ():
+        if isinstance(call, dict) and call.get("methodname") == TIMELINE_METHOD and isinstance(call.get("args"), dict):
+            return call["args"]
+    return None
+
+
+def timeline_events_from_items(items: Sequence[Dict[str, Any]], tz_name: str) -> List[Event]:
+    """``Event``s for the dashboard's timeline block built from its JSON items.
+
+    Items keep their calendar event id, so they join the ``Eventos
+    próximos`` entries by id; ``url`` is the calendar link, whose ``time=``
+    carries the exact due timestamp.
+    """
+    return [event_from_action_event(item, tz_name) for item in items]
+
+
+def submission_from_status(data: Dict[str, Any]) -> Tuple[Optional[bool], str, str]:
+    """Map ``mod_assign_get_submission_status`` to (submitted, status text, grading text)."""
+    attempt = (data or {}).get("lastattempt") or {}
+    submission = attempt.get("submission") or attempt.get("teamsubmission") or {}
+    status = str(submission.get("status") or "")
+    grading = str(attempt.get("gradingstatus") or "")
+
+    if status == "submitted":
+        submitted, status_text = True, "Enviado para calificar"
+    elif status == "draft":
+        submitted, status_text = False, "Borrador (no enviado)"
+    elif status in ("new", "reopened") or (attempt and not status):
+        submitted, status_text = False, "Sin entrega"
+    else:
+        submitted, status_text = None, "No detectado"
+
+    grading_text = {"graded": "Calificado", "notgraded": "No calificado"}.get(grading, "")
+    return submitted, status_text, grading_text
+
+
+def fetch_timeline_window(
+    client: MoodleClient,
+    timesortfrom: int,
+    timesortto: int,
+    page_size: int = TIMELINE_PAGE_SIZE,
+    max_pages: int = 20,
+) -> Tuple[List[Dict[str, Any]], int]:
+    """Every action event due in ``[timesortfrom, timesortto]``; returns (items, pages).
+
+    Follows Moodle's ``aftereventid`` cursor the way the timeline's "show
+    more" button does, until a page comes back short.
+    """
+    items: List[Dict[str, Any]] = []
+    after = 0
+    pages = 0
+    while pages < max_pages:
+        data = client.get_action_events(timesortfrom, timesortto, limitnum=page_size, aftereventid=after)
+        pages += 1
+        page = [item for item in data.get("events", []) if isinstance(item, dict)]
+        items.extend(page)
+        last = int(data.get("lastid") or 0)
+        if len(page) < page_size or not last or last == after:
+            break
+        after = last
+    return items, pages
+
+
+def sync_timeline(
+    client: MoodleClient,
+    cache: Dict[str, Any],
+    overdue_days: int,
+    days_ahead: int,
+    full_sync_sec: float,
+    now: Optional[int] = None,
+    page_size: int = TIMELINE_PAGE_SIZE,
+) -> List[Dict[str, Any]]:
+    """Timeline items for ``overdue_days`` back to ``days_ahead`` forward, fetched incrementally.
+
+    ``cache`` (``state["timeline"]``) keeps the items of earlier cycles.
+    Between full syncs only the near window (overdue + the next
+    ``TIMELINE_NEAR_DAYS``) and the strip the horizon moved into since the
+    last sync are requested; cached items elsewhere are reused. ``cache``
+    is only updated once every request succeeded.
+    """
+    now = int(time.time()) if now is None else int(now)
+    low = now - overdue_days * 86400
+    high = now + days_ahead * 86400
+    near = min(high, now + TIMELINE_NEAR_DAYS * 86400)
+
+    cached: Dict[str, Dict[str, Any]] = dict(cache.get("items") or {})
+    synced_to = int(cache.get("synced_to") or 0)
+    full = (
+        not cached
+        or now - int(cache.get("full_sync_at") or 0) >= full_sync_sec
+        or int(cache.get("synced_from") or 0) > low
+        or synced_to < near
+    )
+    windows = [(low, high)] if full else [(low, near)]
+    if not full and synced_to < high:
+        windows.append((synced_to + 1, high))
+
+    pages = 0
+    for start, end in windows:
+        fetched, used = fetch_timeline_window(client, start, end, page_size=page_size)
+        pages += used
+        # Anything cached inside a re-read window that Moodle no longer
+        # returns was completed or removed.
+        cached = {key: item for key, item in cached.items() if not start <= _timesort(item) <= end}
+        cached.update((str(item.get("id", "")), item) for item in fetched)
+
+    cached = {key: item for key, item in cached.items() if low <= _timesort(item) <= high}
+    cache["items"] = cached
+    cache["synced_from"] = low
+    cache["synced_to"] = high
+    if full:
+        cache["full_sync_at"] = now
+    log.info(
+        "Timeline %s: %d eventos en %d días (%d páginas).",
+        "completa" if full else "incremental",
+        len(cached),
+        overdue_days + days_ahead,
+        pages,
+    )
+    return sorted(cached.values(), key=lambda item: (_timesort(item), int(item.get("id") or 0)))
+
+
+def _timesort(item: Dict[str, Any]) -> int:
+    return int(item.get("timesort") or item.get("timestart") or 0)
+
+
+def fetch_dashboard_events(
+    client: MoodleClient,
+    tz_name: str,
+    overdue_days: int = 14,
+    limitnum: int = TIMELINE_PAGE_SIZE,
+    items: Optional[Sequence[Dict[str, Any]]] = None,
+) -> List[Event]:
+    """Timeline events (overdue window + upcoming) with submission status, via JSON only.
+
+    ``items`` are already-fetched timeline items (see ``sync_timeline``);
+    without them a single page is requested, like the dashboard shows.
+    """
+    if items is None:
+        now = int(time.time())
+        data = client.get_action_events(timesortfrom=now - overdue_days * 86400, limitnum=limitnum)
+        items = data.get("events", [])
+    items = [item for item in items if isinstance(item, dict)]
+    events = [event_from_action_event(item, tz_name) for item in items]
+
+    # One batched request for every assignment's submission status.
+    status_calls: List[Tuple[str, Dict[str, Any]]] = []
+    status_targets: List[Event] = []
+    for item, event in zip(items, events):
+        if item.get("modulename") == "assign" and item.get("instance"):
+            status_calls.append(("mod_assign_get_submission_status", {"assignid": int(item["instance"])}))
+            status_targets.append(event)
+
+    if status_calls:
+        for event, result in zip(status_targets, client.call_many(status_calls)):
+            if not isinstance(result, Exception):
+                event.submitted, event.submission_status, event.grading_status = submission_from_status(result)
+                continue
+            # Some sites don't expose the assign service over AJAX: read the
+            # server-rendered assignment page with the same cookies instead.
+            log.debug("Estado AJAX no disponible para %s (%s); usando HTML.", event.assignment_url, result)
+            try:
+                assign_html = client.get_html(event.assignment_url)
+            except MoodleSessionExpired:
+                raise
+            except Exception as ex:
+                log.warning("No pude abrir assignment %s: %s", event.assignment_url, ex)
+                continue
+            status = parse_assignment_page(assign_html)
+            event.submitted = status.submitted
+            event.submission_status = status.submission_status
+            event.grading_status = status.grading_status
+
+    log.info("Moodle AJAX: %d eventos (%d con estado de entrega).", len(events), len(status_calls))
+    return events
@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+import time
+
 from .models import Event
 from .summary import due_unix, remaining_parts_from_unix
 
@@ -37,3 +39,29 @@ def get_pending_reminders(
                 break
 
     return pending
+
+
+def next_reminder_crossings(
+    events: list[Event],
+    sent_reminders: dict[str, list[str]],
+    now: int | None = None,
+) -> list[tuple[Event, str, int]]:
+    """(event, label, unix time) of the next threshold each pending event will cross.
+
+    Only thresholds still ahead and not yet reminded count; the earliest
+    one (the largest threshold) is the next reminder for that event.
+    """
+    now = int(time.time()) if now is None else now
+    crossings: list[tuple[Event, str, int]] = []
+    for event in events:
+        if event.submitted is True:
+            continue
+        due = due_unix(event)
+        if due is None:
+            continue
+        already_sent = set(sent_reminders.get(event.event_id, []))
+        for threshold_sec, label in reversed(REMINDER_THRESHOLDS):
+            if due - threshold_sec > now and label not in already_sent:
+                crossings.append((event, label, due - threshold_sec))
+                break
+    return crossings
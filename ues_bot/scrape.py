@@ -1,17 +1,33 @@
-"""Playwright + BeautifulSoup scraping routines for UES dashboard/events."""
+"""Playwright + BeautifulSoup scraping routines for UES dashboard/events.
+
+The parsers run on any backend from ``html_backends`` (BeautifulSoup is the
+reference; lxml or selectolax when installed), chosen with
+``set_html_parser``.
+"""
 
 from __future__ import annotations
 
 import re
+import asyncio
+import hashlib
 import logging
 import unicodedata
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
 
 from bs4 import BeautifulSoup
 from playwright.sync_api import TimeoutError as PWTimeout
-from tenacity import Retrying, before_sleep_log, retry_if_exception_type, stop_after_attempt, wait_exponential
-
-from .models import Event
+from tenacity import (
+    AsyncRetrying,
+    Retrying,
+    before_sleep_log,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential,
+)
+
+from .html_backends import Region, available_backends, get_default_backend, parse_html
+from .html_backends import set_default_backend as set_html_parser
+from .models import AssignmentStatus, Event, EventPage
 
 log = logging.getLogger(__name__)
 
@@ -51,77 +67,229 @@ _GRADING_STATUS_LABELS = [
 ]
 
 
+# Mojibake seen in Windows logs/terminal output (UTF-8 read as Latin-1).
+_MOJIBAKE = {"Ã¡": "a", "Ã©": "e", "Ã­": "i", "Ã³": "o", "Ãº": "u", "Ã±": "n"}
+_MOJIBAKE_RE = re.compile("|".join(map(re.escape, _MOJIBAKE)))
+
+
+def _build_fold_table() -> Dict[int, str]:
+    """Accent/compatibility folding for Latin-1 + Latin Extended, precomputed."""
+    table: Dict[int, str] = {}
+    for code in range(0x80, 0x250):
+        ch = chr(code)
+        folded = "".join(c for c in unicodedata.normalize("NFKD", ch) if not unicodedata.combining(c))
+        if folded != ch:
+            table[code] = folded
+    return table
+
+
+_FOLD_TABLE = _build_fold_table()
+_FOLD_LIMIT = "\u024f"  # chars above this fall back to a full NFKD pass
+_NON_ASCII_RE = re.compile(r"[^\x00-\x7f]+")
+
+
+def _fold_run(match: "re.Match[str]") -> str:
+    run = match.group(0).translate(_FOLD_TABLE)
+    if max(run) > _FOLD_LIMIT:
+        run = "".join(ch for ch in unicodedata.normalize("NFKD", run) if not unicodedata.combining(ch))
+    return run
+
+
 def _norm_text(text: str) -> str:
     """Normalize text for robust matching across accents/encoding quirks."""
-    text = (text or "").lower().strip()
-    # Replace common mojibake pieces seen in Windows logs/terminal output.
-    text = text.replace("Ã¡", "a").replace("Ã©", "e").replace("Ã­", "i").replace("Ã³", "o").replace("Ãº", "u")
-    text = text.replace("Ã±", "n")
-    # Remove accents/diacritics.
-    text = "".join(ch for ch in unicodedata.normalize("NFKD", text) if not unicodedata.combining(ch))
-    text = re.sub(r"\s+", " ", text)
-    return text
+    text = text or ""
+    if "Ã" in text:
+        text = _MOJIBAKE_RE.sub(lambda m: _MOJIBAKE[m.group(0)], text)
+    text = text.lower().strip()
+    if not text.isascii():
+        # Page text is mostly ASCII: fold only the non-ASCII runs.
+        text = _NON_ASCII_RE.sub(_fold_run, text)
+    return " ".join(text.split())
 
 
-def assignment_is_submitted(assign_html: str) -> Tuple[Optional[bool], str]:
-    soup = BeautifulSoup(assign_html, "html.parser")
+def _phrase_pattern(phrases: List[str]) -> str:
+    """Regex alternation for ``phrases`` with shared prefixes factored out.
+
+    ``re`` tries alternatives one by one at every position; as a trie each
+    position fails after a single character for almost all of the text.
+    """
+    trie: Dict[str, dict] = {}
+    for phrase in phrases:
+        node = trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class _PhraseMatcher:
+    """Substring test for a fixed phrase list in one regex pass.
+
+    Phrases are normalized with ``_norm_text`` once; callers pass text that
+    is already normalized the same way.
+    """
 
-    # 1) Fast path: CSS class on the <td> added by Moodle.
-    td_submitted = soup.select_one("td.submissionstatussubmitted")
-    if td_submitted:
-        val = td_submitted.get_text(" ", strip=True)
-        return True, val or "Enviado para calificar"
+    def __init__(self, phrases: List[str], suffix: bool = False) -> None:
+        pattern = _phrase_pattern([p for p in {_norm_text(p) for p in phrases} if p])
+        self._search = re.compile(pattern).search
+        # Repeated trailing phrases, each preceded by a space ("... is due").
+        self._suffix_re = re.compile(rf"(?: {pattern})+$") if suffix else None
 
-    td_nosub = soup.select_one("td.submissionstatusnosubmission")
-    if td_nosub:
-        val = td_nosub.get_text(" ", strip=True)
-        return False, val or "Sin envío"
+    def search(self, text_n: str) -> bool:
+        return self._search(text_n) is not None
 
-    # Normalized phrase lists for robust matching.
-    submitted_phrases_n = [_norm_text(p) for p in SUBMITTED_PHRASES]
-    not_submitted_phrases_n = [_norm_text(p) for p in NOT_SUBMITTED_PHRASES]
-    status_labels_n = [_norm_text(lbl) for lbl in _SUBMISSION_STATUS_LABELS]
+    def strip_suffix(self, text_n: str) -> str:
+        assert self._suffix_re is not None, "matcher built without suffix=True"
+        return self._suffix_re.sub("", text_n).strip()
 
-    # 2) Text-based fallback: walk the "generaltable" rows.
+
+_STATUS_TD_CLASSES = frozenset({"submissionstatussubmitted", "submissionstatusnosubmission"})
+_TIME_REMAINING_LABELS = ["tiempo restante", "time remaining"]
+_LAST_MODIFIED_LABELS = ["última modificación", "last modified"]
+
+# Compiled once at import instead of scanning phrase lists on every page.
+_SUBMITTED = _PhraseMatcher(SUBMITTED_PHRASES)
+_NOT_SUBMITTED = _PhraseMatcher(NOT_SUBMITTED_PHRASES)
+_SUBMISSION_STATUS_LABEL = _PhraseMatcher(_SUBMISSION_STATUS_LABELS)
+_GRADING_STATUS_LABEL = _PhraseMatcher(_GRADING_STATUS_LABELS)
+_TIME_REMAINING_LABEL = _PhraseMatcher(_TIME_REMAINING_LABELS)
+_LAST_MODIFIED_LABEL = _PhraseMatcher(_LAST_MODIFIED_LABELS)
+
+# Column headers of the course assignment index (mod/assign/index.php). The
+# due date header is checked first: "fecha de entrega" also says "entrega".
+_INDEX_DUE_LABEL = _PhraseMatcher(["fecha de entrega", "fecha limite", "due date", "vencimiento"])
+_INDEX_GRADE_LABEL = _PhraseMatcher(["calificacion", "grade"])
+_INDEX_SUBMISSION_LABEL = _PhraseMatcher(["entrega", "envio", "submission"])
+
+# Timeline titles may omit the trailing " está en fecha de entrega" etc.
+_DUE_TITLE_SUFFIX = _PhraseMatcher(["está en fecha de entrega", "is due", "debe entregarse"], suffix=True)
+
+
+def normalize_title(title: str) -> str:
+    """Key used to match timeline and upcoming-block titles of the same event."""
+    return _DUE_TITLE_SUFFIX.strip_suffix(_norm_text(title))
+
+
+def _submission_from_text(value_n: str) -> Optional[bool]:
+    if _SUBMITTED.search(value_n):
+        return True
+    if _NOT_SUBMITTED.search(value_n):
+        return False
+    return None
+
+
+def parse_assignment_page(assign_html: str) -> AssignmentStatus:
+    """Read submission and grading status from an assignment page in one parse."""
+    soup = parse_html(assign_html)
+    rows = []
     for row in soup.select("table.generaltable tr"):
         th = row.find("th")
         td = row.find("td")
-        if not th or not td:
-            continue
-        label_raw = th.get_text(" ", strip=True)
-        value_raw = td.get_text(" ", strip=True)
+        if th and td:
+            rows.append((th.get_text(" ", strip=True), td.get_text(" ", strip=True), td.get("class") or ()))
+
+    def status_cell() -> Optional[Tuple[List[str], str]]:
+        td = soup.select_one("td.submissionstatussubmitted") or soup.select_one("td.submissionstatusnosubmission")
+        return (td.get("class") or [], td.get_text(" ", strip=True)) if td is not None else None
+
+    return _assignment_status(rows, status_cell, lambda: soup.get_text(" ", strip=True))
+
+
+def _assignment_status(
+    rows: List[Tuple[str, str, List[str]]],
+    status_cell: Callable[[], Optional[Tuple[List[str], str]]],
+    page_text: Callable[[], str],
+) -> AssignmentStatus:
+    """Build an ``AssignmentStatus`` from the "generaltable" (label, value, td classes) rows.
+
+    ``status_cell`` and ``page_text`` are only called when the rows do not
+    settle the submission status.
+    """
+    result = AssignmentStatus()
+
+    # One walk over the "generaltable" rows collects every field we use.
+    status_row: Optional[Tuple[str, str]] = None
+    class_cell = None  # (classes, text) of the first <td> carrying Moodle's submission status class
+    for label_raw, value_raw, classes in rows:
+        result.rows.setdefault(label_raw, value_raw)
+        if class_cell is None and _STATUS_TD_CLASSES.intersection(classes):
+            class_cell = (classes, value_raw)
         label = _norm_text(label_raw)
-        value = _norm_text(value_raw)
 
-        if any(lbl in label for lbl in status_labels_n):
-            if any(p in value for p in submitted_phrases_n):
-                return True, value_raw
-            if any(p in value for p in not_submitted_phrases_n):
-                return False, value_raw
-            return None, value_raw
+        if status_row is None and _SUBMISSION_STATUS_LABEL.search(label):
+            status_row = (value_raw, _norm_text(value_raw))
+        elif not result.grading_status and _GRADING_STATUS_LABEL.search(label):
+            result.grading_status = value_raw
+        elif not result.time_remaining and _TIME_REMAINING_LABEL.search(label):
+            result.time_remaining = value_raw
+        elif not result.last_modified and _LAST_MODIFIED_LABEL.search(label):
+            result.last_modified = value_raw
+
+    # 1) Fast path: CSS class on the <td> added by Moodle (normally inside
+    # the table we just walked; search the whole page only if it was not).
+    if class_cell is None:
+        class_cell = status_cell()
+    if class_cell is not None:
+        classes, text = class_cell
+        result.submitted = "submissionstatussubmitted" in classes
+        default = "Enviado para calificar" if result.submitted else "Sin envío"
+        result.submission_status = text or default
+        return result
+
+    # 2) Text of the submission status row.
+    if status_row is not None:
+        result.submitted = _submission_from_text(status_row[1])
+        result.submission_status = status_row[0]
+        return result
 
     # 3) Last-resort fallback: detect phrases in the whole page text.
-    whole = _norm_text(soup.get_text(" ", strip=True))
-    if any(p in whole for p in submitted_phrases_n):
-        return True, "Detectado por texto global"
-    if any(p in whole for p in not_submitted_phrases_n):
-        return False, "Detectado por texto global"
+    result.submitted = _submission_from_text(_norm_text(page_text()))
+    if result.submitted is not None:
+        result.submission_status = "Detectado por texto global"
+    return result
+
 
-    return None, "No detectado"
+def assignment_is_submitted(assign_html: str) -> Tuple[Optional[bool], str]:
+    """(submitted, status text); see ``parse_assignment_page``."""
+    status = parse_assignment_page(assign_html)
+    return status.submitted, status.submission_status
 
 
 def parse_grading_status(assign_html: str) -> str:
     """Extract the grading status (e.g. "No calificado", "Calificado") from the assignment page."""
-    soup = BeautifulSoup(assign_html, "html.parser")
-    for row in soup.select("table.generaltable tr"):
-        th = row.find("th")
-        td = row.find("td")
-        if not th or not td:
-            continue
-        label = th.get_text(" ", strip=True).lower()
-        if any(lbl in label for lbl in _GRADING_STATUS_LABELS):
-            return td.get_text(" ", strip=True)
-    return ""
+    return parse_assignment_page(assign_html).grading_status
+
+
+# Plain string searches (no parse) isolating what ``parse_assignment_page``
+# reads: the "generaltable" status tables, minus the "time remaining" row
+# that changes every minute and the per-request attributes (ids, hrefs
+# with sesskey) of the comment and file widgets. Classes carry the status.
+_STATUS_TABLE_RE = re.compile(r"<table\b[^>]*\bgeneraltable\b[^>]*>.*?</table>", re.S | re.I)
+_TIME_REMAINING_ROW_RE = re.compile(
+    r"<tr\b(?:(?!</tr>).)*?(?:timeremaining|tiempo restante|time remaining)(?:(?!</tr>).)*</tr>", re.S | re.I
+)
+_VOLATILE_ATTR_RE = re.compile(r"""\s(?!class\b)[\w:-]+\s*=\s*(?:"[^"]*"|'[^']*')""")
+
+
+def assignment_region_hash(assign_html: str) -> str:
+    """Hash of an assignment page's submission status tables, found without parsing the page.
+
+    "" when the tables carry no Moodle status cell: the parser may then
+    fall back to the whole page text, so such pages are always parsed.
+    """
+    region = "".join(_STATUS_TABLE_RE.findall(assign_html))
+    if "submissionstatus" not in region:
+        return ""
+    region = _VOLATILE_ATTR_RE.sub("", _TIME_REMAINING_ROW_RE.sub("", region))
+    return hashlib.sha1(region.encode("utf-8")).hexdigest()
 
 
 # ---------------------------------------------------------------------------
@@ -143,74 +311,74 @@ def _parse_timeline_items(soup: BeautifulSoup) -> List[Event]:
         a_title = item.select_one("h6.event-name a")
         if not a_title:
             continue
-
-        title = a_title.get_text(" ", strip=True)
-        url = _attr_str(a_title, "href")
-        aria = _attr_str(a_title, "aria-label")
-
-        # Extract course name from aria-label:
-        # "Act 13: ... actividad en IS N Redes de Computo 001 está pendiente para ..."
-        course_name = ""
-        m = re.search(r"actividad en (.+?) está pendiente para", aria)
-        if m:
-            course_name = m.group(1).strip()
-
-        # Extract due date from aria-label:
-        # "... está pendiente para 8 de marzo de 2026, 23:59"
-        due_text = ""
-        m_due = re.search(r"está pendiente para (.+)", aria)
-        if m_due:
-            due_text = m_due.group(1).strip()
-
-        # subtitle may have course too: "Tarea está en fecha de entrega · COURSE"
-        if not course_name:
-            subtitle_el = item.select_one(".event-name-container small")
-            if subtitle_el:
-                subtitle = subtitle_el.get_text(" ", strip=True)
-                parts = subtitle.rsplit("·", 1)
-                if len(parts) == 2:
-                    course_name = parts[1].strip()
-
-        # Fallback due text from the time element
-        if not due_text:
-            time_el = item.select_one(".timeline-name > small")
-            if time_el:
-                due_text = time_el.get_text(" ", strip=True)
-
-        # Assignment URL from the action button (e.g. "Añadir envío")
-        assignment_url = ""
+        subtitle_el = item.select_one(".event-name-container small")
+        time_el = item.select_one(".timeline-name > small")
         action_a = item.select_one(".timeline-action-button a")
-        if action_a:
-            action_href = _attr_str(action_a, "href")
-            # Strip query params like &action=editsubmission
-            clean = re.sub(r"[&?]action=\w+", "", action_href)
-            if "/mod/" in clean and "view.php" in clean:
-                assignment_url = clean
-
-        # Direct URL to the assignment (the title link itself often points there)
-        if not assignment_url and "/mod/" in url and "view.php" in url:
-            assignment_url = url
-
-        # Generate event_id from URL
-        event_id = ""
-        if url:
-            m_id = re.search(r"[?&]id=(\d+)", url)
-            if m_id:
-                event_id = f"tl_{m_id.group(1)}"
-        if not event_id:
-            event_id = url or title
-
-        events.append(Event(
-            event_id=event_id,
-            title=title,
-            due_text=due_text,
-            url=url,
-            course_name=course_name or "Sin materia",
-            assignment_url=assignment_url,
-        ))
+        events.append(_timeline_event({
+            "event_id": _attr_str(item, "data-event-id"),
+            "title": a_title.get_text(" ", strip=True),
+            "url": _attr_str(a_title, "href"),
+            "aria": _attr_str(a_title, "aria-label"),
+            "subtitle": subtitle_el.get_text(" ", strip=True) if subtitle_el else "",
+            "time": time_el.get_text(" ", strip=True) if time_el else "",
+            "action_url": _attr_str(action_a, "href") if action_a else "",
+        }))
     return events
 
 
+def _timeline_event(item: Mapping[str, str]) -> Event:
+    """Build one timeline ``Event`` from the texts/attributes of its list item."""
+    title = item.get("title", "")
+    url = item.get("url", "")
+    aria = item.get("aria", "")
+
+    # Extract course name from aria-label:
+    # "Act 13: ... actividad en IS N Redes de Computo 001 está pendiente para ..."
+    course_name = ""
+    m = re.search(r"actividad en (.+?) está pendiente para", aria)
+    if m:
+        course_name = m.group(1).strip()
+
+    # Extract due date from aria-label:
+    # "... está pendiente para 8 de marzo de 2026, 23:59"
+    due_text = ""
+    m_due = re.search(r"está pendiente para (.+)", aria)
+    if m_due:
+        due_text = m_due.group(1).strip()
+
+    # subtitle may have course too: "Tarea está en fecha de entrega · COURSE"
+    if not course_name:
+        parts = item.get("subtitle", "").rsplit("·", 1)
+        if len(parts) == 2:
+            course_name = parts[1].strip()
+
+    # Fallback due text from the time element
+    if not due_text:
+        due_text = item.get("time", "")
+
+    # Assignment URL from the action button (e.g. "Añadir envío")
+    assignment_url = ""
+    action_href = item.get("action_url", "")
+    if action_href:
+        # Strip query params like &action=editsubmission
+        clean = re.sub(r"[&?]action=\w+", "", action_href)
+        if "/mod/" in clean and "view.php" in clean:
+            assignment_url = clean
+
+    # Direct URL to the assignment (the title link itself often points there)
+    if not assignment_url and "/mod/" in url and "view.php" in url:
+        assignment_url = url
+
+    return Event(
+        event_id=canonical_event_id(item.get("event_id", ""), url_id(url), url or title),
+        title=title,
+        due_text=due_text,
+        url=url,
+        course_name=course_name or "Sin materia",
+        assignment_url=assignment_url,
+    )
+
+
 # ---------------------------------------------------------------------------
 # "Eventos próximos" block parser  (data-region="event-item")
 # ---------------------------------------------------------------------------
@@ -225,41 +393,51 @@ def _parse_upcoming_events(soup: BeautifulSoup) -> List[Event]:
     events: List[Event] = []
     for ev in soup.select('div.event[data-region="event-item"]'):
         a_title = ev.select_one('h6 a[data-action="view-event"]')
-        a_due = ev.select_one("div.date.small a")
         if not a_title:
             continue
-
-        title = a_title.get_text(" ", strip=True)
-        url = _attr_str(a_title, "href")
-        due_text = ""
-
         # Build due_text from the whole date div (e.g. "Hoy, 23:21")
         date_div = ev.select_one("div.date.small")
-        if date_div:
-            due_text = date_div.get_text(" ", strip=True)
-        elif a_due:
-            due_text = a_due.get_text(" ", strip=True)
+        events.append(_upcoming_event({
+            "title": a_title.get_text(" ", strip=True),
+            "url": _attr_str(a_title, "href"),
+            "event_id": _attr_str(a_title, "data-event-id"),
+            "date": date_div.get_text(" ", strip=True) if date_div else "",
+        }))
+    return events
 
-        event_id = _attr_str(a_title, "data-event-id")
 
-        if not event_id and url:
-            m = re.search(r"#event_(\d+)", url)
-            if m:
-                event_id = m.group(1)
+def _upcoming_event(item: Mapping[str, str]) -> Event:
+    """Build one upcoming ``Event`` from the texts/attributes of its block entry."""
+    title = item.get("title", "")
+    url = item.get("url", "")
+    event_id = item.get("event_id", "")
 
-        if not event_id and url:
-            m = re.search(r"[?&]event=(\d+)", url)
-            if m:
-                event_id = m.group(1)
+    if not event_id and url:
+        m = re.search(r"#event_(\d+)", url)
+        if m:
+            event_id = m.group(1)
 
-        if not event_id:
-            event_id = url or title
+    if not event_id and url:
+        m = re.search(r"[?&]event=(\d+)", url)
+        if m:
+            event_id = m.group(1)
 
-        events.append(Event(event_id=event_id, title=title, due_text=due_text, url=url))
-    return events
+    if not event_id:
+        event_id = url or title
 
+    return Event(event_id=event_id, title=title, due_text=item.get("date", ""), url=url)
 
-def parse_events_from_dashboard(html: str) -> List[Event]:
+
+# The only parts of /my/ and of a calendar event page the parsers read; the
+# navigation drawers, course cards and footer are never turned into nodes.
+_DASHBOARD_REGIONS = (Region("", "data-region", frozenset({"event-list-item", "event-item"})),)
+_EVENT_PAGE_REGIONS = (
+    Region("a", "href"),
+    Region("div", "class", frozenset({"description-content"})),
+)
+
+
+def parse_events_from_dashboard(html: str, timeline: Optional[List[Event]] = None) -> List[Event]:
     """Parse events from the Moodle dashboard page.
 
     Merges results from two blocks present on the dashboard:
@@ -267,54 +445,54 @@ def parse_events_from_dashboard(html: str) -> List[Event]:
     2. "Línea de tiempo"  — JS-rendered, has richer info (course, assignment URL).
 
     Timeline items that match an upcoming event (by title) enrich it;
-    any remaining timeline-only items are appended.
+    any remaining timeline-only items are appended. ``timeline`` replaces
+    the rendered timeline block when its events were already built from
+    the block's AJAX JSON.
     """
-    soup = BeautifulSoup(html, "html.parser")
-
+    soup = parse_html(html, regions=_DASHBOARD_REGIONS)
     upcoming = _parse_upcoming_events(soup)
-    timeline = _parse_timeline_items(soup)
-
+    if timeline is None:
+        timeline = _parse_timeline_items(soup)
+    return _merge_dashboard_events(upcoming, timeline)
+
+
+def merge_event_fields(target: Event, other: Event) -> None:
+    """Fill what ``target`` lacks from ``other``, a second listing of the same event."""
+    if other.course_name and other.course_name != "Sin materia":
+        target.course_name = other.course_name
+    if other.assignment_url and not target.assignment_url:
+        target.assignment_url = other.assignment_url
+    if other.due_text and not target.due_text:
+        target.due_text = other.due_text
+    if other.description and not target.description:
+        target.description = other.description
+    if other.course_id and not target.course_id:
+        target.course_id = other.course_id
+
+
+def _merge_dashboard_events(upcoming: List[Event], timeline: List[Event]) -> List[Event]:
     if not upcoming and not timeline:
         return []
 
-    # Index upcoming events by a normalised title key for merging
-    def _norm(t: str) -> str:
-        # Timeline titles may omit the trailing " está en fecha de entrega" etc.
-        t = re.sub(r"\s+", " ", t).strip().lower()
-        for suffix in [
-            " está en fecha de entrega",
-            " is due",
-            " debe entregarse",
-        ]:
-            if t.endswith(suffix):
-                t = t[: -len(suffix)].strip()
-        return t
-
+    # Index upcoming events by calendar event id, then by normalised title:
+    # timeline items built from the AJAX JSON carry the same calendar id, the
+    # rendered block usually only a title and the activity link.
+    upcoming_by_id: Dict[str, Event] = {}
     upcoming_by_norm: Dict[str, Event] = {}
     for ev in upcoming:
-        upcoming_by_norm[_norm(ev.title)] = ev
+        upcoming_by_id.setdefault(ev.event_id, ev)
+        upcoming_by_norm.setdefault(normalize_title(ev.title), ev)
 
-    merged_ids: set[str] = set()
-    for tl in timeline:
-        norm_key = _norm(tl.title)
-        match = upcoming_by_norm.get(norm_key)
-        if match:
-            # Enrich the upcoming event with timeline data
-            if tl.course_name and tl.course_name != "Sin materia":
-                match.course_name = tl.course_name
-            if tl.assignment_url:
-                match.assignment_url = tl.assignment_url
-            if tl.due_text and not match.due_text:
-                match.due_text = tl.due_text
-            merged_ids.add(norm_key)
-
-    # Start with all upcoming events (enriched where possible)
     result = list(upcoming)
-
-    # Append timeline-only events (not already in upcoming)
+    joined: set[int] = set()
     for tl in timeline:
-        if _norm(tl.title) not in merged_ids:
+        match = upcoming_by_id.get(tl.event_id) or upcoming_by_norm.get(normalize_title(tl.title))
+        if match is None or id(match) in joined:
+            # Timeline-only events (not already in upcoming) are appended.
             result.append(tl)
+            continue
+        merge_event_fields(match, tl)
+        joined.add(id(match))
 
     log.info(
         "Dashboard parse: %d upcoming + %d timeline → %d merged events",
@@ -323,55 +501,148 @@ def parse_events_from_dashboard(html: str) -> List[Event]:
     return result
 
 
-def enrich_from_event_page(event_html: str) -> tuple[str, str]:
-    """Extract course name and description from a calendar day-view event page."""
-    soup = BeautifulSoup(event_html, "html.parser")
+def parse_event_page(event_html: str, base: str = "") -> EventPage:
+    """Course, description and activity link from a calendar day-view event page, in one parse."""
+    soup = parse_html(event_html, regions=_EVENT_PAGE_REGIONS)
+    desc_div = soup.select_one("div.description-content")
+    return _event_page({
+        "course_links": [
+            (_attr_str(a, "href"), a.get_text(" ", strip=True))
+            for a in soup.select('a[href*="/course/view.php?id="]')
+        ],
+        "description": desc_div.get_text("\n", strip=True) if desc_div else None,
+        **_activity_links(soup),
+    }, base)
+
+
+def _event_page(page: Mapping[str, Any], base: str) -> EventPage:
+    """Build an ``EventPage`` from an event page's course links, description text and activity links."""
+    result = EventPage()
 
     # The course name appears as a link to /course/view.php inside the event
     # detail card.  On the calendar day view the *last* such link (inside
     # the event detail area) holds the friendly short name (e.g.
     # "IS N Auditoria en Informatica 001") while earlier ones are generic
     # section names ("General", "Elemento de Competencia 2").
-    course_name = "Sin materia"
-    course_links = soup.select('a[href*="/course/view.php?id="]')
+    course_links = page.get("course_links") or []
     if course_links:
         # Prefer a link whose text is NOT a generic section label
         generic_labels = {"general", "sección"}
-        for a in reversed(course_links):
-            text = a.get_text(" ", strip=True)
+        chosen = None
+        for href, text in reversed(course_links):
             if text and text.lower() not in generic_labels:
-                course_name = text
+                chosen, result.course_name = href, text
                 break
-        if course_name == "Sin materia" and course_links:
-            course_name = course_links[0].get_text(" ", strip=True) or "Sin materia"
+        if chosen is None:
+            chosen = course_links[0][0]
+            result.course_name = course_links[0][1] or "Sin materia"
+        result.course_id = url_id(chosen)
 
-    desc_div = soup.select_one("div.description-content")
-    description = ""
-    if desc_div:
-        description = desc_div.get_text("\n", strip=True)
-        description = re.sub(r"\n{3,}", "\n\n", description).strip()
+    description = page.get("description")
+    if description is not None:
+        result.description = re.sub(r"\n{3,}", "\n\n", description).strip()
+
+    if base:
+        result.assignment_url = _activity_url(page, base)
+    return result
 
-    return course_name, description
+
+def enrich_from_event_page(event_html: str) -> tuple[str, str]:
+    """(course name, description) from an event page; see ``parse_event_page``."""
+    page = parse_event_page(event_html)
+    return page.course_name, page.description
 
 
 def find_assignment_url(event_html: str, base: str) -> str:
     """Find the direct assignment/activity URL inside an event page."""
-    soup = BeautifulSoup(event_html, "html.parser")
+    return _activity_url(_activity_links(parse_html(event_html, regions=_EVENT_PAGE_REGIONS)), base)
+
 
+def _activity_links(soup) -> Dict[str, List[str]]:
+    return {
+        "card_links": [_attr_str(a, "href") for a in soup.select("a.card-link[href]")],
+        "links": [_attr_str(a, "href") for a in soup.select('a[href*="/mod/"]')],
+    }
+
+
+def _activity_url(links: Mapping[str, Any], base: str) -> str:
     # Prefer the "Ir a la actividad" / "Go to activity" footer link
-    for a in soup.select("a.card-link[href]"):
-        href = _attr_str(a, "href")
+    for href in links.get("card_links") or ():
         if f"{base}/mod/" in href and "view.php" in href:
             return href
 
     # Fallback: any link to /mod/*/view.php?id=...
-    for a in soup.select("a[href]"):
-        href = _attr_str(a, "href")
+    for href in links.get("links") or ():
         if f"{base}/mod/" in href and "view.php?id=" in href:
             return href
     return ""
 
 
+_URL_ID_RE = re.compile(r"[?&]id=(\d+)")
+
+
+def url_id(url: str) -> str:
+    """The ``id`` query parameter of a Moodle URL (course or course-module id), or ""."""
+    match = _URL_ID_RE.search(url or "")
+    return match.group(1) if match else ""
+
+
+def canonical_event_id(calendar_id: str, cmid: str, fallback: str) -> str:
+    """One id per dated event, whichever block or engine it was read from.
+
+    The calendar event id when known (``Eventos próximos``, the timeline
+    JSON, the web services); otherwise ``cm_<course-module id>`` for an
+    activity known only by its link, and ``fallback`` as a last resort.
+    """
+    if calendar_id:
+        return calendar_id
+    if cmid:
+        return f"cm_{cmid}"
+    return fallback
+
+
+def parse_assignment_index(index_html: str) -> Dict[str, AssignmentStatus]:
+    """Submission status per course-module id from a course's ``mod/assign/index.php``.
+
+    Columns are located by their header text, so the optional section
+    column and the site language do not matter. Rows whose status text is
+    not recognised come back with ``submitted`` None.
+    """
+    soup = parse_html(index_html)
+    statuses: Dict[str, AssignmentStatus] = {}
+    for table in soup.select("table.generaltable"):
+        status_col = grade_col = None
+        for i, th in enumerate(table.select("thead th")):
+            label = _norm_text(th.get_text(" ", strip=True))
+            if _INDEX_DUE_LABEL.search(label):
+                continue
+            if grade_col is None and _INDEX_GRADE_LABEL.search(label):
+                grade_col = i
+            elif status_col is None and _INDEX_SUBMISSION_LABEL.search(label):
+                status_col = i
+        if status_col is None:
+            continue
+
+        for row in table.select("tbody tr"):
+            link = row.select_one('a[href*="/mod/assign/view.php?id="]')
+            cells = row.select("td")
+            if link is None or status_col >= len(cells):
+                continue
+            value_raw = cells[status_col].get_text(" ", strip=True)
+            status = AssignmentStatus(
+                submitted=_submission_from_text(_norm_text(value_raw)),
+                submission_status=value_raw or "No detectado",
+            )
+            if grade_col is not None and grade_col < len(cells):
+                grade = cells[grade_col].get_text(" ", strip=True)
+                if grade and grade != "-":
+                    status.grading_status = "Calificado"
+                    status.rows["grade"] = grade
+            statuses[url_id(_attr_str(link, "href"))] = status
+    statuses.pop("", None)
+    return statuses
+
+
 def _attr_str(tag, attr: str) -> str:
     """Safely extract a single string attribute from a BS4 tag."""
     val = tag.get(attr, "")
@@ -380,11 +651,159 @@ def _attr_str(tag, attr: str) -> str:
     return (val or "").strip()
 
 
+# ---------------------------------------------------------------------------
+# In-page extraction (UES_EXTRACTION_MODE=dom)
+# ---------------------------------------------------------------------------
+# ``page.evaluate`` runs these scripts in the tab and gets back only the
+# texts/attributes the parsers above read, instead of ``page.content()``
+# serializing the whole DOM for a Python-side parse. ``text`` mirrors
+# ``get_text(sep, strip=True)`` so both paths build identical objects.
+
+_DOM_HELPERS_JS = """
+  const text = (el, sep) => {
+    if (!el) return "";
+    const parts = [];
+    const walker = document.createTreeWalker(el, NodeFilter.SHOW_TEXT);
+    for (let node = walker.nextNode(); node; node = walker.nextNode()) {
+      if (node.parentElement && node.parentElement.closest("script, style")) continue;
+      const value = node.nodeValue.trim();
+      if (value) parts.push(value);
+    }
+    return parts.join(sep);
+  };
+  const attr = (el, name) => (el ? (el.getAttribute(name) || "").trim() : "");
+  const all = (root, selector) => Array.from(root.querySelectorAll(selector));
+"""
+
+DASHBOARD_DOM_JS = "() => {" + _DOM_HELPERS_JS + """
+  const upcoming = all(document, 'div.event[data-region="event-item"]').map((ev) => {
+    const a = ev.querySelector('h6 a[data-action="view-event"]');
+    return a && {
+      title: text(a, " "),
+      url: attr(a, "href"),
+      event_id: attr(a, "data-event-id"),
+      date: text(ev.querySelector("div.date.small"), " "),
+    };
+  }).filter(Boolean);
+  const timeline = all(document, '[data-region="event-list-item"]').map((item) => {
+    const a = item.querySelector("h6.event-name a");
+    return a && {
+      event_id: attr(item, "data-event-id"),
+      title: text(a, " "),
+      url: attr(a, "href"),
+      aria: attr(a, "aria-label"),
+      subtitle: text(item.querySelector(".event-name-container small"), " "),
+      time: text(item.querySelector(".timeline-name > small"), " "),
+      action_url: attr(item.querySelector(".timeline-action-button a"), "href"),
+    };
+  }).filter(Boolean);
+  return {upcoming, timeline};
+}"""
+
+EVENT_PAGE_DOM_JS = "() => {" + _DOM_HELPERS_JS + """
+  const description = document.querySelector("div.description-content");
+  return {
+    course_links: all(document, 'a[href*="/course/view.php?id="]').map((a) => [attr(a, "href"), text(a, " ")]),
+    description: description ? text(description, "\\n") : null,
+    card_links: all(document, "a.card-link[href]").map((a) => attr(a, "href")).filter((h) => h.includes("/mod/")),
+    links: all(document, 'a[href*="/mod/"]').map((a) => attr(a, "href")),
+  };
+}"""
+
+ASSIGNMENT_PAGE_DOM_JS = "() => {" + _DOM_HELPERS_JS + """
+  const rows = [];
+  for (const row of all(document, "table.generaltable tr")) {
+    const th = row.querySelector("th");
+    const td = row.querySelector("td");
+    if (th && td) rows.push([text(th, " "), text(td, " "), Array.from(td.classList)]);
+  }
+  const cell = document.querySelector("td.submissionstatussubmitted")
+    || document.querySelector("td.submissionstatusnosubmission");
+  return {
+    rows,
+    status_cell: cell ? [Array.from(cell.classList), text(cell, " ")] : null,
+    text: cell ? null : text(document.documentElement, " "),
+  };
+}"""
+
+
+def events_from_dashboard_dom(data: Mapping[str, Any], timeline: Optional[List[Event]] = None) -> List[Event]:
+    """``parse_events_from_dashboard`` for the result of ``DASHBOARD_DOM_JS``."""
+    upcoming = [_upcoming_event(item) for item in data.get("upcoming") or ()]
+    if timeline is None:
+        timeline = [_timeline_event(item) for item in data.get("timeline") or ()]
+    return _merge_dashboard_events(upcoming, timeline)
+
+
+def event_page_from_dom(data: Mapping[str, Any], base: str = "") -> EventPage:
+    """``parse_event_page`` for the result of ``EVENT_PAGE_DOM_JS``."""
+    return _event_page(data, base)
+
+
+def assignment_status_from_dom(data: Mapping[str, Any]) -> AssignmentStatus:
+    """``parse_assignment_page`` for the result of ``ASSIGNMENT_PAGE_DOM_JS``."""
+    cell = data.get("status_cell")
+    return _assignment_status(
+        [(label, value, classes) for label, value, classes in data.get("rows") or ()],
+        lambda: (cell[0], cell[1]) if cell else None,
+        lambda: data.get("text") or "",
+    )
+
+
+# ---------------------------------------------------------------------------
+# Dashboard tab refreshed in place (UES_DASHBOARD_TAB)
+# ---------------------------------------------------------------------------
+# Runs in the dashboard tab kept from an earlier cycle, with the timeline
+# block's own service call as argument: fetches just the /my/ document to
+# swap in the fresh "Eventos próximos" block and replays the timeline call
+# through ``core/ajax``, so neither the theme nor the blocks' JS load again.
+# ``ok`` is false, with a ``reason``, when the session is gone or the page
+# no longer has the block; the caller then navigates as usual.
+
+DASHBOARD_REFRESH_JS = """async ({methodname, args}) => {
+  const response = await fetch(window.location.href, {credentials: "same-origin", cache: "no-store"});
+  if (!response.ok) return {ok: false, reason: `HTTP ${response.status}`};
+  if (/\\/login\\//.test(response.url)) return {ok: false, reason: "login"};
+  const fresh = new DOMParser().parseFromString(await response.text(), "text/html");
+  const selector = '[data-block="calendar_upcoming"]';
+  const current = document.querySelector(selector);
+  const updated = fresh.querySelector(selector);
+  if (!current || !updated) return {ok: false, reason: "sin bloque de eventos próximos"};
+  if (typeof require !== "function") return {ok: false, reason: "sin core/ajax"};
+  try {
+    const data = await new Promise((resolve, reject) => {
+      require(["core/ajax"], (ajax) => ajax.call([{methodname, args}])[0].then(resolve, reject), reject);
+    });
+    current.replaceWith(document.importNode(updated, true));
+    return {ok: true, items: (data && data.events) || []};
+  } catch (error) {
+    return {ok: false, reason: String((error && (error.errorcode || error.message)) || error)};
+  }
+}"""
+
+
+_LOGIN_USER_SELECTOR = 'input[name="username"], input#username, input[name="user"], input[type="email"]'
+_LOGIN_PASS_SELECTOR = 'input[name="password"], input#password, input[type="password"]'
+_LOGIN_SUBMIT_SELECTOR = 'button[type="submit"], input[type="submit"]'
+
+
+class LoginRedirectError(RuntimeError):
+    """A fetched page landed on the login form: the session is gone."""
+
+
+def is_login_url(url: str) -> bool:
+    return "login" in (url or "").lower()
+
+
 def login_if_needed(page, context, dashboard_url: str, ues_user: str, ues_pass: str, storage_file: str) -> None:
     page.goto(dashboard_url, wait_until="domcontentloaded")
-    if "login" not in page.url.lower():
+    if not is_login_url(page.url):
         return
+    submit_login(page, context, ues_user, ues_pass, storage_file)
+
 
+def submit_login(page, context, ues_user: str, ues_pass: str, storage_file: str) -> None:
+    """Fill the login form ``page`` is showing and save the new session."""
     if not ues_user or not ues_pass:
         raise RuntimeError("Faltan UES_USER / UES_PASS en variables de entorno.")
 
@@ -393,15 +812,12 @@ def login_if_needed(page, context, dashboard_url: str, ues_user: str, ues_pass:
     except PWTimeout:
         raise RuntimeError("No encontré el formulario de login (no apareció input password).")
 
-    user_sel = 'input[name="username"], input#username, input[name="user"], input[type="email"]'
-    pass_sel = 'input[name="password"], input#password, input[type="password"]'
-
-    page.fill(user_sel, ues_user)
-    page.fill(pass_sel, ues_pass)
-    page.click('button[type="submit"], input[type="submit"]')
+    page.fill(_LOGIN_USER_SELECTOR, ues_user)
+    page.fill(_LOGIN_PASS_SELECTOR, ues_pass)
+    page.click(_LOGIN_SUBMIT_SELECTOR)
     page.wait_for_load_state("domcontentloaded")
 
-    if "login" in page.url.lower():
+    if is_login_url(page.url):
         raise RuntimeError("Login falló (sigue en pantalla de login). Revisa usuario/contraseña o selectores.")
 
     context.storage_state(path=storage_file)
@@ -420,3 +836,290 @@ def safe_goto(page, url: str, tries: int = 3, wait_until: str = "domcontentloade
                 page.goto(url, wait_until=wait_until, timeout=45000)
     except Exception as exc:
         raise RuntimeError(f"No se pudo navegar a {url}") from exc
+
+
+# Navigation is started with a plain ``location.assign`` so the call returns
+# immediately instead of blocking until the page loads.
+_NAVIGATE_JS = "url => { window.location.assign(url); }"
+
+
+def _page_html(page, url: str, script: Optional[str] = None) -> object:
+    if is_login_url(page.url):
+        raise LoginRedirectError(f"{url} redirigió al login")
+    return page.evaluate(script) if script else page.content()
+
+
+def fetch_pages_html(
+    context, urls: List[str], concurrency: int = 4, tries: int = 3, script: Optional[str] = None
+) -> Dict[str, object]:
+    """Load several URLs in parallel tabs of ``context`` and return their HTML.
+
+    With ``script`` (one of the ``*_DOM_JS`` extractors) each value is what
+    the script returns in the loaded tab instead of the page HTML.
+
+    Sync Playwright blocks on every call, but Chromium keeps loading all tabs
+    while we wait on one of them. Each batch of ``concurrency`` URLs is
+    dispatched first and collected afterwards. A URL that fails gets the
+    regular ``safe_goto`` retries on its own tab. If it still fails, its
+    value in the returned dict is the exception instead of the HTML; a tab
+    that ends on the login form gets a ``LoginRedirectError``.
+    """
+    results: Dict[str, object] = {}
+    pending = list(dict.fromkeys(url for url in urls if url))
+    step = max(1, int(concurrency))
+
+    for start in range(0, len(pending), step):
+        batch = pending[start:start + step]
+        pages = []
+        try:
+            for url in batch:
+                page = context.new_page()
+                pages.append(page)
+                try:
+                    page.evaluate(_NAVIGATE_JS, url)
+                except Exception:
+                    log.debug("No se pudo despachar navegación a %s; se reintentará.", url)
+
+            for url, page in zip(batch, pages):
+                try:
+                    page.wait_for_url(lambda u: u != "about:blank", wait_until="domcontentloaded", timeout=45000)
+                    results[url] = _page_html(page, url, script)
+                except LoginRedirectError as ex:
+                    results[url] = ex
+                except Exception:
+                    try:
+                        safe_goto(page, url, tries=tries)
+                        results[url] = _page_html(page, url, script)
+                    except Exception as ex:
+                        results[url] = ex
+        finally:
+            for page in pages:
+                try:
+                    page.close()
+                except Exception:
+                    pass
+
+    return results
+
+
+# Pages read by plain GET render what we parse on the server. Each caller
+# passes the text its page type must contain (``marker``); a body without
+# it (an error page, a JS shell) is loaded in a tab instead.
+ASSIGNMENT_PAGE_MARKER = "generaltable"  # submission status table
+ASSIGNMENT_INDEX_MARKER = "generaltable"  # the course's assignment list
+
+# Sync Playwright serves one call at a time, so GETs through ``context.request``
+# run one after another. A tab already on the site runs each batch with
+# ``fetch`` instead: same cookies, and Chromium loads the batch in parallel.
+FETCH_PAGES_JS = """async (urls) => Promise.all(urls.map(async (url) => {
+    try {
+        const response = await fetch(url, {credentials: "same-origin"});
+        return {url: response.url, status: response.status, ok: response.ok, body: await response.text()};
+    } catch (e) {
+        return {url: url, status: 0, ok: false, body: "", error: String(e)};
+    }
+}))"""
+
+_ORIGIN_RE = re.compile(r"^(https?://[^/?#]+)", re.I)
+
+
+def _origin(url: str) -> str:
+    match = _ORIGIN_RE.match(url or "")
+    return match.group(1).lower() if match else ""
+
+
+def _site_tab(context, urls: List[str]) -> Any:
+    """An open tab of ``context`` on the origin of ``urls`` (past the login form), or None."""
+    origin = _origin(urls[0]) if urls else ""
+    if not origin:
+        return None
+    for page in list(getattr(context, "pages", ())):
+        try:
+            if not page.is_closed() and _origin(page.url) == origin and not is_login_url(page.url):
+                return page
+        except Exception:
+            continue
+    return None
+
+
+def _usable_http_body(ok: bool, final_url: str, body: str, marker: str) -> bool:
+    return ok and not is_login_url(final_url) and marker in body
+
+
+def _get_batch(context, tab, urls: List[str]) -> List[object]:
+    """``(final_url, status, ok, body)`` per URL, or the exception its GET raised."""
+    if tab is not None:
+        try:
+            return [
+                RuntimeError(item["error"]) if item.get("error")
+                else (item["url"], item["status"], item["ok"], item["body"])
+                for item in tab.evaluate(FETCH_PAGES_JS, urls)
+            ]
+        except Exception as ex:
+            log.debug("fetch() en la pestaña falló (%s); uso context.request.", ex)
+    responses: List[object] = []
+    for url in urls:
+        try:
+            response = context.request.get(url, timeout=45000)
+            responses.append((response.url, response.status, response.ok, response.text()))
+        except Exception as ex:
+            responses.append(ex)
+    return responses
+
+
+def fetch_pages_http(
+    context,
+    urls: List[str],
+    concurrency: int = 4,
+    tries: int = 3,
+    script: Optional[str] = None,
+    marker: str = ASSIGNMENT_PAGE_MARKER,
+) -> Dict[str, object]:
+    """GET ``urls`` with the session of ``context`` (same cookies, no rendering).
+
+    With a tab of ``context`` already on the site, each batch of
+    ``concurrency`` URLs is fetched in parallel from that tab; otherwise
+    they go one by one through ``context.request``.
+
+    A redirect to login is reported as ``LoginRedirectError`` (a tab would
+    land there too). Any other response that is not usable HTML (error
+    status, or ``marker`` missing from the body) is loaded by navigation
+    instead, using ``fetch_pages_html`` (with ``script``, if given).
+    """
+    results: Dict[str, object] = {}
+    fallback: List[str] = []
+    pending = list(dict.fromkeys(url for url in urls if url))
+    tab = _site_tab(context, pending)
+    step = max(1, int(concurrency))
+
+    for start in range(0, len(pending), step):
+        batch = pending[start:start + step]
+        for url, response in zip(batch, _get_batch(context, tab, batch)):
+            if isinstance(response, Exception):
+                log.debug("GET %s falló (%s); uso navegación.", url, response)
+                fallback.append(url)
+                continue
+            final_url, status, ok, body = response
+            if is_login_url(final_url):
+                results[url] = LoginRedirectError(f"{url} redirigió al login")
+            elif _usable_http_body(ok, final_url, body, marker):
+                results[url] = body
+            else:
+                log.debug("GET %s no trajo %r (HTTP %s); uso navegación.", url, marker, status)
+                fallback.append(url)
+
+    if fallback:
+        results.update(fetch_pages_html(context, fallback, concurrency=concurrency, tries=tries, script=script))
+    return results
+
+
+# ---------------------------------------------------------------------------
+# async_playwright counterparts (used by the async scrape engine)
+# ---------------------------------------------------------------------------
+
+async def login_if_needed_async(
+    page, context, dashboard_url: str, ues_user: str, ues_pass: str, storage_file: str
+) -> None:
+    await page.goto(dashboard_url, wait_until="domcontentloaded")
+    if not is_login_url(page.url):
+        return
+    await submit_login_async(page, context, ues_user, ues_pass, storage_file)
+
+
+async def submit_login_async(page, context, ues_user: str, ues_pass: str, storage_file: str) -> None:
+    if not ues_user or not ues_pass:
+        raise RuntimeError("Faltan UES_USER / UES_PASS en variables de entorno.")
+
+    try:
+        await page.wait_for_selector('input[type="password"]', timeout=10000)
+    except PWTimeout:
+        raise RuntimeError("No encontré el formulario de login (no apareció input password).")
+
+    await page.fill(_LOGIN_USER_SELECTOR, ues_user)
+    await page.fill(_LOGIN_PASS_SELECTOR, ues_pass)
+    await page.click(_LOGIN_SUBMIT_SELECTOR)
+    await page.wait_for_load_state("domcontentloaded")
+
+    if is_login_url(page.url):
+        raise RuntimeError("Login falló (sigue en pantalla de login). Revisa usuario/contraseña o selectores.")
+
+    await context.storage_state(path=storage_file)
+
+
+async def safe_goto_async(page, url: str, tries: int = 3, wait_until: str = "domcontentloaded") -> None:
+    try:
+        async for attempt in AsyncRetrying(
+            stop=stop_after_attempt(tries),
+            wait=wait_exponential(multiplier=1.2, min=1, max=10),
+            retry=retry_if_exception_type(Exception),
+            before_sleep=before_sleep_log(logging.getLogger(__name__), logging.WARNING),
+            reraise=True,
+        ):
+            with attempt:
+                await page.goto(url, wait_until=wait_until, timeout=45000)
+    except Exception as exc:
+        raise RuntimeError(f"No se pudo navegar a {url}") from exc
+
+
+async def fetch_pages_html_async(
+    context, urls: List[str], concurrency: int = 4, tries: int = 3, script: Optional[str] = None
+) -> Dict[str, object]:
+    """Async version of ``fetch_pages_html``: at most ``concurrency`` tabs at once."""
+    semaphore = asyncio.Semaphore(max(1, int(concurrency)))
+    pending = list(dict.fromkeys(url for url in urls if url))
+
+    async def _fetch(url: str) -> object:
+        async with semaphore:
+            page = await context.new_page()
+            try:
+                await safe_goto_async(page, url, tries=tries)
+                if is_login_url(page.url):
+                    return LoginRedirectError(f"{url} redirigió al login")
+                return await page.evaluate(script) if script else await page.content()
+            except Exception as ex:
+                return ex
+            finally:
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+
+    results = await asyncio.gather(*(_fetch(url) for url in pending))
+    return dict(zip(pending, results))
+
+
+async def fetch_pages_http_async(
+    context,
+    urls: List[str],
+    concurrency: int = 4,
+    tries: int = 3,
+    script: Optional[str] = None,
+    marker: str = ASSIGNMENT_PAGE_MARKER,
+) -> Dict[str, object]:
+    """Async version of ``fetch_pages_http``: up to ``concurrency`` GETs at once through ``context.request``."""
+    semaphore = asyncio.Semaphore(max(1, int(concurrency)))
+    pending = list(dict.fromkeys(url for url in urls if url))
+
+    async def _get(url: str) -> object:
+        async with semaphore:
+            try:
+                response = await context.request.get(url, timeout=45000)
+                if is_login_url(response.url):
+                    return LoginRedirectError(f"{url} redirigió al login")
+                body = await response.text()
+            except Exception as ex:
+                log.debug("GET %s falló (%s); uso navegación.", url, ex)
+                return None
+            if _usable_http_body(response.ok, response.url, body, marker):
+                return body
+            log.debug("GET %s no trajo %r (HTTP %s); uso navegación.", url, marker, response.status)
+            return None
+
+    bodies = await asyncio.gather(*(_get(url) for url in pending))
+    results: Dict[str, object] = {url: body for url, body in zip(pending, bodies) if body is not None}
+    fallback = [url for url, body in zip(pending, bodies) if body is None]
+    if fallback:
+        results.update(
+            await fetch_pages_html_async(context, fallback, concurrency=concurrency, tries=tries, script=script)
+        )
+    return results
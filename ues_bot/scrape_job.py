@@ -2,134 +2,1129 @@
 
 from __future__ import annotations
 
+import hashlib
+import json
 import logging
-import os
 import time
-from typing import Any, Mapping
-
-from playwright.sync_api import sync_playwright
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import asdict
+from functools import partial
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Mapping
 
+from .browser import AsyncBrowserManager, BrowserManager, DashboardTab
 from .config import Settings
-from .models import Event
+from .descriptions import record_missing_descriptions
+from .grades import (
+    OVERVIEW_MARKER,
+    USER_REPORT_MARKER,
+    apply_grade_reports,
+    apply_grades_to_events,
+    courses_to_read,
+    grade_change_events,
+    grades_due,
+    overview_url,
+    parse_grade_overview,
+    user_report_url,
+)
+from .identity import resolve_event_ids
+from .interception import build_request_blocker
+from .models import AssignmentStatus, Event, GradeItem
+from .moodle_api import (
+    TIMELINE_METHOD,
+    MoodleClient,
+    MoodleSessionExpired,
+    action_events_from_service_call,
+    fetch_dashboard_events,
+    sync_timeline,
+    timeline_call_args,
+    timeline_events_from_items,
+)
+from .reminders import REMINDER_THRESHOLDS
 from .scrape import (
-    assignment_is_submitted,
-    enrich_from_event_page,
-    find_assignment_url,
-    login_if_needed,
+    ASSIGNMENT_INDEX_MARKER,
+    ASSIGNMENT_PAGE_DOM_JS,
+    ASSIGNMENT_PAGE_MARKER,
+    DASHBOARD_DOM_JS,
+    DASHBOARD_REFRESH_JS,
+    EVENT_PAGE_DOM_JS,
+    LoginRedirectError,
+    assignment_region_hash,
+    assignment_status_from_dom,
+    event_page_from_dom,
+    events_from_dashboard_dom,
+    fetch_pages_html,
+    fetch_pages_html_async,
+    fetch_pages_http,
+    fetch_pages_http_async,
+    is_login_url,
+    parse_assignment_index,
+    parse_assignment_page,
+    parse_event_page,
     parse_events_from_dashboard,
-    parse_grading_status,
     safe_goto,
+    safe_goto_async,
+    submit_login,
+    submit_login_async,
+    url_id,
+)
+from .session import SessionTracker, relogin_with_new_browser
+from .state import (
+    clear_dashboard_snapshot,
+    get_assignment_page,
+    get_cached_enrichment,
+    get_dashboard_snapshot,
+    get_status_check,
+    load_state,
+    prune_assignment_pages,
+    prune_enrichment_cache,
+    prune_status_checks,
+    record_blocking_metrics,
+    record_cache_metrics,
+    record_cycle_kind,
+    record_dashboard_tab,
+    record_page_hash_metrics,
+    record_scrape_metrics,
+    record_status_check,
+    record_status_refresh_metrics,
+    save_state,
+    store_assignment_page,
+    store_dashboard_snapshot,
+    store_enrichment,
 )
-from .state import load_state, record_scrape_metrics, save_state
+from .summary import due_unix, is_graded
+from .utils import now_local
+
+_DASHBOARD_ITEMS_SELECTOR = '[data-region="event-list-item"], [data-region="event-item"]'
+_DASHBOARD_ITEMS_TIMEOUT_MS = 8000
+
+# How long a submission status read from an assignment page stays trusted.
+_RECHECK_GRADED_SEC = 24 * 3600
+_RECHECK_SUBMITTED_SEC = 6 * 3600
+_RECHECK_FAR_PENDING_SEC = 3 * 3600
+# With the gradebook tracking grades, a submitted assignment's page only
+# needs an occasional look (a reopened submission).
+_RECHECK_SUBMITTED_GRADEBOOK_SEC = 7 * 24 * 3600
+_NEAR_DEADLINE_SEC = 48 * 3600  # pending items closer than this are checked every cycle
+_REMINDER_WINDOW_SEC = max(sec for sec, _label in REMINDER_THRESHOLDS)
+# Parsed assignment pages are forgotten after this long without a fetch.
+_ASSIGNMENT_PAGE_TTL_SEC = 30 * 86400
+# Listed events are rechecked at least weekly, so an older status check
+# belongs to an event that left the dashboard.
+_STATUS_CHECK_TTL_SEC = 30 * 86400
+# A course's assignment index replaces view.php visits once it saves one.
+_INDEX_MIN_ASSIGNMENTS = 2
+
+
+def _track_changes(events: list[Event], known: Dict[str, Any]) -> set[str]:
+    """Update ``known`` with the dashboard basics and return ids that changed."""
+    changed_ids: set[str] = set()
+    for event in events:
+        prev = known.get(event.event_id)
+        if prev is None or prev.get("due_text") != event.due_text or prev.get("title") != event.title:
+            changed_ids.add(event.event_id)
+        known[event.event_id] = {
+            **(prev or {}),
+            "title": event.title,
+            "due_text": event.due_text,
+            "url": event.url,
+        }
+    return changed_ids
+
+
+def _needs_event_page(event: Event) -> bool:
+    # If timeline already gave us course + assignment URL
+    # we can skip the expensive event-page navigation.
+    if not event.url:
+        return False
+    return event.course_name in ("", "Sin materia") or not event.assignment_url
+
+
+def _dom_script(settings: Settings, script: str) -> str | None:
+    """``script`` when pages are read by in-page extraction, else None (``page.content()``)."""
+    return script if settings.extraction_mode == "dom" else None
+
+
+def _fetched(result: object) -> bool:
+    # Page HTML, or the fields a ``*_DOM_JS`` script returned.
+    return isinstance(result, (str, dict))
+
+
+def _apply_event_page(event: Event, fetched: str | Mapping[str, Any], base: str) -> None:
+    if isinstance(fetched, str):
+        page = parse_event_page(fetched, base=base)
+    else:
+        page = event_page_from_dom(fetched, base=base)
+    if event.course_name in ("", "Sin materia"):
+        event.course_name = page.course_name
+    if not event.course_id:
+        event.course_id = page.course_id
+    if not event.description:
+        event.description = page.description
+    if not event.assignment_url:
+        event.assignment_url = page.assignment_url
+
+
+def _apply_assignment_page(event: Event, fetched: str | Mapping[str, Any]) -> None:
+    if isinstance(fetched, str):
+        status = parse_assignment_page(fetched)
+    else:
+        status = assignment_status_from_dom(fetched)
+    event.submitted = status.submitted
+    event.submission_status = status.submission_status
+    event.grading_status = status.grading_status
+
+
+def _use_cached_enrichment(state: Dict[str, Any], events: list[Event], settings: Settings) -> list[Event]:
+    """Fill events from the enrichment cache; return those that still need their event page."""
+    ttl_sec = max(0, int(settings.enrichment_cache_ttl_hours)) * 3600
+    prune_enrichment_cache(state, ttl_sec)
+
+    pending: list[Event] = []
+    hits = 0
+    for event in events:
+        if not _needs_event_page(event):
+            continue
+        cached = get_cached_enrichment(state, event.event_id, event.title, event.due_text, ttl_sec)
+        if cached is None:
+            pending.append(event)
+            continue
+        hits += 1
+        if event.course_name in ("", "Sin materia"):
+            event.course_name = cached.get("course_name", "") or event.course_name
+        if not event.description:
+            event.description = cached.get("description", "")
+        if not event.assignment_url:
+            event.assignment_url = cached.get("assignment_url", "")
+        if not event.course_id:
+            event.course_id = cached.get("course_id", "")
+
+    record_cache_metrics(state, hits=hits, misses=len(pending))
+    if hits:
+        logging.info("Caché de enriquecimiento: %d aciertos, %d páginas de evento por abrir.", hits, len(pending))
+    return pending
+
+
+def _apply_event_stage(
+    state: Dict[str, Any],
+    events: list[Event],
+    event_pages: Mapping[str, object],
+    base: str,
+) -> set[str]:
+    """Apply fetched event pages and cache them; return ids whose event page failed."""
+    failed: set[str] = set()
+    for event in events:
+        fetched = event_pages.get(event.url)
+        if not _fetched(fetched):
+            logging.warning("No pude abrir evento %s: %s", event.url, fetched)
+            failed.add(event.event_id)
+            continue
+        _apply_event_page(event, fetched, base)
+        store_enrichment(
+            state,
+            event.event_id,
+            event.title,
+            event.due_text,
+            event.course_name,
+            event.description,
+            event.assignment_url,
+            course_id=event.course_id,
+        )
+    return failed
+
+
+def _status_recheck_interval(event: Event, check: Mapping[str, Any], now: int, gradebook: bool = False) -> int:
+    """Seconds a stored submission status stays valid for ``event``."""
+    if check.get("submitted") is True:
+        if gradebook:
+            return _RECHECK_SUBMITTED_GRADEBOOK_SEC
+        return _RECHECK_GRADED_SEC if is_graded(check.get("grading_status", "")) else _RECHECK_SUBMITTED_SEC
+    due = due_unix(event)
+    if check.get("submitted") is None or due is None or due - now <= _NEAR_DEADLINE_SEC:
+        return 0
+    return _RECHECK_FAR_PENDING_SEC
+
+
+def _status_check_due(
+    event: Event,
+    check: Mapping[str, Any] | None,
+    now: int,
+    force: bool,
+    gradebook: bool = False,
+) -> bool:
+    return (
+        force
+        or check is None
+        or check.get("due_text") != event.due_text
+        or now - int(check.get("checked_at", 0)) >= _status_recheck_interval(event, check, now, gradebook)
+    )
+
+
+def _gradebook_on(settings: Settings) -> bool:
+    return settings.grades_interval_hours > 0
+
+
+def _force_status_check(state: Dict[str, Any], settings: Settings) -> bool:
+    return bool(state.get("force_status_check")) or not settings.adaptive_status_refresh
+
+
+def _select_status_checks(state: Dict[str, Any], events: list[Event], settings: Settings) -> list[Event]:
+    """Reuse recent submission status where the refresh policy allows it.
+
+    Returns the events whose assignment page must be opened this cycle. A
+    changed ``due_text`` or a pending ``/verificar`` always forces a recheck.
+    """
+    prune_status_checks(state, _STATUS_CHECK_TTL_SEC)
+    force = _force_status_check(state, settings)
+    now = int(time.time())
+    to_check: list[Event] = []
+    for event in events:
+        check = get_status_check(state, event.event_id)
+        if _status_check_due(event, check, now, force, _gradebook_on(settings)):
+            to_check.append(event)
+            continue
+        event.submitted = check.get("submitted")
+        event.submission_status = check.get("submission_status", "")
+        event.grading_status = check.get("grading_status", "")
+
+    record_status_refresh_metrics(state, checked=len(to_check), skipped=len(events) - len(to_check))
+    return to_check
+
+
+def _page_loader(settings: Settings, marker: str) -> Callable[..., Dict[str, object]]:
+    """Loader for server-rendered pages: tabs, or plain GETs whose body must contain ``marker``.
+
+    GETs are used with ``UES_ASSIGNMENT_FETCH=request``; see ``fetch_pages_http``.
+    """
+    if settings.assignment_fetch == "request":
+        return partial(fetch_pages_http, marker=marker)
+    return fetch_pages_html
+
+
+def _page_loader_async(settings: Settings, marker: str) -> Callable[..., Awaitable[Dict[str, object]]]:
+    if settings.assignment_fetch == "request":
+        return partial(fetch_pages_http_async, marker=marker)
+    return fetch_pages_html_async
+
+
+def _assignment_index_urls(events: list[Event], settings: Settings) -> list[str]:
+    """One ``mod/assign/index.php`` per course with enough assignments to check."""
+    if not settings.assignment_index:
+        return []
+    per_course: Dict[str, int] = {}
+    for event in events:
+        if event.course_id and "/mod/assign/view.php" in event.assignment_url:
+            per_course[event.course_id] = per_course.get(event.course_id, 0) + 1
+    return [
+        f"{settings.base}/mod/assign/index.php?id={course_id}"
+        for course_id, count in per_course.items()
+        if count >= _INDEX_MIN_ASSIGNMENTS
+    ]
+
+
+def _apply_index_stage(
+    state: Dict[str, Any],
+    events: list[Event],
+    index_pages: Mapping[str, object],
+    base: str,
+) -> list[Event]:
+    """Resolve submission status from course index pages; return events still needing view.php.
+
+    A failed index page or a row it cannot read just leaves those events
+    to their own assignment page.
+    """
+    if not index_pages:
+        return events
+    statuses: Dict[str, Dict[str, AssignmentStatus]] = {}
+    for url, index_html in index_pages.items():
+        if isinstance(index_html, str):
+            statuses[url_id(url)] = parse_assignment_index(index_html)
+        else:
+            logging.warning("No pude abrir índice de tareas %s: %s", url, index_html)
+
+    remaining: list[Event] = []
+    for event in events:
+        status = statuses.get(event.course_id, {}).get(url_id(event.assignment_url))
+        if status is None or status.submitted is None:
+            remaining.append(event)
+            continue
+        event.submitted = status.submitted
+        event.submission_status = status.submission_status
+        # The index only has a grading status once a grade is shown; until
+        # then keep what the assignment page said (e.g. "No calificado").
+        if status.grading_status:
+            event.grading_status = status.grading_status
+        elif not event.grading_status:
+            event.grading_status = (get_status_check(state, event.event_id) or {}).get("grading_status", "")
+        record_status_check(
+            state,
+            event.event_id,
+            event.due_text,
+            event.submitted,
+            event.submission_status,
+            event.grading_status,
+        )
+    logging.info(
+        "Índice de tareas: %d de %d estatus resueltos con %d páginas de curso.",
+        len(events) - len(remaining),
+        len(events),
+        len(index_pages),
+    )
+    return remaining
+
+
+def _apply_assignment_html(state: Dict[str, Any], event: Event, page_html: str) -> bool:
+    """Apply an assignment page, reusing its last parse when the status region hash matches; True on a hit."""
+    region_hash = assignment_region_hash(page_html)
+    cached = get_assignment_page(state, event.assignment_url) if region_hash else None
+    hit = cached is not None and cached.get("hash") == region_hash
+    if hit:
+        event.submitted = cached.get("submitted")
+        event.submission_status = cached.get("submission_status", "")
+        event.grading_status = cached.get("grading_status", "")
+    else:
+        _apply_assignment_page(event, page_html)
+    if region_hash:
+        store_assignment_page(
+            state, event.assignment_url, region_hash, event.submitted, event.submission_status, event.grading_status
+        )
+    return hit
+
+
+def _apply_assignment_stage(state: Dict[str, Any], events: list[Event], assign_pages: Mapping[str, object]) -> set[str]:
+    """Apply fetched assignment pages; return ids whose page failed.
+
+    HTML pages whose submission status region is unchanged since they were
+    last parsed reuse that result instead of being parsed again.
+    """
+    prune_assignment_pages(state, _ASSIGNMENT_PAGE_TTL_SEC)
+    failed: set[str] = set()
+    hits = parsed = 0
+    for event in events:
+        fetched = assign_pages.get(event.assignment_url)
+        if not _fetched(fetched):
+            logging.warning("No pude abrir assignment %s: %s", event.assignment_url, fetched)
+            failed.add(event.event_id)
+            continue
+        if not isinstance(fetched, str):
+            _apply_assignment_page(event, fetched)
+        elif _apply_assignment_html(state, event, fetched):
+            hits += 1
+        else:
+            parsed += 1
+        record_status_check(
+            state,
+            event.event_id,
+            event.due_text,
+            event.submitted,
+            event.submission_status,
+            event.grading_status,
+        )
+    record_page_hash_metrics(state, hits=hits, misses=parsed)
+    if hits:
+        logging.info("Páginas de assignment sin cambios: %d reutilizadas, %d parseadas.", hits, parsed)
+    return failed
+
+
+def _dashboard_fingerprint(events: list[Event]) -> str:
+    """Stable hash of what the dashboard itself says about each event."""
+    basics = [[e.event_id, e.title, e.due_text, e.url, e.assignment_url] for e in events]
+    return hashlib.sha1(json.dumps(basics, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _in_reminder_window(event: Event, now: int) -> bool:
+    if event.submitted is True:
+        return False
+    due = due_unix(event)
+    return due is not None and 0 < due - now <= _REMINDER_WINDOW_SEC
+
+
+def _reuse_snapshot(state: Dict[str, Any], settings: Settings, fingerprint: str) -> list[Event] | None:
+    """Last cycle's enriched events if the dashboard is unchanged and nothing is due.
+
+    Falls through to a full cycle when an event is inside a reminder window,
+    a ``/verificar`` is pending, or the status refresh policy wants any
+    assignment page re-read.
+    """
+    snapshot = get_dashboard_snapshot(state)
+    if not settings.dashboard_short_circuit or snapshot is None or snapshot.get("fingerprint") != fingerprint:
+        return None
+    try:
+        events = [Event(**data) for data in snapshot["events"]]
+    except TypeError:  # snapshot written by an incompatible version
+        return None
+
+    now = int(time.time())
+    force = _force_status_check(state, settings)
+    for event in events:
+        if _in_reminder_window(event, now):
+            return None
+        check = get_status_check(state, event.event_id)
+        if event.assignment_url and _status_check_due(event, check, now, force, _gradebook_on(settings)):
+            return None
+
+    record_cache_metrics(state, hits=0, misses=0)
+    record_status_refresh_metrics(state, checked=0, skipped=sum(1 for event in events if event.assignment_url))
+    return events
+
+
+def _note_login_redirects(session: SessionTracker | None, *page_maps: Mapping[str, object]) -> None:
+    if session is not None and any(
+        isinstance(result, LoginRedirectError) for pages in page_maps for result in pages.values()
+    ):
+        logging.warning("Páginas redirigidas al login: la sesión expiró durante el ciclo.")
+        session.mark_expired()
+
+
+def _enrich_events(
+    context,
+    events: list[Event],
+    settings: Settings,
+    state: Dict[str, Any],
+    session: SessionTracker | None = None,
+) -> set[str]:
+    """Fill course/description/submission data, fetching pages concurrently.
+
+    Event pages already in the enrichment cache are not opened again, and
+    assignment pages only when the status refresh policy says so.
+    Events keep their dashboard order; a page that fails only degrades its
+    own event. Listings that an event page reveals as the same event are
+    folded into one (``events`` is updated in place) before any assignment
+    page is read, and each assignment page is read once. Returns the ids
+    of events with a failed page.
+    """
+    concurrency = max(1, int(settings.scrape_concurrency))
+
+    pending = _use_cached_enrichment(state, events, settings)
+    event_pages = fetch_pages_html(
+        context,
+        [event.url for event in pending],
+        concurrency=concurrency,
+        script=_dom_script(settings, EVENT_PAGE_DOM_JS),
+    )
+    failed = _apply_event_stage(state, pending, event_pages, settings.base)
+    if pending:
+        events[:] = resolve_event_ids(state, events)
+
+    with_assignment = [event for event in events if event.assignment_url and event.event_id not in failed]
+    to_check = _select_status_checks(state, with_assignment, settings)
+    index_pages = _page_loader(settings, ASSIGNMENT_INDEX_MARKER)(
+        context,
+        _assignment_index_urls(to_check, settings),
+        concurrency=concurrency,
+    )
+    to_check = _apply_index_stage(state, to_check, index_pages, settings.base)
+    assign_pages = _page_loader(settings, ASSIGNMENT_PAGE_MARKER)(
+        context,
+        list(dict.fromkeys(event.assignment_url for event in to_check)),
+        concurrency=concurrency,
+        script=_dom_script(settings, ASSIGNMENT_PAGE_DOM_JS),
+    )
+    _note_login_redirects(session, event_pages, index_pages, assign_pages)
+    return failed | _apply_assignment_stage(state, to_check, assign_pages)
+
+
+async def _enrich_events_async(
+    context,
+    events: list[Event],
+    settings: Settings,
+    state: Dict[str, Any],
+    session: SessionTracker | None = None,
+) -> set[str]:
+    """Async version of ``_enrich_events``."""
+    concurrency = max(1, int(settings.scrape_concurrency))
+
+    pending = _use_cached_enrichment(state, events, settings)
+    event_pages = await fetch_pages_html_async(
+        context,
+        [event.url for event in pending],
+        concurrency=concurrency,
+        script=_dom_script(settings, EVENT_PAGE_DOM_JS),
+    )
+    failed = _apply_event_stage(state, pending, event_pages, settings.base)
+    if pending:
+        events[:] = resolve_event_ids(state, events)
+
+    with_assignment = [event for event in events if event.assignment_url and event.event_id not in failed]
+    to_check = _select_status_checks(state, with_assignment, settings)
+    index_pages = await _page_loader_async(settings, ASSIGNMENT_INDEX_MARKER)(
+        context,
+        _assignment_index_urls(to_check, settings),
+        concurrency=concurrency,
+    )
+    to_check = _apply_index_stage(state, to_check, index_pages, settings.base)
+    assign_pages = await _page_loader_async(settings, ASSIGNMENT_PAGE_MARKER)(
+        context,
+        list(dict.fromkeys(event.assignment_url for event in to_check)),
+        concurrency=concurrency,
+        script=_dom_script(settings, ASSIGNMENT_PAGE_DOM_JS),
+    )
+    _note_login_redirects(session, event_pages, index_pages, assign_pages)
+    return failed | _apply_assignment_stage(state, to_check, assign_pages)
+
+
+def _open_dashboard(page, settings: Settings, session: SessionTracker | None) -> None:
+    """Load the dashboard, logging in only if Moodle sent us to the login form."""
+    safe_goto(page, settings.dashboard_url)
+    if is_login_url(page.url):
+        logging.info("Sesión Moodle expirada; iniciando sesión.")
+        if session is not None:
+            session.mark_expired()
+        submit_login(page, page.context, settings.ues_user, settings.ues_pass, settings.storage_file)
+        safe_goto(page, settings.dashboard_url)
+    if session is not None:
+        session.mark_alive()
+
+
+async def _open_dashboard_async(page, settings: Settings, session: SessionTracker | None) -> None:
+    await safe_goto_async(page, settings.dashboard_url)
+    if is_login_url(page.url):
+        logging.info("Sesión Moodle expirada; iniciando sesión.")
+        if session is not None:
+            session.mark_expired()
+        await submit_login_async(page, page.context, settings.ues_user, settings.ues_pass, settings.storage_file)
+        await safe_goto_async(page, settings.dashboard_url)
+    if session is not None:
+        session.mark_alive()
+
+
+def _is_timeline_response(response) -> bool:
+    return "/lib/ajax/service.php" in response.url and TIMELINE_METHOD in response.url
+
+
+def _timeline_from_response(tab: DashboardTab, response, payload: Any, settings: Settings) -> list[Event] | None:
+    calls = response.request.post_data_json
+    items = action_events_from_service_call(calls, payload)
+    if items is None:
+        return None
+    tab.timeline_args = timeline_call_args(calls)
+    logging.info("Línea de tiempo leída del JSON AJAX: %d eventos.", len(items))
+    return timeline_events_from_items(items, settings.tz_name)
+
+
+def _open_dashboard_with_timeline(
+    tab: DashboardTab, settings: Settings, session: SessionTracker | None
+) -> list[Event] | None:
+    """Open the dashboard and return the timeline block's events from its AJAX JSON.
+
+    Returns as soon as the block's ``service.php`` response arrives. None
+    when capture is off or the response did not come (or held no
+    timeline); the caller then waits for the rendered block and parses it.
+    ``tab`` remembers the block's call for a later refresh in place.
+    """
+    page = tab.page
+    tab.loaded_on, tab.timeline_args = _local_day(settings), None
+    if not settings.timeline_capture:
+        _open_dashboard(page, settings, session)
+        return None
+    opened = False
+    try:
+        with page.expect_response(_is_timeline_response, timeout=_DASHBOARD_ITEMS_TIMEOUT_MS) as info:
+            _open_dashboard(page, settings, session)
+            opened = True
+        response = info.value
+        return _timeline_from_response(tab, response, response.json(), settings)
+    except Exception as ex:
+        if not opened:
+            raise
+        logging.debug("Sin JSON de la línea de tiempo (%s); parseando el HTML.", ex)
+        return None
+
+
+async def _open_dashboard_with_timeline_async(
+    tab: DashboardTab, settings: Settings, session: SessionTracker | None
+) -> list[Event] | None:
+    page = tab.page
+    tab.loaded_on, tab.timeline_args = _local_day(settings), None
+    if not settings.timeline_capture:
+        await _open_dashboard_async(page, settings, session)
+        return None
+    opened = False
+    try:
+        async with page.expect_response(_is_timeline_response, timeout=_DASHBOARD_ITEMS_TIMEOUT_MS) as info:
+            await _open_dashboard_async(page, settings, session)
+            opened = True
+        response = await info.value
+        return _timeline_from_response(tab, response, await response.json(), settings)
+    except Exception as ex:
+        if not opened:
+            raise
+        logging.debug("Sin JSON de la línea de tiempo (%s); parseando el HTML.", ex)
+        return None
+
+
+def _local_day(settings: Settings) -> str:
+    return now_local(settings.tz_name).date().isoformat()
+
+
+def _tab_reusable(tab: DashboardTab, settings: Settings) -> bool:
+    """Fully loaded today, with the timeline call captured, and still showing the dashboard."""
+    url = tab.page.url or ""
+    return (
+        tab.timeline_args is not None
+        and tab.loaded_on == _local_day(settings)
+        and url.startswith(settings.dashboard_url)
+        and not is_login_url(url)
+    )
+
+
+def _refreshed_timeline(result: Any, settings: Settings) -> list[Event] | None:
+    if not isinstance(result, dict) or not result.get("ok"):
+        reason = result.get("reason") if isinstance(result, dict) else result
+        logging.info("Pestaña del dashboard sin refrescar (%s); cargándola de nuevo.", reason)
+        return None
+    items = [item for item in result.get("items") or () if isinstance(item, dict)]
+    logging.info("Dashboard refrescado en su pestaña: %d eventos en la línea de tiempo.", len(items))
+    return timeline_events_from_items(items, settings.tz_name)
+
+
+def _refresh_dashboard_tab(tab: DashboardTab, settings: Settings) -> list[Event] | None:
+    """Refresh a kept tab's blocks in place; its timeline events, or None when it must be loaded again."""
+    if not _tab_reusable(tab, settings):
+        return None
+    try:
+        result = tab.page.evaluate(DASHBOARD_REFRESH_JS, {"methodname": TIMELINE_METHOD, "args": tab.timeline_args})
+    except Exception as ex:
+        result = {"ok": False, "reason": str(ex)}
+    return _refreshed_timeline(result, settings)
+
+
+async def _refresh_dashboard_tab_async(tab: DashboardTab, settings: Settings) -> list[Event] | None:
+    if not _tab_reusable(tab, settings):
+        return None
+    try:
+        result = await tab.page.evaluate(
+            DASHBOARD_REFRESH_JS, {"methodname": TIMELINE_METHOD, "args": tab.timeline_args}
+        )
+    except Exception as ex:
+        result = {"ok": False, "reason": str(ex)}
+    return _refreshed_timeline(result, settings)
+
+
+def _load_dashboard(
+    tab: DashboardTab, settings: Settings, session: SessionTracker | None, state: Dict[str, Any]
+) -> list[Event] | None:
+    """Bring the dashboard tab up to date; timeline events from JSON, or None to parse the rendered block.
+
+    With ``UES_DASHBOARD_TAB`` a tab kept from an earlier cycle is refreshed
+    in place; a new, stale or logged-out tab is loaded by navigation.
+    """
+    if settings.dashboard_tab:
+        timeline = _refresh_dashboard_tab(tab, settings)
+        record_dashboard_tab(state, refreshed=timeline is not None)
+        if timeline is not None:
+            if session is not None:
+                session.mark_alive()
+            return timeline
+    timeline = _open_dashboard_with_timeline(tab, settings, session)
+    if timeline is None:
+        # Give the JS-rendered timeline block time to populate.
+        try:
+            tab.page.wait_for_selector(_DASHBOARD_ITEMS_SELECTOR, timeout=_DASHBOARD_ITEMS_TIMEOUT_MS)
+        except Exception:
+            logging.debug("Timeout esperando event items; parseando lo disponible.")
+    return timeline
+
+
+async def _load_dashboard_async(
+    tab: DashboardTab, settings: Settings, session: SessionTracker | None, state: Dict[str, Any]
+) -> list[Event] | None:
+    if settings.dashboard_tab:
+        timeline = await _refresh_dashboard_tab_async(tab, settings)
+        record_dashboard_tab(state, refreshed=timeline is not None)
+        if timeline is not None:
+            if session is not None:
+                session.mark_alive()
+            return timeline
+    timeline = await _open_dashboard_with_timeline_async(tab, settings, session)
+    if timeline is None:
+        try:
+            await tab.page.wait_for_selector(_DASHBOARD_ITEMS_SELECTOR, timeout=_DASHBOARD_ITEMS_TIMEOUT_MS)
+        except Exception:
+            logging.debug("Timeout esperando event items; parseando lo disponible.")
+    return timeline
+
+
+@contextmanager
+def _cycle_tab(manager: Any, settings: Settings, owns_browser: bool) -> Iterator[DashboardTab]:
+    """The kept dashboard tab of a shared browser with ``UES_DASHBOARD_TAB``, else a tab closed after the cycle."""
+    if settings.dashboard_tab and not owns_browser:
+        with manager.dashboard_tab() as tab:
+            yield tab
+    else:
+        with manager.page() as page:
+            yield DashboardTab(page)
+
+
+@asynccontextmanager
+async def _cycle_tab_async(manager: Any, settings: Settings, owns_browser: bool) -> AsyncIterator[DashboardTab]:
+    if settings.dashboard_tab and not owns_browser:
+        async with manager.dashboard_tab() as tab:
+            yield tab
+    else:
+        async with manager.page() as page:
+            yield DashboardTab(page)
+
+
+def _read_dashboard(page, settings: Settings, timeline: list[Event] | None) -> list[Event]:
+    if settings.extraction_mode == "dom":
+        return events_from_dashboard_dom(page.evaluate(DASHBOARD_DOM_JS), timeline=timeline)
+    return parse_events_from_dashboard(page.content(), timeline=timeline)
+
+
+async def _read_dashboard_async(page, settings: Settings, timeline: list[Event] | None) -> list[Event]:
+    if settings.extraction_mode == "dom":
+        return events_from_dashboard_dom(await page.evaluate(DASHBOARD_DOM_JS), timeline=timeline)
+    return parse_events_from_dashboard(await page.content(), timeline=timeline)
+
+
+def _remember_snapshot(state: Dict[str, Any], fingerprint: str, events: list[Event], failed: set[str]) -> None:
+    # A degraded cycle must not be replayed: retry its pages next time.
+    if failed:
+        clear_dashboard_snapshot(state)
+    else:
+        store_dashboard_snapshot(state, fingerprint, [asdict(event) for event in events])
+
+
+def _take_blocking_stats(manager: Any) -> Dict[str, Any] | None:
+    blocker = getattr(manager, "blocker", None)
+    return blocker.take_stats() if blocker is not None else None
+
+
+# Loads ``urls``; the second argument is the marker a plain GET of them must contain.
+PageFetcher = Callable[[list[str], str], Mapping[str, object]]
+
+
+def _collect_grades(fetch: PageFetcher, settings: Settings, state: Dict[str, Any]) -> list[GradeItem]:
+    """New or changed grades from the gradebook when its check is due.
+
+    Reads the overview report, then the user report of each course whose
+    total moved. A failure only skips grades this cycle.
+    """
+    if not grades_due(state, settings.grades_interval_hours * 3600):
+        return []
+    url = overview_url(settings.base)
+    try:
+        overview_html = fetch([url], OVERVIEW_MARKER).get(url)
+        if not isinstance(overview_html, str):
+            raise RuntimeError(overview_html)
+        overview = parse_grade_overview(overview_html)
+        reports = fetch(
+            [user_report_url(settings.base, course_id) for course_id in courses_to_read(state, overview)],
+            USER_REPORT_MARKER,
+        )
+        return apply_grade_reports(state, overview, reports, settings.base)
+    except Exception as ex:
+        logging.warning("No pude revisar calificaciones: %s", ex)
+        return []
+
+
+async def _collect_grades_async(
+    fetch: Callable[[list[str], str], Awaitable[Mapping[str, object]]],
+    settings: Settings,
+    state: Dict[str, Any],
+) -> list[GradeItem]:
+    if not grades_due(state, settings.grades_interval_hours * 3600):
+        return []
+    url = overview_url(settings.base)
+    try:
+        overview_html = (await fetch([url], OVERVIEW_MARKER)).get(url)
+        if not isinstance(overview_html, str):
+            raise RuntimeError(overview_html)
+        overview = parse_grade_overview(overview_html)
+        reports = await fetch(
+            [user_report_url(settings.base, course_id) for course_id in courses_to_read(state, overview)],
+            USER_REPORT_MARKER,
+        )
+        return apply_grade_reports(state, overview, reports, settings.base)
+    except Exception as ex:
+        logging.warning("No pude revisar calificaciones: %s", ex)
+        return []
+
+
+def _apply_grades(
+    state: Dict[str, Any],
+    settings: Settings,
+    events: list[Event],
+    changed_ids: set[str],
+    grade_changes: list[GradeItem],
+) -> list[Event]:
+    """Put gradebook grades on ``events``; return graded activities no longer on the dashboard.
+
+    Dashboard events that just got a grade are added to ``changed_ids``.
+    """
+    if not _gradebook_on(settings):
+        return []
+    apply_grades_to_events(state, events)
+    graded, standalone = grade_change_events(grade_changes, events)
+    changed_ids.update(event.event_id for event in graded)
+    return standalone
+
+
+def _client_fetcher(client: MoodleClient) -> PageFetcher:
+    def fetch(urls: list[str], _marker: str = "") -> Dict[str, object]:
+        results: Dict[str, object] = {}
+        for url in urls:
+            try:
+                results[url] = client.get_html(url)
+            except Exception as ex:
+                results[url] = ex
+        return results
+
+    return fetch
+
+
+def refresh_assignment_statuses(client: MoodleClient, state: Dict[str, Any], events: list[Event]) -> set[str]:
+    """Re-read just ``events``' assignment pages over HTTP, without a dashboard cycle.
+
+    Updates the events in place and their stored status checks; returns
+    the ids whose page failed (they keep their previous status).
+    """
+    targets = [event for event in events if event.assignment_url]
+    pages = _client_fetcher(client)(list(dict.fromkeys(event.assignment_url for event in targets)))
+    return _apply_assignment_stage(state, targets, pages)
+
+
+def _finish_cycle(
+    state: Dict[str, Any],
+    settings: Settings,
+    started_at: float,
+    events: list[Event],
+    changed_ids: set[str],
+    blocking: Mapping[str, Any] | None = None,
+    extra_changed: list[Event] | None = None,
+) -> tuple[list[Event], list[Event]]:
+    state["last_run"] = int(time.time())
+    state["last_error"] = None
+    state["force_status_check"] = False
+    record_missing_descriptions(state, events)
+    record_scrape_metrics(state, duration_sec=time.time() - started_at, event_count=len(events), success=True)
+    if blocking is not None:
+        record_blocking_metrics(state, blocking["blocked_requests"], blocking["estimated_bytes_saved"])
+        logging.info(
+            "Interceptación: %d solicitudes bloqueadas (ahorro estimado ~%d KB).",
+            blocking["blocked_requests"],
+            blocking["estimated_bytes_saved"] // 1024,
+        )
+    save_state(settings.state_file, state)
+    return events, [event for event in events if event.event_id in changed_ids] + list(extra_changed or ())
+
+
+def _fail_cycle(state: Dict[str, Any], settings: Settings, started_at: float, ex: Exception) -> None:
+    state["last_error"] = str(ex)
+    record_scrape_metrics(state, duration_sec=time.time() - started_at, event_count=0, success=False)
+    save_state(settings.state_file, state)
+
+
+def _shared_browser_matches(manager: Any, headful: bool) -> bool:
+    """Whether the shared ``manager`` runs with the visibility this cycle asks for.
+
+    The shared Chromium is launched once; a cycle that wants the other mode
+    gets a browser of its own instead of silently using it.
+    """
+    if manager is None:
+        return False
+    headless = bool(getattr(manager, "headless", not headful))
+    if headless == (not headful):
+        return True
+    logging.info(
+        "El Chromium compartido es %s; este ciclo abre su propio navegador %s.",
+        "headless" if headless else "visible",
+        "visible" if headful else "headless",
+    )
+    return False
 
 
 def run_scrape_cycle(
     settings: Settings,
     args_override: Mapping[str, Any] | None = None,
+    browser_manager: BrowserManager | None = None,
+    session: SessionTracker | None = None,
 ) -> tuple[list[Event], list[Event]]:
-    """Run one browser-backed scrape cycle and return (all, changed)."""
+    """Run one browser-backed scrape cycle and return (all, changed).
+
+    With ``browser_manager`` the cycle borrows a page from the long-lived
+    Chromium session; without it, or when the shared one was launched in the
+    other headless mode than ``headful`` asks for, a throwaway browser is
+    launched and closed.
+    ``session`` is told whether the Moodle session was found alive.
+    """
     overrides = dict(args_override or {})
     headful = bool(overrides.get("headful", settings.headful))
+    if not _shared_browser_matches(browser_manager, headful):
+        browser_manager = None
+    owns_browser = browser_manager is None
+    manager = browser_manager or BrowserManager(
+        settings.storage_file, headless=not headful, blocker=build_request_blocker(settings)
+    )
 
     state = load_state(settings.state_file)
     known = state.setdefault("events", {})
     started_at = time.time()
+    _take_blocking_stats(manager)  # only count this cycle's requests
 
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=not headful)
-            try:
-                if settings.storage_file and os.path.exists(settings.storage_file):
-                    context = browser.new_context(storage_state=settings.storage_file)
+        try:
+            with _cycle_tab(manager, settings, owns_browser) as tab:
+                page = tab.page
+                timeline = _load_dashboard(tab, settings, session, state)
+                events = resolve_event_ids(state, _read_dashboard(page, settings, timeline))
+                logging.info("Eventos en dashboard: %d", len(events))
+
+                changed_ids = _track_changes(events, known)
+                fingerprint = _dashboard_fingerprint(events)
+                cached = _reuse_snapshot(state, settings, fingerprint)
+                record_cycle_kind(state, short_circuit=cached is not None)
+                if cached is not None:
+                    logging.info("Dashboard sin cambios; reutilizando %d eventos enriquecidos.", len(cached))
+                    events = cached
                 else:
-                    context = browser.new_context()
-
-                page = context.new_page()
-                login_if_needed(
-                    page,
-                    context,
-                    dashboard_url=settings.dashboard_url,
-                    ues_user=settings.ues_user,
-                    ues_pass=settings.ues_pass,
-                    storage_file=settings.storage_file,
+                    failed = _enrich_events(page.context, events, settings, state, session)
+                    _remember_snapshot(state, fingerprint, events, failed)
+
+                concurrency = max(1, int(settings.scrape_concurrency))
+                grade_changes = _collect_grades(
+                    lambda urls, marker: _page_loader(settings, marker)(page.context, urls, concurrency=concurrency),
+                    settings,
+                    state,
                 )
+        finally:
+            if owns_browser:
+                manager.close()
 
-                safe_goto(page, settings.dashboard_url)
+        graded_elsewhere = _apply_grades(state, settings, events, changed_ids, grade_changes)
+        return _finish_cycle(
+            state, settings, started_at, events, changed_ids, _take_blocking_stats(manager), graded_elsewhere
+        )
+    except Exception as ex:
+        _fail_cycle(state, settings, started_at, ex)
+        raise
 
-                # Give the JS-rendered timeline block time to populate.
-                try:
-                    page.wait_for_selector(
-                        '[data-region="event-list-item"], [data-region="event-item"]',
-                        timeout=8000,
-                    )
-                except Exception:
-                    logging.debug("Timeout esperando event items; parseando lo disponible.")
 
-                dashboard_html = page.content()
-                events = parse_events_from_dashboard(dashboard_html)
+async def run_scrape_cycle_async(
+    settings: Settings,
+    args_override: Mapping[str, Any] | None = None,
+    browser_manager: AsyncBrowserManager | None = None,
+    session: SessionTracker | None = None,
+) -> tuple[list[Event], list[Event]]:
+    """``async_playwright`` version of ``run_scrape_cycle``.
+
+    Runs on the caller's event loop (the bot's) and returns the same
+    ``(all, changed)`` tuple.
+    """
+    overrides = dict(args_override or {})
+    headful = bool(overrides.get("headful", settings.headful))
+    if not _shared_browser_matches(browser_manager, headful):
+        browser_manager = None
+    owns_browser = browser_manager is None
+    manager = browser_manager or AsyncBrowserManager(
+        settings.storage_file, headless=not headful, blocker=build_request_blocker(settings)
+    )
+
+    state = load_state(settings.state_file)
+    known = state.setdefault("events", {})
+    started_at = time.time()
+    _take_blocking_stats(manager)
+
+    try:
+        try:
+            async with _cycle_tab_async(manager, settings, owns_browser) as tab:
+                page = tab.page
+                timeline = await _load_dashboard_async(tab, settings, session, state)
+                events = resolve_event_ids(state, await _read_dashboard_async(page, settings, timeline))
                 logging.info("Eventos en dashboard: %d", len(events))
 
-                changed_basic: list[Event] = []
-                for event in events:
-                    prev = known.get(event.event_id)
-                    if prev is None or prev.get("due_text") != event.due_text or prev.get("title") != event.title:
-                        changed_basic.append(event)
-                    known[event.event_id] = {
-                        **(prev or {}),
-                        "title": event.title,
-                        "due_text": event.due_text,
-                        "url": event.url,
-                    }
-
-                enriched_all: list[Event] = []
-                changed_ids = {event.event_id for event in changed_basic}
-                for event in events:
-                    # If timeline already gave us course + assignment URL
-                    # we can skip the expensive event-page navigation.
-                    needs_event_page = (
-                        event.course_name in ("", "Sin materia")
-                        or not event.assignment_url
-                    )
-
-                    if needs_event_page and event.url:
-                        try:
-                            safe_goto(page, event.url)
-                        except Exception as ex:
-                            logging.warning("No pude abrir evento %s: %s", event.url, ex)
-                            enriched_all.append(event)
-                            continue
-
-                        event_html = page.content()
-                        course, desc = enrich_from_event_page(event_html)
-                        if event.course_name in ("", "Sin materia"):
-                            event.course_name = course
-                        if not event.description:
-                            event.description = desc
-                        if not event.assignment_url:
-                            event.assignment_url = find_assignment_url(event_html, base=settings.base)
-
-                    if event.assignment_url:
-                        try:
-                            safe_goto(page, event.assignment_url)
-                            assign_html = page.content()
-                            event.submitted, event.submission_status = assignment_is_submitted(assign_html)
-                            event.grading_status = parse_grading_status(assign_html)
-                        except Exception as ex:
-                            logging.warning("No pude abrir assignment %s: %s", event.assignment_url, ex)
-
-                    enriched_all.append(event)
-
-                enriched_changed = [event for event in enriched_all if event.event_id in changed_ids]
-            finally:
-                browser.close()
-
-        state["last_run"] = int(time.time())
-        state["last_error"] = None
-        record_scrape_metrics(state, duration_sec=time.time() - started_at, event_count=len(enriched_all), success=True)
-        save_state(settings.state_file, state)
-        return enriched_all, enriched_changed
+                changed_ids = _track_changes(events, known)
+                fingerprint = _dashboard_fingerprint(events)
+                cached = _reuse_snapshot(state, settings, fingerprint)
+                record_cycle_kind(state, short_circuit=cached is not None)
+                if cached is not None:
+                    logging.info("Dashboard sin cambios; reutilizando %d eventos enriquecidos.", len(cached))
+                    events = cached
+                else:
+                    failed = await _enrich_events_async(page.context, events, settings, state, session)
+                    _remember_snapshot(state, fingerprint, events, failed)
+
+                concurrency = max(1, int(settings.scrape_concurrency))
+                grade_changes = await _collect_grades_async(
+                    lambda urls, marker: _page_loader_async(settings, marker)(
+                        page.context, urls, concurrency=concurrency
+                    ),
+                    settings,
+                    state,
+                )
+        finally:
+            if owns_browser:
+                await manager.close()
+
+        graded_elsewhere = _apply_grades(state, settings, events, changed_ids, grade_changes)
+        return _finish_cycle(
+            state, settings, started_at, events, changed_ids, _take_blocking_stats(manager), graded_elsewhere
+        )
+    except Exception as ex:
+        _fail_cycle(state, settings, started_at, ex)
+        raise
+
+
+def _refresh_session_with_browser(settings: Settings, headful: bool) -> None:
+    relogin_with_new_browser(settings, headful)
+
+
+def _fetch_timeline_events(client: MoodleClient, settings: Settings, state: Dict[str, Any]) -> list[Event]:
+    """Dashboard events over JSON; a whole ``UES_TIMELINE_DAYS_AHEAD`` window when set."""
+    if settings.timeline_days_ahead <= 0:
+        return fetch_dashboard_events(client, settings.tz_name, overdue_days=settings.timeline_overdue_days)
+    items = sync_timeline(
+        client,
+        state.setdefault("timeline", {}),
+        overdue_days=settings.timeline_overdue_days,
+        days_ahead=settings.timeline_days_ahead,
+        full_sync_sec=settings.timeline_full_sync_hours * 3600,
+    )
+    return fetch_dashboard_events(client, settings.tz_name, items=items)
+
+
+def run_scrape_cycle_ajax(
+    settings: Settings,
+    args_override: Mapping[str, Any] | None = None,
+    client: MoodleClient | None = None,
+    session: SessionTracker | None = None,
+) -> tuple[list[Event], list[Event]]:
+    """Browserless cycle over Moodle's JSON web services; returns (all, changed).
+
+    Reuses the cookies in ``storage_state.json``; Chromium is only started
+    to log in again when Moodle rejects the session.
+    """
+    overrides = dict(args_override or {})
+    headful = bool(overrides.get("headful", settings.headful))
+    owns_client = client is None
+    client = client or MoodleClient(settings.base, settings.storage_file, settings.dashboard_url)
+
+    state = load_state(settings.state_file)
+    known = state.setdefault("events", {})
+    started_at = time.time()
+
+    try:
+        try:
+            try:
+                events = _fetch_timeline_events(client, settings, state)
+            except MoodleSessionExpired as ex:
+                logging.info("Sesión Moodle inválida (%s); iniciando sesión con Playwright.", ex)
+                if session is not None:
+                    session.mark_expired()
+                _refresh_session_with_browser(settings, headful)
+                client.reload_cookies()
+                events = _fetch_timeline_events(client, settings, state)
+            if session is not None:
+                session.mark_alive()
+            grade_changes = _collect_grades(_client_fetcher(client), settings, state)
+        finally:
+            if owns_client:
+                client.close()
+
+        events = resolve_event_ids(state, events)
+        changed_ids = _track_changes(events, known)
+        graded_elsewhere = _apply_grades(state, settings, events, changed_ids, grade_changes)
+        return _finish_cycle(state, settings, started_at, events, changed_ids, extra_changed=graded_elsewhere)
     except Exception as ex:
-        state["last_error"] = str(ex)
-        record_scrape_metrics(state, duration_sec=time.time() - started_at, event_count=0, success=False)
-        save_state(settings.state_file, state)
+        _fail_cycle(state, settings, started_at, ex)
         raise
@@ -0,0 +1,156 @@
+"""Moodle session upkeep: expiry tracking, keepalive and background re-login.
+
+Scrape cycles no longer probe the dashboard for a login redirect before
+working: they notice the redirect on the pages they fetch anyway and report
+it here. Between cycles a periodic job touches the session over HTTP before
+it can idle out, and logs in again (writing ``storage_state.json``) when it
+did die, so user-facing commands find a live session.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from typing import Any, Optional
+
+from .browser import AsyncBrowserManager, BrowserManager
+from .config import Settings
+from .interception import build_request_blocker
+from .moodle_api import MoodleClient, MoodleSessionExpired
+from .scrape import login_if_needed, login_if_needed_async
+
+log = logging.getLogger(__name__)
+
+SESSION_COOKIE_PREFIX = "MoodleSession"
+
+
+def session_cookie_expiry(storage_file: str, base: str) -> Optional[float]:
+    """Absolute expiry of the Moodle session cookie in ``storage_state.json``.
+
+    None when there is no such cookie or it is a browser-session cookie
+    (Playwright stores those with ``expires`` -1).
+    """
+    if not storage_file or not os.path.exists(storage_file):
+        return None
+    try:
+        with open(storage_file, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    host = base.split("://", 1)[-1].split("/", 1)[0].split(":", 1)[0]
+    for cookie in raw.get("cookies", []) if isinstance(raw, dict) else []:
+        domain = str(cookie.get("domain", "")).lstrip(".")
+        if not str(cookie.get("name", "")).startswith(SESSION_COOKIE_PREFIX):
+            continue
+        if domain and (host == domain or host.endswith("." + domain)):
+            expires = float(cookie.get("expires", -1) or -1)
+            return expires if expires > 0 else None
+    return None
+
+
+class SessionTracker:
+    """When the Moodle session was last seen alive, and when it will lapse.
+
+    Moodle ends a session after ``idle_timeout_sec`` without requests, or
+    when its cookie expires, whichever comes first.
+    """
+
+    def __init__(self, storage_file: str, base: str, idle_timeout_sec: float) -> None:
+        self.storage_file = storage_file
+        self.base = base
+        self.idle_timeout_sec = float(idle_timeout_sec)
+        self.expired = False
+        self._alive_until: Optional[float] = None
+
+    def mark_alive(self, expires_in: Optional[float] = None) -> None:
+        """Record a request that was served with our session."""
+        self.expired = False
+        self._alive_until = time.time() + (self.idle_timeout_sec if expires_in is None else float(expires_in))
+
+    def mark_expired(self) -> None:
+        self.expired = True
+        self._alive_until = None
+
+    def cookie_expiry(self) -> Optional[float]:
+        return session_cookie_expiry(self.storage_file, self.base)
+
+    def expires_at(self) -> Optional[float]:
+        candidates = [t for t in (self._alive_until, self.cookie_expiry()) if t is not None]
+        return min(candidates) if candidates else None
+
+    def cookie_expiring(self, within_sec: float, now: Optional[float] = None) -> bool:
+        expiry = self.cookie_expiry()
+        return expiry is not None and expiry - (now or time.time()) <= within_sec
+
+    def needs_refresh(self, within_sec: float, now: Optional[float] = None) -> bool:
+        """True when the session is dead, unknown, or lapses within ``within_sec``."""
+        if self.expired:
+            return True
+        expiry = self.expires_at()
+        return expiry is None or expiry - (now or time.time()) <= within_sec
+
+
+def touch_session(client: MoodleClient, tracker: SessionTracker) -> bool:
+    """Extend the session with one HTTP request; False if it already died."""
+    try:
+        remaining = client.touch_session()
+    except MoodleSessionExpired:
+        tracker.mark_expired()
+        return False
+    tracker.mark_alive(remaining)
+    return True
+
+
+def relogin_browser(manager: BrowserManager, settings: Settings) -> None:
+    """Log in again inside ``manager``'s context and save ``storage_state.json``.
+
+    Cookies are cleared first so an about-to-expire session cookie is
+    replaced instead of reused.
+    """
+    with manager.page() as page:
+        page.context.clear_cookies()
+        login_if_needed(
+            page,
+            page.context,
+            dashboard_url=settings.dashboard_url,
+            ues_user=settings.ues_user,
+            ues_pass=settings.ues_pass,
+            storage_file=settings.storage_file,
+        )
+
+
+async def relogin_browser_async(manager: AsyncBrowserManager, settings: Settings) -> None:
+    async with manager.page() as page:
+        await page.context.clear_cookies()
+        await login_if_needed_async(
+            page,
+            page.context,
+            dashboard_url=settings.dashboard_url,
+            ues_user=settings.ues_user,
+            ues_pass=settings.ues_pass,
+            storage_file=settings.storage_file,
+        )
+
+
+def relogin_with_new_browser(settings: Settings, headful: bool) -> None:
+    """Log in with a throwaway Chromium and write fresh ``storage_state.json``."""
+    manager = BrowserManager(settings.storage_file, headless=not headful, blocker=build_request_blocker(settings))
+    try:
+        relogin_browser(manager, settings)
+    finally:
+        manager.close()
+
+
+def keepalive_margin_sec(settings: Settings) -> float:
+    """Refresh when the session would lapse before the next keepalive run (x2)."""
+    return max(1, int(settings.session_keepalive_min)) * 60 * 2
+
+
+def describe_expiry(tracker: Any) -> str:
+    expiry = tracker.expires_at() if tracker is not None else None
+    if expiry is None:
+        return "desconocida"
+    return f"{max(0, int(expiry - time.time())) // 60} min"
@@ -5,7 +5,7 @@ from __future__ import annotations
 import os
 import json
 import time
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 
 def _with_defaults(state: Dict[str, Any]) -> Dict[str, Any]:
@@ -20,6 +20,15 @@ def _with_defaults(state: Dict[str, Any]) -> Dict[str, Any]:
     state.setdefault("sent_reminders", {})
     state.setdefault("notification_mode", None)  # None = use settings default
     state.setdefault("digest_evening_hour", None)
+    state.setdefault("enrichment_cache", {})
+    state.setdefault("status_checks", {})
+    state.setdefault("force_status_check", False)
+    state.setdefault("dashboard_snapshot", None)
+    state.setdefault("timeline", {})
+    state.setdefault("grades", {})
+    state.setdefault("descriptions", {})
+    state.setdefault("event_modules", {})
+    state.setdefault("assignment_pages", {})
     state.setdefault(
         "metrics",
         {
@@ -31,6 +40,25 @@ def _with_defaults(state: Dict[str, Any]) -> Dict[str, Any]:
             "last_event_count": 0,
             "network_transient_errors": 0,
             "functional_errors": 0,
+            "last_blocked_requests": 0,
+            "last_estimated_bytes_saved": 0,
+            "total_blocked_requests": 0,
+            "total_estimated_bytes_saved": 0,
+            "last_cache_hits": 0,
+            "last_cache_misses": 0,
+            "total_cache_hits": 0,
+            "total_cache_misses": 0,
+            "last_status_checked": 0,
+            "last_status_skipped": 0,
+            "full_cycles": 0,
+            "short_circuit_cycles": 0,
+            "last_cycle_short_circuit": False,
+            "dashboard_tab_refreshes": 0,
+            "dashboard_tab_reloads": 0,
+            "last_page_hash_hits": 0,
+            "last_page_hash_misses": 0,
+            "total_page_hash_hits": 0,
+            "total_page_hash_misses": 0,
         },
     )
     return state
@@ -111,6 +139,312 @@ def record_scrape_metrics(state: Dict[str, Any], duration_sec: float, event_coun
         metrics["failed_scrapes"] = int(metrics.get("failed_scrapes", 0)) + 1
 
 
+def record_blocking_metrics(state: Dict[str, Any], blocked_requests: int, estimated_bytes_saved: int) -> None:
+    """Store what request interception blocked in the last cycle (and in total).
+
+    Blocked requests are counted; the bytes they would have cost are an
+    estimate per resource type, and are named so.
+    """
+    metrics = state.setdefault("metrics", {})
+    # Older state files stored the same estimate as "*_blocked_bytes".
+    metrics.pop("last_blocked_bytes", None)
+    total_estimated = int(metrics.get("total_estimated_bytes_saved", 0)) + int(metrics.pop("total_blocked_bytes", 0))
+    metrics["last_blocked_requests"] = int(blocked_requests)
+    metrics["last_estimated_bytes_saved"] = int(estimated_bytes_saved)
+    metrics["total_blocked_requests"] = int(metrics.get("total_blocked_requests", 0)) + int(blocked_requests)
+    metrics["total_estimated_bytes_saved"] = int(total_estimated) + int(estimated_bytes_saved)
+
+
+def get_cached_enrichment(
+    state: Dict[str, Any],
+    event_id: str,
+    title: str,
+    due_text: str,
+    ttl_sec: float,
+) -> Optional[Dict[str, Any]]:
+    """Cached event-page data for ``event_id``, or None if missing/stale.
+
+    An entry is stale once the event's title or due date changes, or after
+    ``ttl_sec`` seconds.
+    """
+    entry = state.setdefault("enrichment_cache", {}).get(event_id)
+    if ttl_sec <= 0 or not isinstance(entry, dict):
+        return None
+    if entry.get("title") != title or entry.get("due_text") != due_text:
+        return None
+    if time.time() - float(entry.get("cached_at", 0)) > ttl_sec:
+        return None
+    return entry
+
+
+def store_enrichment(
+    state: Dict[str, Any],
+    event_id: str,
+    title: str,
+    due_text: str,
+    course_name: str,
+    description: str,
+    assignment_url: str,
+    course_id: str = "",
+) -> None:
+    state.setdefault("enrichment_cache", {})[event_id] = {
+        "title": title,
+        "due_text": due_text,
+        "course_name": course_name,
+        "description": description,
+        "assignment_url": assignment_url,
+        "course_id": course_id,
+        "cached_at": int(time.time()),
+    }
+
+
+def prune_enrichment_cache(state: Dict[str, Any], ttl_sec: float) -> int:
+    """Drop expired entries; return how many were removed."""
+    cache = state.setdefault("enrichment_cache", {})
+    cutoff = time.time() - ttl_sec
+    expired = [
+        key for key, entry in cache.items()
+        if not isinstance(entry, dict) or float(entry.get("cached_at", 0)) < cutoff
+    ]
+    for key in expired:
+        del cache[key]
+    return len(expired)
+
+
+def get_assignment_page(state: Dict[str, Any], url: str) -> Optional[Dict[str, Any]]:
+    """Status parsed from ``url`` last time, with the hash of the page region it came from."""
+    entry = state.setdefault("assignment_pages", {}).get(url)
+    return entry if isinstance(entry, dict) else None
+
+
+def store_assignment_page(
+    state: Dict[str, Any],
+    url: str,
+    region_hash: str,
+    submitted: Optional[bool],
+    submission_status: str,
+    grading_status: str,
+) -> None:
+    state.setdefault("assignment_pages", {})[url] = {
+        "hash": region_hash,
+        "submitted": submitted,
+        "submission_status": submission_status,
+        "grading_status": grading_status,
+        "seen_at": int(time.time()),
+    }
+
+
+def prune_assignment_pages(state: Dict[str, Any], ttl_sec: float) -> int:
+    """Forget pages not fetched for ``ttl_sec``; return how many were dropped."""
+    pages = state.setdefault("assignment_pages", {})
+    cutoff = time.time() - ttl_sec
+    stale = [url for url, entry in pages.items() if not isinstance(entry, dict) or entry.get("seen_at", 0) < cutoff]
+    for url in stale:
+        del pages[url]
+    return len(stale)
+
+
+def record_page_hash_metrics(state: Dict[str, Any], hits: int, misses: int) -> None:
+    """Assignment pages whose status region was unchanged (parse skipped) vs. parsed."""
+    metrics = state.setdefault("metrics", {})
+    metrics["last_page_hash_hits"] = int(hits)
+    metrics["last_page_hash_misses"] = int(misses)
+    metrics["total_page_hash_hits"] = int(metrics.get("total_page_hash_hits", 0)) + int(hits)
+    metrics["total_page_hash_misses"] = int(metrics.get("total_page_hash_misses", 0)) + int(misses)
+
+
+def get_status_check(state: Dict[str, Any], event_id: str) -> Optional[Dict[str, Any]]:
+    entry = state.setdefault("status_checks", {}).get(event_id)
+    return entry if isinstance(entry, dict) else None
+
+
+def record_status_check(
+    state: Dict[str, Any],
+    event_id: str,
+    due_text: str,
+    submitted: Optional[bool],
+    submission_status: str,
+    grading_status: str,
+) -> None:
+    """Remember the submission status read from an assignment page, and when."""
+    state.setdefault("status_checks", {})[event_id] = {
+        "due_text": due_text,
+        "submitted": submitted,
+        "submission_status": submission_status,
+        "grading_status": grading_status,
+        "checked_at": int(time.time()),
+    }
+
+
+def merge_sent_reminders(state: Dict[str, Any], sent: Dict[str, List[str]]) -> None:
+    """Add reminder labels sent on a copy of the state to ``state``."""
+    sent_reminders = state.setdefault("sent_reminders", {})
+    for event_id, labels in sent.items():
+        known = sent_reminders.setdefault(event_id, [])
+        known.extend(label for label in labels if label not in known)
+
+
+def prune_status_checks(state: Dict[str, Any], ttl_sec: float) -> int:
+    """Drop status checks not refreshed for ``ttl_sec`` (events gone from the dashboard); return how many."""
+    checks = state.setdefault("status_checks", {})
+    cutoff = time.time() - ttl_sec
+    expired = [
+        key for key, entry in checks.items()
+        if not isinstance(entry, dict) or float(entry.get("checked_at", 0)) < cutoff
+    ]
+    for key in expired:
+        del checks[key]
+    return len(expired)
+
+
+def request_status_recheck(state: Dict[str, Any]) -> None:
+    """Make the next successful cycle re-open every assignment page."""
+    state["force_status_check"] = True
+
+
+def record_status_refresh_metrics(state: Dict[str, Any], checked: int, skipped: int) -> None:
+    metrics = state.setdefault("metrics", {})
+    metrics["last_status_checked"] = int(checked)
+    metrics["last_status_skipped"] = int(skipped)
+
+
+def record_cache_metrics(state: Dict[str, Any], hits: int, misses: int) -> None:
+    metrics = state.setdefault("metrics", {})
+    metrics["last_cache_hits"] = int(hits)
+    metrics["last_cache_misses"] = int(misses)
+    metrics["total_cache_hits"] = int(metrics.get("total_cache_hits", 0)) + int(hits)
+    metrics["total_cache_misses"] = int(metrics.get("total_cache_misses", 0)) + int(misses)
+
+
+def get_dashboard_snapshot(state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    snapshot = state.get("dashboard_snapshot")
+    if not isinstance(snapshot, dict) or not isinstance(snapshot.get("events"), list):
+        return None
+    return snapshot
+
+
+def store_dashboard_snapshot(state: Dict[str, Any], fingerprint: str, events: List[Dict[str, Any]]) -> None:
+    """Remember the last fully enriched cycle, keyed by its dashboard fingerprint."""
+    state["dashboard_snapshot"] = {
+        "fingerprint": fingerprint,
+        "events": events,
+        "saved_at": int(time.time()),
+    }
+
+
+def clear_dashboard_snapshot(state: Dict[str, Any]) -> None:
+    state["dashboard_snapshot"] = None
+
+
+def record_cycle_kind(state: Dict[str, Any], short_circuit: bool) -> None:
+    """Count cycles answered from the dashboard snapshot vs. fully enriched."""
+    metrics = state.setdefault("metrics", {})
+    key = "short_circuit_cycles" if short_circuit else "full_cycles"
+    metrics[key] = int(metrics.get(key, 0)) + 1
+    metrics["last_cycle_short_circuit"] = bool(short_circuit)
+
+
+def record_dashboard_tab(state: Dict[str, Any], refreshed: bool) -> None:
+    """Count cycles that refreshed the kept dashboard tab in place vs. loaded it again."""
+    metrics = state.setdefault("metrics", {})
+    key = "dashboard_tab_refreshes" if refreshed else "dashboard_tab_reloads"
+    metrics[key] = int(metrics.get(key, 0)) + 1
+
+
+def get_grade_snapshot(state: Dict[str, Any]) -> Dict[str, Any]:
+    snapshot = state.get("grades")
+    if not isinstance(snapshot, dict):
+        snapshot = state["grades"] = {}
+    return snapshot
+
+
+def store_grade_snapshot(
+    state: Dict[str, Any],
+    courses: Dict[str, Any],
+    items: Dict[str, Any],
+    checked_at: float,
+    full_at: Optional[float] = None,
+) -> None:
+    """Remember course totals and per-activity grades from the gradebook."""
+    snapshot = get_grade_snapshot(state)
+    snapshot["courses"] = courses
+    snapshot["items"] = items
+    snapshot["checked_at"] = int(checked_at)
+    if full_at is not None:
+        snapshot["full_at"] = int(full_at)
+
+
+def record_description_sources(state: Dict[str, Any], sources: Dict[str, str]) -> None:
+    """Remember, per event id, the page a missing description can be read from.
+
+    Text already fetched from the same URL is kept; events no longer on the
+    dashboard (or that got their description from the cycle) are dropped.
+    """
+    known = state.get("descriptions")
+    known = known if isinstance(known, dict) else {}
+    state["descriptions"] = {
+        event_id: known[event_id] if isinstance(known.get(event_id), dict) and known[event_id].get("url") == url
+        else {"url": url}
+        for event_id, url in sources.items()
+    }
+
+
+def get_description_entry(state: Dict[str, Any], event_id: str) -> Optional[Dict[str, Any]]:
+    entry = state.setdefault("descriptions", {}).get(event_id)
+    return entry if isinstance(entry, dict) else None
+
+
+def store_description(state: Dict[str, Any], event_id: str, url: str, text: str) -> None:
+    state.setdefault("descriptions", {})[event_id] = {"url": url, "text": text, "fetched_at": int(time.time())}
+
+
+def merge_descriptions(state: Dict[str, Any], fetched: Dict[str, Dict[str, Any]]) -> None:
+    """Add descriptions fetched on a copy of the state; text ``state`` already has for the same page wins."""
+    descriptions = state.setdefault("descriptions", {})
+    for event_id, entry in fetched.items():
+        current = descriptions.get(event_id)
+        if isinstance(current, dict) and "text" in current and current.get("url") == entry.get("url"):
+            continue
+        descriptions[event_id] = entry
+
+
+def get_event_modules(state: Dict[str, Any]) -> Dict[str, str]:
+    """Course-module id learned for each calendar event id on the dashboard."""
+    modules = state.get("event_modules")
+    return modules if isinstance(modules, dict) else {}
+
+
+def store_event_modules(state: Dict[str, Any], modules: Dict[str, str]) -> None:
+    state["event_modules"] = dict(modules)
+
+
+# Sections keyed by event id that follow an event when its id changes.
+_EVENT_KEYED_SECTIONS = ("events", "enrichment_cache", "status_checks", "sent_reminders", "descriptions")
+
+
+def migrate_event_keys(state: Dict[str, Any], aliases: Dict[str, str]) -> int:
+    """Move per-event entries from old ids to the canonical id in ``aliases``.
+
+    An entry already stored under the new id wins, except that reminders
+    sent under either id stay sent. Returns how many entries moved.
+    """
+    moved = 0
+    for section in _EVENT_KEYED_SECTIONS:
+        entries = state.get(section)
+        if not isinstance(entries, dict):
+            continue
+        for old_id, new_id in aliases.items():
+            if old_id == new_id or old_id not in entries:
+                continue
+            entry = entries.pop(old_id)
+            if new_id not in entries:
+                entries[new_id] = entry
+                moved += 1
+            elif section == "sent_reminders" and isinstance(entry, list) and isinstance(entries[new_id], list):
+                entries[new_id] = list(dict.fromkeys(entries[new_id] + entry))
+    return moved
+
+
 def increment_error_metrics(state: Dict[str, Any], error_kind: str) -> None:
     metrics = state.setdefault("metrics", {})
     if error_kind == "network_transient":
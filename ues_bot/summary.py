@@ -82,16 +82,19 @@ def status_badge(submitted: Optional[bool]) -> str:
     return "⚠️"
 
 
+def is_graded(grading_status: str) -> bool:
+    """True when the grading status text says the work was already graded."""
+    g = (grading_status or "").lower()
+    if "calificado" in g and "no calificado" not in g:
+        return True
+    return "graded" in g and "not graded" not in g
+
+
 def grading_badge(grading_status: str) -> str:
     """Return an emoji for the grading status."""
-    g = (grading_status or "").lower()
-    if not g:
+    if not grading_status:
         return ""
-    if "calificado" in g and "no calificado" not in g:
-        return "📝"
-    if "graded" in g and "not graded" not in g:
-        return "📝"
-    return "⏳"
+    return "📝" if is_graded(grading_status) else "⏳"
 
 
 def due_unix(e: Event) -> Optional[int]: